@@ -0,0 +1,136 @@
+"""Compares the SQLite query classes with the columnar in-memory backend on larger databases.
+
+The bundled database is scaled by appending copies of its employees, teams and events with
+shifted ids, so every entity keeps the size of the bundled ones while the tables grow. The
+rollups are refreshed on the scaled copy, then `event_counts`, `cumulative_event_counts` and
+`model_data` are timed for random employees and teams on both backends, after the columnar
+event store was loaded once.
+
+Usage:
+    python benchmarks/bench_columnar.py [--scales 10,100,1000] [--queries 200]
+"""
+
+import argparse
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from sqlite3 import connect
+from typing import Dict, List
+
+from employee_events import (
+    ColumnarEmployee,
+    ColumnarTeam,
+    ConnectionPool,
+    Employee,
+    QueryBase,
+    Team,
+    migrate,
+    refresh_rollups,
+)
+from employee_events.columnar import get_event_store
+from employee_events.sql_execution import db_path
+
+methods = ["event_counts", "cumulative_event_counts", "model_data"]
+
+
+def scale_database(path: Path, scale: int) -> Dict[str, int]:
+    """Appends `scale - 1` copies of the employees, teams and events, and returns the row counts."""
+    db_conn = connect(path)
+    try:
+        with db_conn:
+            max_employee, max_team = db_conn.execute("SELECT MAX(employee_id), MAX(team_id) FROM employee").fetchone()
+            copies = "WITH RECURSIVE copies(k) AS (SELECT 1 UNION ALL SELECT k + 1 FROM copies WHERE k < :copies)"
+            params = {"copies": scale - 1, "max_employee": max_employee, "max_team": max_team}
+
+            if scale > 1:
+                db_conn.execute(
+                    f"""{copies}
+                    INSERT INTO team (team_id, team_name, shift, manager_name)
+                    SELECT team_id + k * :max_team, team_name, shift, manager_name FROM team, copies""",
+                    params,
+                )
+                db_conn.execute(
+                    f"""{copies}
+                    INSERT INTO employee (employee_id, first_name, last_name, team_id)
+                    SELECT employee_id + k * :max_employee, first_name, last_name, team_id + k * :max_team
+                    FROM employee, copies""",
+                    params,
+                )
+                db_conn.execute(
+                    f"""{copies}
+                    INSERT INTO employee_events (event_date, employee_id, team_id, positive_events, negative_events)
+                    SELECT event_date, employee_id + k * :max_employee, team_id + k * :max_team,
+                           positive_events, negative_events
+                    FROM employee_events, copies""",
+                    params,
+                )
+            refresh_rollups(db_conn, full=True)
+
+        return {
+            table: db_conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ["employee", "team", "employee_events"]
+        }
+    finally:
+        db_conn.close()
+
+
+def time_queries(model: QueryBase, ids: List[int]) -> Dict[str, float]:
+    """Median latency of every method over `ids`, in microseconds."""
+    timings = {}
+    for method in methods:
+        query = getattr(model, method)
+        latencies = []
+        for id in ids:
+            start = time.perf_counter()
+            query(id)
+            latencies.append(time.perf_counter() - start)
+        timings[method] = statistics.median(latencies) * 1e6
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="10,100,1000", help="comma separated dataset size multipliers")
+    parser.add_argument("--queries", type=int, default=200, help="random ids queried per method")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for scale in [int(scale) for scale in args.scales.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "employee_events.db"
+            shutil.copy(db_path, path)
+            migrate(path)
+
+            start = time.perf_counter()
+            counts = scale_database(path, scale)
+            print(f"\n{scale}x: {counts} rows, built in {time.perf_counter() - start:.1f}s")
+
+            pool = ConnectionPool(path)
+            start = time.perf_counter()
+            store = get_event_store(pool)
+            print(f"  event store: loaded in {time.perf_counter() - start:.2f}s, {store.nbytes / 2**20:.1f} MiB")
+
+            for entity, backends in [("employee", (Employee, ColumnarEmployee)), ("team", (Team, ColumnarTeam))]:
+                ids = [rng.randint(1, counts[entity]) for _ in range(args.queries)]
+                results = {}
+                for backend in backends:
+                    model = backend()
+                    model.pool = pool
+                    time_queries(model, ids[:10])  # warm up page cache and mmap
+                    results[backend.__name__] = time_queries(model, ids)
+
+                sqlite, columnar = results.values()
+                for method in methods:
+                    print(
+                        f"  {f'{entity}.{method}':<34} sqlite {sqlite[method]:8.1f}us"
+                        f"  columnar {columnar[method]:8.1f}us  ({sqlite[method] / columnar[method]:.1f}x)"
+                    )
+            pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compares reading a report's data query by query with reading it as one `EntityBundle`.
+
+For every employee and team, the data of one dashboard view (the notes table and both charts)
+is read in three ways:
+
+- separate: the queries the components used to issue, each checking out a pooled connection.
+- bundle: a single `QueryBase.bundle` call, reading every part in one statement.
+- cached: the dashboard's shared bundles, where the view reads the data version once, like a
+  dashboard request, and its three components reuse the bundle read by an earlier view. The
+  version query is counted, it is the only query of a fully cached page.
+
+The statements reaching SQLite are counted with a trace callback, and the latency of every
+view is recorded.
+
+Usage:
+    python benchmarks/bench_entity_bundle.py [--repeat 200]
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List, Tuple
+
+from employee_events import ConnectionPool, Employee, EntityBundle, QueryBase, Team
+
+
+def separate(model: QueryBase, id: int) -> None:
+    model.notes_page(id, 50)
+    model.cumulative_event_counts(id)
+    model.username(id)
+    model.risk_score(id, "")
+    model.model_data(id)
+
+
+def bundle(model: QueryBase, id: int) -> None:
+    model.bundle(id, 50)
+
+
+bundles: Dict[Tuple[str, int, int], EntityBundle] = {}
+
+
+def cached(model: QueryBase, id: int) -> None:
+    data_version = model.data_version()
+    for _ in range(3):
+        key = model.name, id, data_version
+        if key not in bundles:
+            bundles[key] = model.bundle(id, 50)
+
+
+def run(pool: ConnectionPool, read: Callable[[QueryBase, int], None], repeat: int) -> Dict[str, float]:
+    statements: List[str] = []
+    latencies: List[float] = []
+
+    with pool.connection() as db_conn:
+        db_conn.set_trace_callback(statements.append)
+
+    models = [Employee(), Team()]
+    entities = [(model, int(id)) for model in models for _, id in model.names()]
+    for model in models:
+        model.pool = pool
+
+    statements.clear()
+    for _ in range(repeat):
+        for model, id in entities:
+            start = time.perf_counter()
+            read(model, id)
+            latencies.append(time.perf_counter() - start)
+
+    with pool.connection() as db_conn:
+        db_conn.set_trace_callback(None)
+
+    selects = [statement for statement in statements if statement.lstrip().upper().startswith("SELECT")]
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {
+        "queries": len(selects) / len(latencies),
+        "statements": len(statements) / len(latencies),
+        "p50": percentiles[49] * 1e3,
+        "p99": percentiles[98] * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="times every entity is viewed")
+    args = parser.parse_args()
+
+    for label, read in [("separate", separate), ("bundle", bundle), ("cached", cached)]:
+        # a single connection, so the trace callback sees every statement
+        pool = ConnectionPool(size=1)
+        run(pool, read, 1)  # warm up page cache and mmap
+        result = run(pool, read, args.repeat)
+        pool.close()
+
+        print(
+            f"{label:>9}: {result['queries']:.0f} queries ({result['statements']:.0f} statements) per view, "
+            f"p50 {result['p50']:.2f}ms, p99 {result['p99']:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Measures the cold import time of the dashboard and of the employee_events package, and guards their budgets.
+
+Every target runs `--runs` times in a fresh interpreter with `python -X importtime`. Its import
+time is the sum of the cumulative times of the modules it imported at the top level, without the
+modules of the interpreter startup. The median is compared with the target's budget, scaled by
+`--budget-scale` for slower machines. The heavy modules that only some requests need (numpy,
+pandas, matplotlib, sklearn, and fastlite for fasthtml's unused database support) must not be
+imported at all. The slowest modules of the last run are listed.
+
+Exits with status 1 when a target exceeds its budget or imports a heavy module, e.g. in CI.
+
+Usage:
+    python benchmarks/bench_import_time.py [--runs 7] [--top 10] [--budget-scale 1.0]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+project_root = Path(__file__).parents[1]
+
+# Code run by every target, and its budget in milliseconds on the reference machine
+targets: Dict[str, Tuple[str, float]] = {
+    "dashboard": ("import dashboard", 450.0),
+    "employee_events": ("from employee_events import Employee, Team, check_schema, migrate", 40.0),
+}
+
+heavy_modules = ["numpy", "pandas", "matplotlib", "sklearn", "fastlite"]
+
+
+def import_times(code: str) -> List[Tuple[str, int, int]]:
+    """Name, nesting level and cumulative microseconds of every module imported by `code`, in import order."""
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([str(project_root / "report"), os.environ.get("PYTHONPATH", "")]),
+    }
+    # fasthtml writes its session key to the working directory
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), level, int(cumulative)))
+    return modules
+
+
+def measure(code: str, startup: Set[str]) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """Import time of `code` in milliseconds, and its modules"""
+    modules = [module for module in import_times(code) if module[0] not in startup]
+    return sum(cumulative for _, level, cumulative in modules if level == 0) / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules listed per target")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="factor applied to every budget")
+    args = parser.parse_args()
+
+    startup = {name for name, _, _ in import_times("pass")}
+    failed = False
+    for target, (code, budget) in targets.items():
+        runs = [measure(code, startup) for _ in range(args.runs)]
+        median = statistics.median(milliseconds for milliseconds, _ in runs)
+        modules = runs[-1][1]
+        loaded = {name.split(".")[0] for name, _, _ in modules}
+        heavy = [module for module in heavy_modules if module in loaded]
+        over = median > budget * args.budget_scale
+        failed |= over or bool(heavy)
+
+        status = "OVER BUDGET" if over else "ok"
+        print(
+            f"{target}: {median:.1f} ms (budget {budget * args.budget_scale:.0f} ms) {status}, {len(modules)} modules"
+        )
+        if heavy:
+            print(f"  imports heavy modules: {', '.join(heavy)}")
+        for name, level, cumulative in sorted(modules, key=lambda module: -module[2])[: args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {'  ' * level}{name}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
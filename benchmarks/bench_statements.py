@@ -0,0 +1,107 @@
+"""Compares f-string interpolated SQL with bound parameters for all employees and teams.
+
+Every `Employee`/`Team` query is captured once per id and then replayed on a pooled connection,
+either with the id interpolated into the SQL text (one statement per id) or with the id bound
+as a parameter (one statement per query). Only statement preparation and execution are timed,
+so the pandas DataFrame construction does not hide the difference.
+
+The bundled database has 25 employees and 5 teams, so the per-connection statement cache is
+kept smaller than the number of distinct interpolated statements by default, as it would be
+with thousands of ids in production.
+
+Usage:
+    python benchmarks/bench_statements.py [--repeat 50] [--cached-statements 16]
+"""
+
+import argparse
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from employee_events import ConnectionPool, Employee, Rows, Team
+from employee_events.sql_execution import Params
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class StatementRecorder:
+    """Mixin capturing the statements issued by a `QueryBase` instead of running them."""
+
+    def __init__(self):
+        self.statements: List[Tuple[str, Params]] = []
+
+    def query(self, sql_query: str, params: Params = (), method: str = "query") -> List[Tuple[str, ...]]:
+        self.statements.append((sql_query, params))
+        return []
+
+    def pandas_query(self, sql_query: str, params: Params = (), method: str = "pandas_query") -> "pd.DataFrame":
+        import pandas as pd
+
+        self.statements.append((sql_query, params))
+        return pd.DataFrame()
+
+    def rows(self, sql_query: str, params: Params = (), method: str = "rows") -> Rows:
+        self.statements.append((sql_query, params))
+        return Rows(())
+
+
+class EmployeeRecorder(StatementRecorder, Employee): ...
+
+
+class TeamRecorder(StatementRecorder, Team): ...
+
+
+def capture(recorder: EmployeeRecorder | TeamRecorder, ids: List[int]) -> List[Tuple[str, Dict[str, Any]]]:
+    for id in ids:
+        recorder.username(id)
+        recorder.model_data(id)
+        recorder.event_counts(id)
+        recorder.notes(id)
+
+    return [(sql, dict(params)) for sql, params in recorder.statements]
+
+
+def interpolate(sql_query: str, params: Dict[str, Any]) -> str:
+    for key, value in params.items():
+        sql_query = sql_query.replace(f":{key}", repr(value))
+    return sql_query
+
+
+def run(pool: ConnectionPool, statements: List[Tuple[str, Any]], repeat: int) -> float:
+    with pool.connection() as db_conn:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for sql_query, params in statements:
+                db_conn.execute(sql_query, params).fetchall()
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50, help="times every statement is replayed")
+    parser.add_argument("--cached-statements", type=int, default=16, help="prepared statement cache per connection")
+    args = parser.parse_args()
+
+    bound: List[Tuple[str, Any]] = []
+    for model, recorder in [(Employee(), EmployeeRecorder()), (Team(), TeamRecorder())]:
+        bound += capture(recorder, [int(id) for _, id in model.names()])
+    literal = [(interpolate(sql, params), ()) for sql, params in bound]
+
+    print(f"{len(bound)} queries per round, {args.repeat} rounds")
+    print(f"distinct statements: f-string={len({s for s, _ in literal})}, bound={len({s for s, _ in bound})}")
+
+    timings = {}
+    for label, statements in [("f-string", literal), ("bound", bound)]:
+        pool = ConnectionPool(cached_statements=args.cached_statements)
+        run(pool, statements, 1)  # warm up page cache and mmap
+        timings[label] = run(pool, statements, args.repeat)
+        pool.close()
+
+        per_query = timings[label] / (args.repeat * len(statements)) * 1e6
+        print(f"{label:>9}: {timings[label]:.3f}s total, {per_query:.1f}us per query")
+
+    print(f"speedup: {timings['f-string'] / timings['bound']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Benchmark suite of the query layer and the dashboard render path, on a synthetic database.
+
+A database is generated with `synthetic.py` (or reused with `--db`), then three groups of
+benchmarks run on random ids:
+
+- query: every query method of `Employee` and `Team`, also as `Rows`, on the sqlite and the columnar
+  backends.
+- render: `/employee/{id}`, `/team/{id}` and the line chart through the ASGI app in-process,
+  cold (all dashboard caches cleared before every request) and warm.
+- memory: the peak of the Python allocations of one call of every benchmark, traced with
+  `tracemalloc` after the timings so the tracing does not slow them down.
+
+The results are written as JSON with the commit, the machine and the database size. `--compare`
+prints the change of every median latency against an earlier result file, and exits with status 1
+if one of them grew by more than `--threshold`:
+
+Usage:
+    python benchmarks/bench_suite.py [--employees 5000] [--teams 100] [--days 200] [--notes 25]
+        [--db PATH] [--repeat 50] [--output results.json] [--compare baseline.json] [--threshold 1.25]
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from employee_events import backends, configure_pool, migrations
+from synthetic import generate_database, tables
+
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root / "report"))
+
+# Query methods taking no id are timed with fewer calls, they read every employee or team
+full_table_repeat = 3
+
+# The `Rows` variants of the DataFrame query methods the dashboard uses, with the same arguments
+row_methods = {
+    "model_data_rows": "model_data",
+    "cumulative_event_count_rows": "cumulative_event_counts",
+    "notes_page_rows": "notes_page",
+}
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Statistics of latencies in seconds, in microseconds."""
+    ordered = sorted(latencies)
+    return {
+        "calls": len(ordered),
+        "mean_us": statistics.fmean(ordered) * 1e6,
+        "p50_us": ordered[len(ordered) // 2] * 1e6,
+        "p95_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1e6,
+        "min_us": ordered[0] * 1e6,
+    }
+
+
+def time_calls(func: Callable[[Any], Any], ids: List[Any]) -> Dict[str, float]:
+    latencies = []
+    for id in ids:
+        start = time.perf_counter()
+        func(id)
+        latencies.append(time.perf_counter() - start)
+
+    return summarize(latencies)
+
+
+def peak_memory(func: Callable[[Any], Any], id: Any) -> int:
+    """Peak of the Python allocations during one call, in bytes."""
+    tracemalloc.start()
+    try:
+        func(id)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def query_benchmarks(ids: Dict[str, List[int]]) -> Dict[str, Callable[[Any], Any]]:
+    """Every query method of both backends, by benchmark name."""
+    benchmarks = {}
+    for backend, query_bases in backends.items():
+        for query_base in query_bases:
+            model = query_base()
+            methods = {
+                **migrations.query_methods,
+                **{method: migrations.query_methods[frame_method] for method, frame_method in row_methods.items()},
+                "bundle": (),
+            }
+            for method, args in methods.items():
+                query = getattr(model, method)
+                if args is None:
+                    benchmarks[f"query.{backend}.{model.name}.{method}"] = lambda _, query=query: query()
+                else:
+                    benchmarks[f"query.{backend}.{model.name}.{method}"] = lambda id, query=query, args=args: query(
+                        id, *args
+                    )
+
+    return benchmarks
+
+
+async def asgi_get(app, url: str) -> Tuple[int, int]:
+    """Requests a url from an ASGI app in-process, returns the status and the body size."""
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"benchmark")],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    response = {"status": 0, "size": 0}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["size"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return response["status"], response["size"]
+
+
+async def time_requests(urls: List[str], before: Callable[[], None] | None = None) -> Dict[str, float]:
+    import dashboard
+
+    latencies, sizes = [], []
+    for url in urls:
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        status, size = await asgi_get(dashboard.app, url)
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            raise RuntimeError(f"GET {url} returned {status}")
+        sizes.append(size)
+
+    return {**summarize(latencies), "mean_bytes": statistics.fmean(sizes)}
+
+
+def clear_caches() -> None:
+    import dashboard
+
+    for cache in [dashboard.bundle_cache, dashboard.BaseComponent.fragment_cache, dashboard.MatplotlibViz.cache]:
+        if cache is not None:
+            cache.clear()
+
+
+async def render_benchmarks(ids: Dict[str, List[int]]) -> Dict[str, Dict[str, float]]:
+    routes = {
+        "employee": lambda id: f"/employee/{id}",
+        "team": lambda id: f"/team/{id}",
+        "line_chart": lambda id: f"/chart/LineChart/employee/{id}/svg",
+    }
+    results = {}
+    for name, route in routes.items():
+        urls = [route(id) for id in ids["team" if name == "team" else "employee"]]
+        await time_requests(urls[:3])  # loads the classifier and the event store
+        results[f"render.cold.{name}"] = await time_requests(urls, before=clear_caches)
+        results[f"render.warm.{name}"] = await time_requests(urls)
+
+    return results
+
+
+def git_commit() -> str | None:
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, capture_output=True, text=True, check=False
+    )
+    return result.stdout.strip() or None
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Prints the change of the median latencies, returns the names of the regressed benchmarks."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline or "p50_us" not in result:
+            continue
+
+        ratio = result["p50_us"] / max(baseline[name]["p50_us"], 1e-9)
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"  {name:<60} {baseline[name]['p50_us']:>10.1f}us -> {result['p50_us']:>10.1f}us  {ratio:5.2f}x{flag}")
+        if flag:
+            regressions.append(name)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=5000, help="employees of the generated database")
+    parser.add_argument("--teams", type=int, default=100, help="teams of the generated database")
+    parser.add_argument("--days", type=int, default=200, help="working days of events of every employee")
+    parser.add_argument("--notes", type=int, default=25, help="notes per employee")
+    parser.add_argument("--db", type=Path, help="database to benchmark, generated there if it does not exist")
+    parser.add_argument("--repeat", type=int, default=50, help="random ids per benchmark")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"), help="result file")
+    parser.add_argument("--compare", type=Path, help="earlier result file to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25, help="median latency ratio counted as regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.db or Path(tmp_dir) / "synthetic.db"
+        if not path.exists():
+            start = time.perf_counter()
+            generate_database(path, args.employees, args.teams, args.days, args.notes)
+            print(f"generated {path} in {time.perf_counter() - start:.1f}s")
+        configure_pool(path=path)
+
+        from employee_events import Employee
+
+        counts = {table: int(Employee().query(f"SELECT COUNT(*) FROM {table}")[0][0]) for table in tables}
+        print(f"database: {counts}")
+
+        rng = random.Random(0)
+        ids = {
+            "employee": [rng.randint(1, counts["employee"]) for _ in range(args.repeat)],
+            "team": [rng.randint(1, counts["team"]) for _ in range(args.repeat)],
+        }
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for name, func in query_benchmarks(ids).items():
+            entity = name.split(".")[2]
+            name_ids = ids[entity]
+            func(name_ids[0])  # warm up the page cache, and the columnar event store
+            if name.endswith(("names", "all_model_data", "data_version")):
+                name_ids = name_ids[:full_table_repeat]
+            results[name] = {**time_calls(func, name_ids), "peak_bytes": peak_memory(func, name_ids[0])}
+            print(f"  {name:<60} p50 {results[name]['p50_us']:>10.1f}us")
+
+        for name, result in asyncio.run(render_benchmarks(ids)).items():
+            results[name] = result
+            print(f"  {name:<60} p50 {result['p50_us']:>10.1f}us  {result['mean_bytes'] / 1024:.1f} KiB")
+
+        async def render_peaks():
+            import dashboard
+
+            for name, url in [("employee", f"/employee/{ids['employee'][0]}"), ("team", f"/team/{ids['team'][0]}")]:
+                clear_caches()
+                tracemalloc.start()
+                await asgi_get(dashboard.app, url)
+                results[f"render.cold.{name}"]["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+        asyncio.run(render_peaks())
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now(UTC).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": counts,
+            "repeat": args.repeat,
+            "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        print(f"compared with {args.compare} ({baseline['meta']['commit']}):")
+        if compare(results, baseline["results"], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
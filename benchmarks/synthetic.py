@@ -0,0 +1,181 @@
+"""Generates a synthetic employee events database of any size, with the schema of the bundled one.
+
+The bundled database is copied and emptied, so the generated one has the same tables, indexes,
+migrations and rollups. Teams, employees, events and notes are then generated by recursive CTEs
+inside SQLite, and the rollups are refreshed. The values come from a fixed integer hash of the
+ids and days instead of `random()`, so the same arguments always generate the same database and
+benchmark results can be compared between commits.
+
+Every employee has one row of events per working day, so the event table has
+`employees * days` rows, e.g. 4 million for the defaults. The teams are optionally grouped into
+departments, and the departments (or the teams) into divisions, see `employee_events.org`.
+
+Usage:
+    python benchmarks/synthetic.py OUT [--employees 20000] [--teams 400] [--days 200] [--notes 25]
+        [--departments 0] [--divisions 0]
+"""
+
+import argparse
+import shutil
+import time
+from pathlib import Path
+from sqlite3 import connect
+from typing import Any, Dict, List, Tuple
+
+from employee_events import load_org, migrate, refresh_rollups
+from employee_events.sql_execution import db_path
+
+# A deterministic hash of two integers in [0, 2**31), the "randomness" of the generated values
+_hash = "((({a}) * 1103515245 + ({b}) * 12345 + 2654435761) % 2147483648)"
+
+# The working day `n` (0 is Monday 2023-01-02), skipping the weekends
+_working_day = "date('2023-01-02', '+' || (({n}) / 5 * 7 + ({n}) % 5) || ' days')"
+
+tables = ["employee", "team", "employee_events", "notes"]
+
+# Tables of the org hierarchy, emptied with the generated tables
+org_tables = ["org_units", "team_units", "org_closure", "org_unit_daily_events"]
+
+
+def org_records(teams: int, departments: int = 0, divisions: int = 0) -> Tuple[List[Dict], List[Dict]]:
+    """Units and team units of `load_org`, each level assigned round-robin to the units of the level above.
+
+    Args:
+        teams (int): Number of teams.
+        departments (int): Number of departments above the teams, none if 0.
+        divisions (int): Number of divisions above the departments, or above the teams without departments.
+
+    Returns:
+        Tuple[List[Dict], List[Dict]]: The unit records and the team unit records.
+    """
+    units: List[Dict[str, Any]] = []
+    team_units: List[Dict[str, Any]] = []
+    children, next_id = list(range(1, teams + 1)), 1
+    for level, count in [("department", departments), ("division", divisions)]:
+        if not count:
+            continue
+
+        unit_ids = list(range(next_id, next_id + count))
+        parents = {child: unit_ids[i % count] for i, child in enumerate(children)}
+        if units:
+            for unit in units:
+                unit["parent_id"] = parents.get(unit["org_unit_id"], unit["parent_id"])
+        else:
+            team_units = [{"team_id": team_id, "org_unit_id": unit_id} for team_id, unit_id in parents.items()]
+
+        units += [
+            {"org_unit_id": id, "org_unit_name": f"{level.title()} {id}", "level": level, "parent_id": ""}
+            for id in unit_ids
+        ]
+        children, next_id = unit_ids, next_id + count
+
+    return units, team_units
+
+
+def generate_database(
+    path: Path | str,
+    employees: int = 20_000,
+    teams: int = 400,
+    days: int = 200,
+    notes: int = 25,
+    departments: int = 0,
+    divisions: int = 0,
+) -> Dict[str, int]:
+    """Writes a synthetic database, replacing the file at `path`.
+
+    Args:
+        path (Path | str): The database file to write.
+        employees (int): Number of employees, assigned round-robin to the teams.
+        teams (int): Number of teams.
+        days (int): Working days of events of every employee.
+        notes (int): Notes per employee, spread over the days.
+        departments (int): Number of departments above the teams, see `org_records`.
+        divisions (int): Number of divisions above the departments or teams.
+
+    Returns:
+        Dict[str, int]: The number of rows of every generated table.
+    """
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    shutil.copy(db_path, path)
+    migrate(path)
+
+    db_conn = connect(path, isolation_level=None)
+    try:
+        db_conn.execute("PRAGMA journal_mode = OFF")
+        db_conn.execute("PRAGMA synchronous = OFF")
+        db_conn.execute("PRAGMA cache_size = -262144")  # 256 MiB, keeps the indexes being built in memory
+        params = {"employees": employees, "teams": teams, "days": days, "notes": notes}
+
+        db_conn.execute("BEGIN")
+        for table in [*tables, *org_tables, "risk_scores"]:
+            db_conn.execute(f"DELETE FROM {table}")
+
+        db_conn.execute(
+            """WITH RECURSIVE ids(id) AS (SELECT 1 UNION ALL SELECT id + 1 FROM ids WHERE id < :teams)
+               INSERT INTO team ("index", team_id, team_name, shift, manager_name)
+               SELECT id - 1, id, 'Team ' || id, CASE id % 3 WHEN 0 THEN 'Night' ELSE 'Day' END, 'Manager ' || id
+               FROM ids""",
+            params,
+        )
+        db_conn.execute(
+            """WITH RECURSIVE ids(id) AS (SELECT 1 UNION ALL SELECT id + 1 FROM ids WHERE id < :employees)
+               INSERT INTO employee ("index", employee_id, first_name, last_name, team_id)
+               SELECT id - 1, id, 'First' || id, 'Last' || id, (id - 1) % :teams + 1
+               FROM ids""",
+            params,
+        )
+        # generated day by day, so the events are appended in the order of the event dates
+        db_conn.execute(
+            f"""WITH RECURSIVE
+                   ids(id) AS (SELECT 1 UNION ALL SELECT id + 1 FROM ids WHERE id < :employees),
+                   day_numbers(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM day_numbers WHERE n < :days - 1)
+               INSERT INTO employee_events
+                   ("index", event_date, employee_id, team_id, positive_events, negative_events)
+               SELECT n * :employees + id - 1, {_working_day.format(n="n")}, id, (id - 1) % :teams + 1,
+                      {_hash.format(a="id", b="n")} % 5, {_hash.format(a="n", b="id")} % 4 - 1
+               FROM day_numbers, ids""",
+            params,
+        )
+        db_conn.execute(
+            f"""WITH RECURSIVE
+                   ids(id) AS (SELECT 1 UNION ALL SELECT id + 1 FROM ids WHERE id < :employees),
+                   note_numbers(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM note_numbers WHERE n < :notes - 1)
+               INSERT INTO notes ("index", employee_id, team_id, note, note_date)
+               SELECT n * :employees + id - 1, id, (id - 1) % :teams + 1, 'Synthetic note ' || n || ' of ' || id,
+                      {_working_day.format(n=f"{_hash.format(a='id', b='n')} % :days")}
+               FROM note_numbers, ids
+               WHERE :notes > 0""",
+            params,
+        )
+        refresh_rollups(db_conn, full=True)
+        units, team_units = org_records(teams, departments, divisions)
+        org_counts = load_org(db_conn, units, team_units) if units else {}
+        db_conn.execute("COMMIT")
+        db_conn.execute("ANALYZE")
+
+        return {table: db_conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables} | org_counts
+    finally:
+        db_conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out", type=Path, help="database file to write")
+    parser.add_argument("--employees", type=int, default=20_000, help="number of employees")
+    parser.add_argument("--teams", type=int, default=400, help="number of teams")
+    parser.add_argument("--days", type=int, default=200, help="working days of events of every employee")
+    parser.add_argument("--notes", type=int, default=25, help="notes per employee")
+    parser.add_argument("--departments", type=int, default=0, help="number of departments above the teams")
+    parser.add_argument("--divisions", type=int, default=0, help="number of divisions above the departments")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate_database(
+        args.out, args.employees, args.teams, args.days, args.notes, args.departments, args.divisions
+    )
+    print(f"generated {counts} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
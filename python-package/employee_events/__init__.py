@@ -1,11 +1,90 @@
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
 __all__ = [
     "Employee",
     "Team",
+    "OrgUnit",
+    "org_levels",
     "QueryBase",
+    "ColumnarEmployee",
+    "ColumnarTeam",
+    "EventStore",
+    "backends",
+    "EntityBundle",
+    "DateRange",
+    "Rows",
     "QueryMixin",
+    "ConnectionPool",
+    "configure_pool",
+    "get_pool",
+    "query_hooks",
+    "migrate",
+    "check_schema",
+    "load_org",
+    "refresh_rollups",
+    "ingest_records",
+    "ingest_file",
+    "read_records",
+    "store_risk_scores",
 ]
 
-from employee_events.employee import Employee
-from employee_events.query_base import QueryBase
-from employee_events.sql_execution import QueryMixin
-from employee_events.team import Team
+# Module of every exported name. The modules are imported on the first access of one of their
+# names (PEP 562), so e.g. the migrations never import NumPy for the columnar backend.
+_modules = {
+    "ColumnarEmployee": "columnar",
+    "ColumnarTeam": "columnar",
+    "EventStore": "columnar",
+    "backends": "columnar",
+    "DateRange": "date_range",
+    "Employee": "employee",
+    "EntityBundle": "entity_bundle",
+    "ingest_file": "ingest",
+    "ingest_records": "ingest",
+    "read_records": "ingest",
+    "check_schema": "migrations",
+    "migrate": "migrations",
+    "load_org": "org",
+    "OrgUnit": "org_unit",
+    "org_levels": "org_unit",
+    "QueryBase": "query_base",
+    "store_risk_scores": "risk_scores",
+    "Rows": "rows",
+    "refresh_rollups": "rollups",
+    "ConnectionPool": "sql_execution",
+    "QueryMixin": "sql_execution",
+    "configure_pool": "sql_execution",
+    "get_pool": "sql_execution",
+    "query_hooks": "sql_execution",
+    "Team": "team",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _modules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f"{__name__}.{_modules[name]}"), name)
+    globals()[name] = value  # later accesses skip __getattr__
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted({*globals(), *__all__})
+
+
+if TYPE_CHECKING:
+    from employee_events.columnar import ColumnarEmployee, ColumnarTeam, EventStore, backends
+    from employee_events.date_range import DateRange
+    from employee_events.employee import Employee
+    from employee_events.entity_bundle import EntityBundle
+    from employee_events.ingest import ingest_file, ingest_records, read_records
+    from employee_events.migrations import check_schema, migrate
+    from employee_events.org import load_org
+    from employee_events.org_unit import OrgUnit, org_levels
+    from employee_events.query_base import QueryBase
+    from employee_events.risk_scores import store_risk_scores
+    from employee_events.rollups import refresh_rollups
+    from employee_events.rows import Rows
+    from employee_events.sql_execution import ConnectionPool, QueryMixin, configure_pool, get_pool, query_hooks
+    from employee_events.team import Team
@@ -0,0 +1,141 @@
+"""Command line interface of the employee events database.
+
+python -m employee_events migrate [--db PATH] [--target VERSION]
+python -m employee_events check [--db PATH]
+python -m employee_events explain [--db PATH]
+python -m employee_events refresh-rollups [--db PATH] [--full]
+python -m employee_events ingest {events,notes} FILE [--db PATH] [--chunk-size N] [--skip-invalid] [--no-refresh]
+python -m employee_events load-org UNITS_FILE TEAMS_FILE [--db PATH]
+"""
+
+import argparse
+from pathlib import Path
+from sqlite3 import connect
+from typing import List
+
+from employee_events.employee import Employee
+from employee_events.ingest import ingest_file, read_records
+from employee_events.migrations import check_schema, explain, migrate
+from employee_events.org import load_org
+from employee_events.org_unit import OrgUnit, org_levels
+from employee_events.rollups import refresh_rollups
+from employee_events.sql_execution import ConnectionPool, db_path
+from employee_events.team import Team
+
+
+def run_migrate(args: argparse.Namespace) -> None:
+    applied = migrate(args.db, args.target)
+    print(f"applied migrations {applied}" if applied else "database already up to date")
+
+
+def run_check(args: argparse.Namespace) -> None:
+    pool = ConnectionPool(args.db, size=1)
+    problems = check_schema(pool)
+    pool.close()
+
+    print("\n".join(problems) or "schema up to date")
+    raise SystemExit(1 if problems else 0)
+
+
+def run_explain(args: argparse.Namespace) -> None:
+    pool = ConnectionPool(args.db, size=1)
+    for query_base in [Employee(), Team(), *(OrgUnit(level) for level in org_levels(pool))]:
+        for method, plan in explain(query_base, pool=pool).items():
+            print(f"{type(query_base).__name__}({query_base.name}).{method}")
+            print("\n".join(f"    {line}" for line in plan))
+    pool.close()
+
+
+def run_refresh_rollups(args: argparse.Namespace) -> None:
+    db_conn = connect(args.db)
+    try:
+        with db_conn:
+            since = refresh_rollups(db_conn, full=args.full)
+    finally:
+        db_conn.close()
+
+    if since is None:
+        print("rollups already up to date")
+    else:
+        print(f"refreshed rollups from {since or 'the first event'}")
+
+
+def run_ingest(args: argparse.Namespace) -> None:
+    table = {"events": "employee_events", "notes": "notes"}[args.kind]
+    result = ingest_file(
+        args.file,
+        table,
+        args.db,
+        chunk_size=args.chunk_size,
+        skip_invalid=args.skip_invalid,
+        refresh=not args.no_refresh,
+    )
+
+    print(
+        f"ingested {result.rows} rows into {table} in {result.seconds:.2f}s ({result.rows_per_second:,.0f} rows/s)"
+        + (f", rejected {result.rejected}" if result.rejected else "")
+    )
+    print("\n".join(result.errors))
+
+
+def run_load_org(args: argparse.Namespace) -> None:
+    db_conn = connect(args.db)
+    try:
+        with db_conn:
+            counts = load_org(db_conn, read_records(args.units), read_records(args.teams))
+    finally:
+        db_conn.close()
+
+    print(f"loaded the org hierarchy {counts}")
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m employee_events", description="Manage the employee events database."
+    )
+    parser.add_argument("--db", type=Path, default=db_path, help="path to the SQLite database")
+    commands = parser.add_subparsers(required=True)
+
+    # `--db` is also accepted after the command, without overriding one given before it
+    db_parent = argparse.ArgumentParser(add_help=False)
+    db_parent.add_argument("--db", type=Path, default=argparse.SUPPRESS, help="path to the SQLite database")
+
+    command = commands.add_parser("migrate", parents=[db_parent], help="apply the pending schema migrations")
+    command.add_argument("--target", type=int, default=None, help="version to migrate to")
+    command.set_defaults(run=run_migrate)
+
+    command = commands.add_parser("check", parents=[db_parent], help="check the schema version and indexes")
+    command.set_defaults(run=run_check)
+
+    command = commands.add_parser(
+        "explain", parents=[db_parent], help="print the query plan of every Employee and Team query"
+    )
+    command.set_defaults(run=run_explain)
+
+    command = commands.add_parser(
+        "refresh-rollups", parents=[db_parent], help="aggregate the appended events into the rollups"
+    )
+    command.add_argument("--full", action="store_true", help="recompute every rollup")
+    command.set_defaults(run=run_refresh_rollups)
+
+    command = commands.add_parser(
+        "ingest", parents=[db_parent], help="append the events or notes of a CSV or JSONL file"
+    )
+    command.add_argument("kind", choices=["events", "notes"], help="what the file contains")
+    command.add_argument("file", type=Path, help="a .csv file with a header row, or a .jsonl file")
+    command.add_argument("--chunk-size", type=int, default=10_000, help="rows written per transaction")
+    command.add_argument("--skip-invalid", action="store_true", help="skip invalid rows instead of stopping")
+    command.add_argument("--no-refresh", action="store_true", help="leave the rollups and caches as they are")
+    command.set_defaults(run=run_ingest)
+
+    command = commands.add_parser("load-org", parents=[db_parent], help="replace the org hierarchy above the teams")
+    command.add_argument("units", type=Path, help="org_unit_id, org_unit_name, level and parent_id of every unit")
+    command.add_argument("teams", type=Path, help="team_id and org_unit_id of every team in the hierarchy")
+    command.set_defaults(run=run_load_org)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Columnar in-memory copy of `employee_events`, aggregated with NumPy.
+
+`ColumnarEmployee` and `ColumnarTeam` have the interface of `Employee` and `Team`, but answer
+`daily_event_rows`, `model_data_rows` and `all_model_data` from an `EventStore` instead of SQL.
+The store reads `employee_events` once, sums the events per entity and date, and
+keeps the result as NumPy arrays sorted by entity id and date, with the offset of every entity.
+A query is then a binary search on the ids and a slice of the arrays.
+
+The store is reloaded when the rollup `data_version` changes, which is checked at most every
+`refresh_interval` seconds. Names, notes and the model data within a date range are still read
+with SQL. The dashboard selects the backend by name from `backends`.
+"""
+
+import itertools
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from sqlite3 import Connection
+from typing import TYPE_CHECKING, Any, Dict, Sequence, Tuple, override
+
+import numpy as np
+
+from employee_events.date_range import DateRange
+from employee_events.employee import Employee
+from employee_events.query_base import QueryBase
+from employee_events.rows import Rows
+from employee_events.sql_execution import ConnectionPool, get_pool
+from employee_events.team import Team
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _data_frame(columns: Dict[str, Any]) -> "pd.DataFrame":
+    """The query results as a DataFrame, pandas is imported by the first query instead of this module."""
+    import pandas as pd
+
+    return pd.DataFrame(columns)
+
+
+def _group_sums(keys: Sequence[np.ndarray], values: Sequence[np.ndarray]) -> Tuple[list, list]:
+    """Sums `values` over the rows sharing all `keys`, sorted by the keys in order."""
+    order = np.lexsort(keys[::-1])
+    sorted_keys = [key[order] for key in keys]
+    if not len(order):
+        return sorted_keys, [value[:0].astype(np.int64) for value in values]
+
+    changes = np.ones(len(order), dtype=bool)
+    changes[1:] = np.logical_or.reduce([key[1:] != key[:-1] for key in sorted_keys])
+    starts = np.flatnonzero(changes)
+
+    return [key[starts] for key in sorted_keys], [np.add.reduceat(value[order], starts) for value in values]
+
+
+def _buckets(event_date: np.ndarray, max_points: int) -> np.ndarray:
+    """First day of the day, week or month of sorted dates, like `QueryBase.daily_event_rows`."""
+    if not len(event_date) or (event_date[-1] - event_date[0]).astype(int) + 1 <= max_points:
+        return event_date
+    if (event_date[-1] - event_date[0]).astype(int) + 1 <= max_points * 7:
+        days = event_date.astype(np.int64)
+        return (days - (days + 3) % 7).astype("datetime64[D]")  # 1970-01-01 was a Thursday
+
+    return event_date.astype("datetime64[M]").astype("datetime64[D]")
+
+
+@dataclass(frozen=True)
+class Segments:
+    """Rows sorted by entity id, the rows of `ids[i]` are `offsets[i]:offsets[i + 1]`.
+
+    Attributes:
+        ids (np.ndarray): Sorted unique entity ids.
+        offsets (np.ndarray): Start of the rows of every id, followed by the number of rows.
+        columns (Dict[str, np.ndarray]): The row values, by column name.
+    """
+
+    ids: np.ndarray
+    offsets: np.ndarray
+    columns: Dict[str, np.ndarray]
+
+    @classmethod
+    def from_sorted(cls, entity_ids: np.ndarray, columns: Dict[str, np.ndarray]) -> "Segments":
+        starts = np.flatnonzero(np.r_[True, entity_ids[1:] != entity_ids[:-1]]) if len(entity_ids) else entity_ids
+        return cls(entity_ids[starts], np.r_[starts, len(entity_ids)], columns)
+
+    def rows(self, id: int) -> slice:
+        """The rows of an entity id, empty if it has none."""
+        i = np.searchsorted(self.ids, id)
+        if i == len(self.ids) or self.ids[i] != id:
+            return slice(0, 0)
+
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def cumsum(self, column: str) -> np.ndarray:
+        """Running sum of a column, restarting at every entity."""
+        total = np.cumsum(self.columns[column])
+        before = np.r_[0, total][self.offsets[:-1]]
+        return total - np.repeat(before, np.diff(self.offsets))
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.offsets.nbytes + sum(column.nbytes for column in self.columns.values())
+
+
+class EventStore:
+    """The events of every employee and team, summed per date and per employee.
+
+    Args:
+        employee_id, team_id, event_date, positive_events, negative_events (np.ndarray): The
+            columns of `employee_events`, in any order.
+        data_version (int): The rollup data version the events were read at.
+    """
+
+    def __init__(
+        self,
+        employee_id: np.ndarray,
+        team_id: np.ndarray,
+        event_date: np.ndarray,
+        positive_events: np.ndarray,
+        negative_events: np.ndarray,
+        data_version: int = 0,
+    ):
+        self.data_version = data_version
+        self.daily: Dict[str, Segments] = {}
+        self.totals: Dict[str, Segments] = {}
+
+        events = (positive_events, negative_events)
+        for name, entity_id in [("employee", employee_id), ("team", team_id)]:
+            (ids, dates), (positive, negative) = _group_sums((entity_id, event_date), events)
+            daily = Segments.from_sorted(
+                ids, {"event_date": dates, "positive_events": positive, "negative_events": negative}
+            )
+            daily.columns["cumulative_positive_events"] = daily.cumsum("positive_events")
+            daily.columns["cumulative_negative_events"] = daily.cumsum("negative_events")
+            self.daily[name] = daily
+
+            # model data rows, one per employee of the entity like `employee_event_totals`
+            (ids, employees), (positive, negative) = _group_sums((entity_id, employee_id), events)
+            self.totals[name] = Segments.from_sorted(
+                ids, {"employee_id": employees, "positive_events": positive, "negative_events": negative}
+            )
+
+    @classmethod
+    def load(cls, db_conn: Connection, data_version: int = 0) -> "EventStore":
+        """Reads `employee_events` from a database connection.
+
+        Args:
+            db_conn (Connection): An open connection to the employee events database.
+            data_version (int): The rollup data version, recorded on the store.
+
+        Returns:
+            EventStore: The loaded store.
+        """
+        # every column as an integer, so the rows stream into a single array without a list of tuples
+        cursor = db_conn.execute(
+            """SELECT employee_id, team_id, CAST(julianday(event_date) - 2440587.5 AS INTEGER),
+                      positive_events, negative_events
+               FROM employee_events"""
+        )
+        columns = np.fromiter(itertools.chain.from_iterable(cursor), dtype=np.int64).reshape(-1, 5).T
+
+        return cls(
+            columns[0].astype(np.int32),
+            columns[1].astype(np.int32),
+            columns[2].astype("datetime64[D]"),
+            columns[3],
+            columns[4],
+            data_version,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the arrays of the store."""
+        return sum(segments.nbytes for segments in [*self.daily.values(), *self.totals.values()])
+
+
+# Seconds between two checks of the data version of a loaded store
+refresh_interval = 1.0
+
+_stores: Dict[Path, Tuple[EventStore, float]] = {}
+_stores_lock = threading.Lock()
+
+
+def get_event_store(pool: ConnectionPool | None = None) -> EventStore:
+    """Returns the event store of a pool's database, loading it on first use or after a rollup refresh.
+
+    Args:
+        pool (ConnectionPool | None): Pool of the database, the shared one by default.
+
+    Returns:
+        EventStore: The events of the database.
+    """
+    pool = pool or get_pool()
+    store, checked_at = _stores.get(pool.path, (None, 0.0))
+    if store is not None and time.monotonic() - checked_at < refresh_interval:
+        return store
+
+    # the connection is checked out before taking the lock, so a thread waiting for the lock
+    # never holds up the loading thread on an exhausted pool
+    with pool.connection() as db_conn, _stores_lock:
+        data_version = db_conn.execute(
+            "SELECT COALESCE(MAX(value), 0) FROM rollup_state WHERE name = 'data_version'"
+        ).fetchone()[0]
+
+        store, _ = _stores.get(pool.path, (None, 0.0))
+        if store is None or store.data_version != data_version:
+            store = EventStore.load(db_conn, data_version)
+
+        _stores[pool.path] = store, time.monotonic()
+        return store
+
+
+def clear_event_stores() -> None:
+    """Drops the loaded stores, e.g. after a database file was replaced by one with the same data version."""
+    with _stores_lock:
+        _stores.clear()
+
+
+class ColumnarQueryMixin:
+    """Answers the event queries of a `QueryBase` from the `EventStore`."""
+
+    if TYPE_CHECKING:  # provided by the `QueryBase` the mixin is combined with
+        pool: ConnectionPool | None
+        dates: DateRange | None
+
+        @property
+        def name(self) -> str: ...
+
+    # the model data and the event counts of a bundle are read from the store
+    sql_sections = ("state", "username", "notes")
+
+    def event_store(self) -> EventStore:
+        return get_event_store(self.pool)
+
+    def daily_event_rows(
+        self,
+        id: int,
+        columns: Dict[str, str],
+        aggregate: str,
+        dates: DateRange | None = None,
+        max_points: int | None = None,
+    ) -> Rows:
+        daily = self.event_store().daily[self.name]
+        rows = daily.rows(id)
+        event_date = daily.columns["event_date"][rows]
+
+        # the dates of an entity are sorted, the range is found by binary search
+        dates = dates or self.dates or DateRange()
+        first = np.searchsorted(event_date, np.datetime64(dates.start, "D")) if dates.start else 0
+        last = np.searchsorted(event_date, np.datetime64(dates.end, "D"), side="right") if dates.end else None
+        rows = slice(rows.start + first, rows.start + (last if last is not None else len(event_date)))
+        event_date = event_date[first:last]
+        values = {name: daily.columns[column][rows] for name, column in columns.items()}
+
+        if max_points is not None and len(event_date):
+            buckets = _buckets(event_date, max_points)
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            event_date = buckets[starts]
+            if aggregate == "SUM":
+                values = {name: np.add.reduceat(value, starts) for name, value in values.items()}
+            else:  # LAST
+                values = {name: value[np.r_[starts[1:], len(buckets)] - 1] for name, value in values.items()}
+
+        return Rows.from_columns({"event_date": np.datetime_as_string(event_date, unit="D"), **values})
+
+
+class ColumnarEmployee(ColumnarQueryMixin, Employee):
+    """`Employee` answering the event queries from memory."""
+
+    @override
+    def model_data_rows(self, id: int, dates: DateRange | None = None) -> Rows:
+        if dates or self.dates:  # the store only keeps lifetime totals per employee
+            return super().model_data_rows(id, dates)
+
+        totals = self.event_store().totals[self.name]
+        rows = totals.rows(id)
+        if rows.start == rows.stop:  # like SUM over no rows in SQL
+            return Rows(["positive_events", "negative_events"], [(None, None)])
+
+        return Rows(
+            ["positive_events", "negative_events"],
+            [(int(totals.columns["positive_events"][rows].sum()), int(totals.columns["negative_events"][rows].sum()))],
+        )
+
+    @override
+    def all_model_data(self) -> "pd.DataFrame":
+        daily = self.event_store().daily[self.name]
+        ends = daily.offsets[1:] - 1
+        return _data_frame(
+            {
+                f"{self.name}_id": daily.ids.astype(np.int64),
+                "positive_events": daily.columns["cumulative_positive_events"][ends],
+                "negative_events": daily.columns["cumulative_negative_events"][ends],
+            }
+        )
+
+
+class ColumnarTeam(ColumnarQueryMixin, Team):
+    """`Team` answering the event queries from memory."""
+
+    @override
+    def model_data_rows(self, id: int, dates: DateRange | None = None) -> Rows:
+        if dates or self.dates:  # the store only keeps lifetime totals per employee
+            return super().model_data_rows(id, dates)
+
+        totals = self.event_store().totals[self.name]
+        rows = totals.rows(id)
+        return Rows.from_columns(
+            {
+                "positive_events": totals.columns["positive_events"][rows],
+                "negative_events": totals.columns["negative_events"][rows],
+            }
+        )
+
+    @override
+    def all_model_data(self) -> "pd.DataFrame":
+        totals = self.event_store().totals[self.name]
+        return _data_frame(
+            {
+                f"{self.name}_id": np.repeat(totals.ids, np.diff(totals.offsets)).astype(np.int64),
+                "positive_events": totals.columns["positive_events"],
+                "negative_events": totals.columns["negative_events"],
+            }
+        )
+
+
+# Query classes of the employees and teams, by backend name
+backends: Dict[str, Tuple[type[QueryBase], type[QueryBase]]] = {
+    "sqlite": (Employee, Team),
+    "columnar": (ColumnarEmployee, ColumnarTeam),
+}
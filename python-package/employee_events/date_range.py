@@ -0,0 +1,72 @@
+"""Date ranges and buckets restricting the event queries to a bounded slice of the history."""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Tuple
+
+# Date expressions of the event date buckets, every bucket is labelled with its first day
+bucket_expressions = {
+    "day": "event_date",
+    "week": "date(event_date, '-6 days', 'weekday 1')",
+    "month": "date(event_date, 'start of month')",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class DateRange:
+    """Inclusive range of event dates, open on the sides that are `None`.
+
+    Attributes:
+        start (str | None): First ISO date of the range.
+        end (str | None): Last ISO date of the range.
+
+    Raises:
+        ValueError: If a date is not an ISO date, or the range ends before it starts.
+    """
+
+    start: str | None = None
+    end: str | None = None
+
+    def __post_init__(self):
+        for name in ["start", "end"]:
+            value = getattr(self, name)
+            if value is not None:
+                object.__setattr__(self, name, date.fromisoformat(str(value)).isoformat())
+
+        if self.start and self.end and self.end < self.start:
+            raise ValueError(f"Date range ends on {self.end} before it starts on {self.start}.")
+
+    @classmethod
+    def last(cls, days: int, end: str | None = None) -> "DateRange":
+        """The rolling window of the last `days` days, up to and including `end`.
+
+        Args:
+            days (int): Number of days in the window.
+            end (str | None): Last ISO date of the window, today by default.
+
+        Returns:
+            DateRange: The window.
+
+        Raises:
+            ValueError: If the window has no days.
+        """
+        if days < 1:
+            raise ValueError(f"A rolling window has at least one day, not {days}.")
+
+        last_day = date.fromisoformat(end) if end else date.today()
+        return cls((last_day - timedelta(days=days - 1)).isoformat(), last_day.isoformat())
+
+    def sql(self, column: str = "event_date") -> Tuple[str, Dict[str, str]]:
+        """Conditions selecting the range, to append to a WHERE clause, and their parameters.
+
+        Args:
+            column (str): The ISO date column to filter.
+
+        Returns:
+            Tuple[str, Dict[str, str]]: The `AND ...` conditions, empty for an open range, and the
+                `start`/`end` parameters.
+        """
+        params = {name: value for name, value in [("start", self.start), ("end", self.end)] if value is not None}
+        operators = {"start": ">=", "end": "<="}
+        conditions = "".join(f" AND {column} {operators[name]} :{name}" for name in params)
+        return conditions, params
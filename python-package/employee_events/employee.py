@@ -1,8 +1,10 @@
-from typing import List, Tuple, override
+from typing import TYPE_CHECKING, List, Tuple, override
 
-import pandas as pd
+from employee_events.date_range import DateRange
+from employee_events.query_base import QueryBase, Statement
 
-from employee_events.query_base import QueryBase
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class Employee(QueryBase):
@@ -33,42 +35,81 @@ class Employee(QueryBase):
                     ORDER BY employee_id;
                     """
 
-        return self.query(sql_query)
+        return self.query(sql_query, method="names")
 
     @override
-    def username(self, id: int) -> List[Tuple[str, ...]]:
-        """Retrieves the full name of a specific employee by ID.
+    def username_statement(self, id: int) -> Statement:
+        """The statement retrieving the full name of a specific employee by ID.
 
         Args:
             id (int): The employee ID to filter by.
 
         Returns:
-            List[Tuple[str, ...]]: A list containing a single tuple with the employee's full name.
+            Statement: The query of the employee's full name, and its parameters.
         """
-        sql_query = f"""
+        sql_query = """
                     SELECT 
                         first_name || ' ' || last_name AS full_name
                     FROM employee
-                    WHERE employee_id = {id};
+                    WHERE employee_id = :id;
                     """
-        return self.query(sql_query)
+        return sql_query, {"id": id}
 
     @override
-    def model_data(self, id: int) -> pd.DataFrame:
-        """Aggregates positive and negative events for a specific employee.
+    def model_data_statement(self, id: int, dates: DateRange | None = None) -> Statement:
+        """The statement aggregating positive and negative events for a specific employee.
+
+        The lifetime totals are read from the `employee_event_totals` rollup, the totals within a
+        date range are summed from the `employee_daily_events` rollup.
 
         Args:
             id (int): The employee ID to filter by.
+            dates (DateRange | None): The event dates to sum, the `dates` of the instance by default.
 
         Returns:
-            pd.DataFrame: A DataFrame containing the total positive and negative events.
+            Statement: The query of the total positive and negative events and the employee_id, and its
+                parameters.
         """
+        dates = dates or self.dates
+        if dates is not None:
+            conditions, params = dates.sql("daily.event_date")
+            sql_query = f"""
+                        SELECT COALESCE(SUM(daily.positive_events), 0) positive_events
+                             , COALESCE(SUM(daily.negative_events), 0) negative_events
+                             , {self.name}.{self.name}_id
+                        FROM {self.name}
+                        LEFT JOIN employee_daily_events daily
+                            ON daily.{self.name}_id = {self.name}.{self.name}_id{conditions}
+                        WHERE {self.name}.{self.name}_id = :id
+                    """
+            return sql_query, {"id": id, **params}
+
         sql_query = f"""
                     SELECT SUM(positive_events) positive_events
                          , SUM(negative_events) negative_events
+                         , {self.name}.{self.name}_id
+                    FROM {self.name}
+                    JOIN employee_event_totals
+                        USING({self.name}_id)
+                    WHERE {self.name}.{self.name}_id = :id
+                """
+        return sql_query, {"id": id}
+
+    @override
+    def all_model_data(self) -> "pd.DataFrame":
+        """Aggregates positive and negative events for every employee.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing employee_id and the total positive and negative events.
+        """
+        sql_query = f"""
+                    SELECT {self.name}_id
+                         , SUM(positive_events) positive_events
+                         , SUM(negative_events) negative_events
                     FROM {self.name}
-                    JOIN employee_events
+                    JOIN employee_event_totals
                         USING({self.name}_id)
-                    WHERE {self.name}.{self.name}_id = {id}
+                    GROUP BY {self.name}_id
+                    ORDER BY {self.name}_id
                 """
-        return self.pandas_query(sql_query)
+        return self.pandas_query(sql_query, method="all_model_data")
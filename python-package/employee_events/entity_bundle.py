@@ -0,0 +1,54 @@
+"""Everything the dashboard shows for one employee or team, fetched together.
+
+`QueryBase.bundle` reads the parts of a report in a single statement, the `UNION ALL` of their
+queries, so all the parts come from the same snapshot of the database. The components of a
+report share the returned bundle instead of querying separately.
+"""
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+from employee_events.date_range import DateRange
+from employee_events.rows import Rows
+
+
+@dataclass(frozen=True, slots=True)
+class EntityBundle:
+    """The data of one employee or team, as read in a single statement.
+
+    The rows are shared by every component using the bundle, and should be treated as read-only.
+
+    Attributes:
+        entity_type (str): `"employee"` or `"team"`, the `QueryBase.name` of the entity.
+        entity_id (int): The employee_id or team_id.
+        username (str): Full name of the employee or name of the team.
+        data_version (int): The rollup data version the bundle was read at.
+        cumulative_event_counts (Rows): Running sums of the daily positive_events and
+            negative_events, by event_date or by the buckets of `QueryBase.bundle`'s `max_points`.
+        model_data (Rows): Input of the recruitment risk classifier, one row per employee.
+        notes (Rows): First page of the notes, see `QueryBase.notes_page_rows`.
+        notes_limit (int): Maximum number of notes in `notes`.
+        risk_scores (Mapping[str, float]): Current stored risk score, by model version.
+        dates (DateRange | None): The dates the events, model data and notes are restricted to.
+    """
+
+    entity_type: str
+    entity_id: int
+    username: str
+    data_version: int
+    cumulative_event_counts: Rows
+    model_data: Rows
+    notes: Rows
+    notes_limit: int
+    risk_scores: Mapping[str, float] = MappingProxyType({})
+    dates: DateRange | None = None
+
+    def risk_score(self, model_version: str) -> float | None:
+        """Returns the stored risk score computed by `model_version`, `None` if there is none."""
+        return self.risk_scores.get(model_version)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the bundle's rows."""
+        return self.cumulative_event_counts.nbytes + self.model_data.nbytes + self.notes.nbytes
@@ -0,0 +1,217 @@
+"""Streaming bulk ingest of events and notes from CSV or JSONL files.
+
+Records are read lazily and written in chunks, each chunk with a single `executemany` in its
+own transaction, so the memory use does not depend on the size of the input. The database is
+switched to WAL mode during the ingest, so the dashboard keeps reading while a file is ingested,
+and back to its journal mode afterwards: read-only connections to a WAL database need the -wal and
+-shm files, and write access to their directory. The database stays in WAL mode while other
+connections, e.g. of a running dashboard, lock it.
+
+Every record is validated before it is written: the columns of the table are required, ids
+and event counts must be integers, dates must be ISO formatted, and the employee_id and team_id
+must exist in the `employee` and `team` tables. After the ingest the rollups are refreshed
+incrementally and the `data_version` is incremented, which invalidates the dashboard caches:
+
+    python -m employee_events ingest events FILE [--db PATH] [--chunk-size N] [--skip-invalid]
+    python -m employee_events ingest notes FILE [--db PATH] [--chunk-size N] [--skip-invalid]
+"""
+
+import csv
+import itertools
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from sqlite3 import Connection, OperationalError, connect
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+from employee_events.rollups import increment_data_version, refresh_rollups
+from employee_events.sql_execution import db_path
+
+# Columns of every ingestible table, with the conversion of their values
+tables: Dict[str, Dict[str, Callable[[Any], Any]]] = {
+    "employee_events": {
+        "event_date": lambda value: date.fromisoformat(str(value)).isoformat(),
+        "employee_id": int,
+        "team_id": int,
+        "positive_events": int,
+        "negative_events": int,
+    },
+    "notes": {
+        "employee_id": int,
+        "team_id": int,
+        "note": str,
+        "note_date": lambda value: date.fromisoformat(str(value)).isoformat(),
+    },
+}
+
+
+@dataclass
+class IngestResult:
+    """Outcome of an ingest.
+
+    Attributes:
+        table (str): The table the records were written to.
+        rows (int): Number of written rows.
+        rejected (int): Number of skipped invalid records.
+        seconds (float): Duration of the ingest, including the rollup refresh.
+        errors (List[str]): The first validation errors, for the skipped records.
+    """
+
+    table: str
+    rows: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def read_records(path: Path | str) -> Iterator[Mapping[str, Any]]:
+    """Lazily reads the records of a CSV file with a header row, or of a JSONL file.
+
+    Args:
+        path (Path | str): A `.csv` or `.jsonl` file.
+
+    Yields:
+        Mapping[str, Any]: One record per row or line.
+    """
+    path = Path(path)
+    with path.open(newline="") as file:
+        if path.suffix == ".csv":
+            yield from csv.DictReader(file)
+        elif path.suffix in (".jsonl", ".ndjson"):
+            yield from (json.loads(line) for line in file if line.strip())
+        else:
+            raise ValueError(f"Unsupported file type {path.suffix!r}, use .csv or .jsonl.")
+
+
+def _convert(record: Mapping[str, Any], table: str, employee_ids: set, team_ids: set) -> Tuple:
+    columns = tables[table]
+    missing = [column for column in columns if column not in record]
+    if missing:
+        raise ValueError(f"missing columns {missing}")
+
+    row = tuple(convert(record[column]) for column, convert in columns.items())
+    values = dict(zip(columns, row))
+    if values["employee_id"] not in employee_ids:
+        raise ValueError(f"unknown employee_id {values['employee_id']}")
+    if values["team_id"] not in team_ids:
+        raise ValueError(f"unknown team_id {values['team_id']}")
+
+    return row
+
+
+def _validate(
+    records: Iterable[Mapping[str, Any]],
+    table: str,
+    employee_ids: set,
+    team_ids: set,
+    skip_invalid: bool,
+    result: IngestResult,
+) -> Iterator[Tuple]:
+    for number, record in enumerate(records, start=1):
+        try:
+            row = _convert(record, table, employee_ids, team_ids)
+        except (TypeError, ValueError) as error:
+            if not skip_invalid:
+                raise ValueError(f"Invalid {table} record {number}: {error}") from error
+
+            result.rejected += 1
+            if len(result.errors) < 10:
+                result.errors.append(f"record {number}: {error}")
+        else:
+            yield row
+
+
+def ingest_records(
+    records: Iterable[Mapping[str, Any]],
+    table: str,
+    db_conn: Connection,
+    chunk_size: int = 10_000,
+    skip_invalid: bool = False,
+    refresh: bool = True,
+) -> IngestResult:
+    """Appends records to `employee_events` or `notes`, one transaction per chunk.
+
+    Chunks written before an invalid record stay written when `skip_invalid` is false.
+
+    Args:
+        records (Iterable[Mapping[str, Any]]): The records, e.g. from `read_records`.
+        table (str): `"employee_events"` or `"notes"`.
+        db_conn (Connection): A writable connection in autocommit mode (`isolation_level=None`).
+        chunk_size (int): Records written per transaction.
+        skip_invalid (bool): Skips and counts invalid records instead of raising `ValueError`.
+        refresh (bool): Refreshes the rollups and increments the data version afterwards.
+
+    Returns:
+        IngestResult: The number of written and rejected rows, and the throughput.
+    """
+    if table not in tables:
+        raise ValueError(f"Unknown table {table!r}, expected one of {list(tables)}.")
+
+    start = time.perf_counter()
+    result = IngestResult(table)
+
+    journal_mode = db_conn.execute("PRAGMA journal_mode").fetchone()[0]
+    db_conn.execute("PRAGMA journal_mode = WAL")
+    try:
+        db_conn.execute("PRAGMA synchronous = NORMAL")
+        db_conn.execute("PRAGMA cache_size = -65536")  # 64 MiB, keeps the index pages being updated in memory
+        employee_ids = {row[0] for row in db_conn.execute("SELECT employee_id FROM employee")}
+        team_ids = {row[0] for row in db_conn.execute("SELECT team_id FROM team")}
+
+        columns = ", ".join(tables[table])
+        placeholders = ", ".join("?" for _ in tables[table])
+        insert = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+
+        rows = _validate(records, table, employee_ids, team_ids, skip_invalid, result)
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            db_conn.execute("BEGIN")
+            try:
+                db_conn.executemany(insert, chunk)
+                db_conn.execute("COMMIT")
+            except Exception:
+                db_conn.execute("ROLLBACK")
+                raise
+            result.rows += len(chunk)
+
+        if refresh and result.rows:
+            db_conn.execute("BEGIN")
+            try:
+                # notes are not rolled up, but are cached by data version as well
+                if refresh_rollups(db_conn) is None:
+                    increment_data_version(db_conn)
+                db_conn.execute("COMMIT")
+            except Exception:
+                db_conn.execute("ROLLBACK")
+                raise
+    finally:
+        try:
+            db_conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        except OperationalError:  # other connections are reading, leaving WAL mode needs exclusive access
+            pass
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def ingest_file(path: Path | str, table: str, db: Path | str = db_path, **kwargs) -> IngestResult:
+    """Streams a CSV or JSONL file into a table, see `ingest_records` for the keyword arguments.
+
+    Args:
+        path (Path | str): A `.csv` or `.jsonl` file.
+        table (str): `"employee_events"` or `"notes"`.
+        db (Path | str): Path to the SQLite database.
+
+    Returns:
+        IngestResult: The number of written and rejected rows, and the throughput.
+    """
+    db_conn = connect(db, isolation_level=None)
+    try:
+        return ingest_records(read_records(path), table, db_conn, **kwargs)
+    finally:
+        db_conn.close()
@@ -0,0 +1,286 @@
+"""Versioned schema migrations for the employee events database.
+
+The schema version is stored in `PRAGMA user_version`. Every migration runs in its own
+transaction and bumps the version, so `migrate` can be re-run safely after new migrations
+are added. The command line interface applies, checks and explains the schema:
+
+    python -m employee_events migrate [--db PATH]
+    python -m employee_events check [--db PATH]
+    python -m employee_events explain [--db PATH]
+"""
+
+import copy
+from dataclasses import dataclass
+from pathlib import Path
+from sqlite3 import Connection, connect
+from typing import Any, Callable, Dict, List, Tuple
+
+from employee_events import org, risk_scores, rollups
+from employee_events.date_range import DateRange
+from employee_events.query_base import QueryBase
+from employee_events.rows import Rows
+from employee_events.sql_execution import ConnectionPool, Params, db_path, get_pool
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A schema change applied once, in `version` order.
+
+    Attributes:
+        version (int): Schema version reached after the migration.
+        description (str): Short summary of the change.
+        statements (Tuple[str, ...]): SQL statements run in a single transaction.
+        indexes (Tuple[str, ...]): Names of the indexes the migration creates.
+        callback (Callable[[Connection], Any] | None): Run after the statements, in the same transaction.
+    """
+
+    version: int
+    description: str
+    statements: Tuple[str, ...]
+    indexes: Tuple[str, ...] = ()
+    callback: Callable[[Connection], Any] | None = None
+
+
+migrations: List[Migration] = [
+    Migration(
+        version=1,
+        description="covering indexes for the per-employee and per-team queries",
+        statements=(
+            """CREATE INDEX IF NOT EXISTS ix_employee_employee_id
+                   ON employee (employee_id)""",
+            """CREATE INDEX IF NOT EXISTS ix_team_team_id
+                   ON team (team_id)""",
+            """CREATE INDEX IF NOT EXISTS ix_employee_events_employee_date
+                   ON employee_events (employee_id, event_date, positive_events, negative_events)""",
+            """CREATE INDEX IF NOT EXISTS ix_employee_events_team_date
+                   ON employee_events (team_id, event_date, positive_events, negative_events)""",
+            """CREATE INDEX IF NOT EXISTS ix_employee_events_team_employee
+                   ON employee_events (team_id, employee_id, positive_events, negative_events)""",
+            """CREATE INDEX IF NOT EXISTS ix_notes_employee_date
+                   ON notes (employee_id, note_date)""",
+            """CREATE INDEX IF NOT EXISTS ix_notes_team_date
+                   ON notes (team_id, note_date)""",
+            "ANALYZE",
+        ),
+        indexes=(
+            "ix_employee_employee_id",
+            "ix_team_team_id",
+            "ix_employee_events_employee_date",
+            "ix_employee_events_team_date",
+            "ix_employee_events_team_employee",
+            "ix_notes_employee_date",
+            "ix_notes_team_date",
+        ),
+    ),
+    Migration(
+        version=2,
+        description="daily, cumulative and lifetime event rollups",
+        statements=(
+            """CREATE TABLE IF NOT EXISTS employee_daily_events (
+                   employee_id INTEGER NOT NULL,
+                   event_date TEXT NOT NULL,
+                   positive_events INTEGER NOT NULL,
+                   negative_events INTEGER NOT NULL,
+                   cumulative_positive_events INTEGER NOT NULL,
+                   cumulative_negative_events INTEGER NOT NULL,
+                   PRIMARY KEY (employee_id, event_date)
+               ) WITHOUT ROWID""",
+            """CREATE TABLE IF NOT EXISTS team_daily_events (
+                   team_id INTEGER NOT NULL,
+                   event_date TEXT NOT NULL,
+                   positive_events INTEGER NOT NULL,
+                   negative_events INTEGER NOT NULL,
+                   cumulative_positive_events INTEGER NOT NULL,
+                   cumulative_negative_events INTEGER NOT NULL,
+                   PRIMARY KEY (team_id, event_date)
+               ) WITHOUT ROWID""",
+            """CREATE TABLE IF NOT EXISTS employee_event_totals (
+                   employee_id INTEGER NOT NULL,
+                   team_id INTEGER NOT NULL,
+                   positive_events INTEGER NOT NULL,
+                   negative_events INTEGER NOT NULL,
+                   PRIMARY KEY (employee_id, team_id)
+               ) WITHOUT ROWID""",
+            """CREATE INDEX IF NOT EXISTS ix_employee_event_totals_team
+                   ON employee_event_totals (team_id, employee_id, positive_events, negative_events)""",
+            """CREATE INDEX IF NOT EXISTS ix_employee_events_date
+                   ON employee_events (event_date)""",
+            """CREATE TABLE IF NOT EXISTS rollup_state (
+                   name TEXT PRIMARY KEY,
+                   value INTEGER NOT NULL
+               )""",
+        ),
+        indexes=("ix_employee_event_totals_team", "ix_employee_events_date"),
+        # the rollups are filled by the full refresh of the latest rollup migration, as
+        # `refresh_rollups` writes the latest rollup tables
+    ),
+    Migration(
+        version=3,
+        description="stored recruitment-risk scores",
+        statements=risk_scores.create_statements,
+        indexes=("ix_risk_scores_entity",),
+    ),
+    Migration(
+        version=4,
+        description="org hierarchy above the teams, with its closure and bottom-up event rollups",
+        statements=org.create_statements,
+        indexes=("ix_org_units_level", "ix_org_units_parent", "ix_team_units_unit"),
+    ),
+    Migration(
+        version=5,
+        description="team of the events in the daily employee rollup, for the team model data within dates",
+        statements=(
+            "DROP TABLE employee_daily_events",
+            """CREATE TABLE employee_daily_events (
+                   employee_id INTEGER NOT NULL,
+                   team_id INTEGER NOT NULL,
+                   event_date TEXT NOT NULL,
+                   positive_events INTEGER NOT NULL,
+                   negative_events INTEGER NOT NULL,
+                   cumulative_positive_events INTEGER NOT NULL,
+                   cumulative_negative_events INTEGER NOT NULL,
+                   PRIMARY KEY (employee_id, event_date, team_id)
+               ) WITHOUT ROWID""",
+        ),
+        callback=lambda db_conn: rollups.refresh_rollups(db_conn, full=True),
+    ),
+]
+
+
+def schema_version(db_conn: Connection) -> int:
+    """Returns the schema version stored in the database."""
+    return db_conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version() -> int:
+    """Returns the version reached once every migration is applied."""
+    return max(migration.version for migration in migrations)
+
+
+def migrate(path: Path | str = db_path, target: int | None = None) -> List[int]:
+    """Applies the pending migrations up to `target`.
+
+    Args:
+        path (Path | str): Path to the SQLite database file.
+        target (int | None): Version to migrate to, the latest one by default.
+
+    Returns:
+        List[int]: The versions that were applied.
+    """
+    target = latest_version() if target is None else target
+    applied = []
+
+    db_conn = connect(path, isolation_level=None)
+    try:
+        current = schema_version(db_conn)
+        for migration in sorted(migrations, key=lambda m: m.version):
+            if not current < migration.version <= target:
+                continue
+
+            db_conn.execute("BEGIN")
+            try:
+                for statement in migration.statements:
+                    db_conn.execute(statement)
+                if migration.callback is not None:
+                    migration.callback(db_conn)
+                db_conn.execute(f"PRAGMA user_version = {migration.version}")
+                db_conn.execute("COMMIT")
+            except Exception:
+                db_conn.execute("ROLLBACK")
+                raise
+
+            applied.append(migration.version)
+    finally:
+        db_conn.close()
+
+    return applied
+
+
+def expected_indexes() -> List[str]:
+    """Returns the names of all indexes created by the migrations."""
+    return [index for migration in migrations for index in migration.indexes]
+
+
+def check_schema(pool: ConnectionPool | None = None) -> List[str]:
+    """Lists the problems with the schema of the database behind `pool`.
+
+    Args:
+        pool (ConnectionPool | None): Pool to check, the shared one by default.
+
+    Returns:
+        List[str]: A description of every missing migration or index, empty if up to date.
+    """
+    with (pool or get_pool()).connection() as db_conn:
+        version = schema_version(db_conn)
+        indexes = {row[0] for row in db_conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    problems = []
+    if version < latest_version():
+        problems.append(f"schema version {version} is behind the latest migration {latest_version()}")
+    problems += [f"index {index} is missing" for index in expected_indexes() if index not in indexes]
+
+    return problems
+
+
+# QueryBase methods issuing a query, with their arguments other than the entity id
+query_methods = {
+    "names": None,
+    "username": (),
+    "model_data": (),
+    "all_model_data": None,
+    "data_version": None,
+    "event_counts": (DateRange("2024-01-01", "2024-06-30"),),
+    "cumulative_event_counts": (DateRange("2024-01-01"),),
+    "notes": (),
+    "notes_page": (50, "2024-01-01/1"),
+    "risk_score": ("",),
+    "risk_state": (),
+    "risk_history": (),
+}
+
+
+def captured_statements(query_base: QueryBase, id: int) -> Dict[str, Tuple[str, Params]]:
+    """Records the SQL and parameters of every query a `QueryBase` issues for `id`, without running them.
+
+    Args:
+        query_base (QueryBase): The employee or team query class.
+        id (int): The employee_id or team_id passed to the queries.
+
+    Returns:
+        Dict[str, Tuple[str, Params]]: The statement of each query method, by method name.
+    """
+    statements: Dict[str, Tuple[str, Params]] = {}
+    recorder = copy.copy(query_base)
+
+    for method, args in query_methods.items():
+
+        def record(sql_query: str, params: Params = (), method: str = "", query_method: str = method):
+            statements[query_method] = (sql_query, params)
+            # a single row of zeros, as wide as the model data with its employee_id, keeps the result
+            # indexing of the callers working
+            return Rows(["value", "employee_id"], [(0, 0)])
+
+        recorder.query = recorder.rows = recorder.pandas_query = record  # type: ignore[method-assign]
+        getattr(recorder, method)(*(() if args is None else (id, *args)))
+
+    return statements
+
+
+def explain(query_base: QueryBase, id: int = 1, pool: ConnectionPool | None = None) -> Dict[str, List[str]]:
+    """Runs EXPLAIN QUERY PLAN on every query a `QueryBase` issues.
+
+    Args:
+        query_base (QueryBase): The employee or team query class.
+        id (int): The employee_id or team_id passed to the queries.
+        pool (ConnectionPool | None): Pool to explain the queries on, the shared one by default.
+
+    Returns:
+        Dict[str, List[str]]: The query plan lines of each query method, by method name.
+    """
+    plans = {}
+    with (pool or get_pool()).connection() as db_conn:
+        for method, (sql_query, params) in captured_statements(query_base, id).items():
+            rows = db_conn.execute(f"EXPLAIN QUERY PLAN {sql_query.strip()}", params).fetchall()
+            plans[method] = [detail for *_, detail in rows]
+
+    return plans
@@ -0,0 +1,171 @@
+"""Organization hierarchy above the teams, e.g. departments and divisions.
+
+The hierarchy has any number of levels:
+
+- `org_units`: the units of every level, with their parent unit and their depth below the top
+  level. The depth is computed when the hierarchy is loaded.
+- `team_units`: the unit every team belongs to, usually one of the lowest level.
+- `org_closure`: every unit paired with itself and each unit below it, at any depth. The teams of a
+  unit are then found with one index search instead of a recursive query. The closure is rebuilt
+  by a recursive CTE whenever the hierarchy is loaded.
+- `org_unit_daily_events`: the daily and cumulative events of every unit, rolled up bottom-up by
+  `rollups.refresh_rollups`, see `rollups.refresh_org_rollups`.
+
+The hierarchy is replaced as a whole, from two CSV or JSONL files:
+
+    python -m employee_events load-org UNITS_FILE TEAMS_FILE [--db PATH]
+"""
+
+from sqlite3 import Connection
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Tuple
+
+from employee_events import rollups
+
+create_statements = (
+    """CREATE TABLE IF NOT EXISTS org_units (
+           org_unit_id INTEGER PRIMARY KEY,
+           org_unit_name TEXT NOT NULL,
+           level TEXT NOT NULL,
+           parent_id INTEGER,
+           depth INTEGER NOT NULL
+       )""",
+    """CREATE INDEX IF NOT EXISTS ix_org_units_level
+           ON org_units (level, org_unit_id, org_unit_name)""",
+    """CREATE INDEX IF NOT EXISTS ix_org_units_parent
+           ON org_units (parent_id, org_unit_id)""",
+    """CREATE TABLE IF NOT EXISTS team_units (
+           team_id INTEGER PRIMARY KEY,
+           org_unit_id INTEGER NOT NULL
+       )""",
+    """CREATE INDEX IF NOT EXISTS ix_team_units_unit
+           ON team_units (org_unit_id, team_id)""",
+    """CREATE TABLE IF NOT EXISTS org_closure (
+           ancestor_id INTEGER NOT NULL,
+           descendant_id INTEGER NOT NULL,
+           PRIMARY KEY (ancestor_id, descendant_id)
+       ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS org_unit_daily_events (
+           org_unit_id INTEGER NOT NULL,
+           event_date TEXT NOT NULL,
+           positive_events INTEGER NOT NULL,
+           negative_events INTEGER NOT NULL,
+           cumulative_positive_events INTEGER NOT NULL,
+           cumulative_negative_events INTEGER NOT NULL,
+           PRIMARY KEY (org_unit_id, event_date)
+       ) WITHOUT ROWID""",
+)
+
+# Columns of the unit and team records, with the conversion of their values
+columns: Dict[str, Dict[str, Callable[[Any], Any]]] = {
+    "org_units": {
+        "org_unit_id": int,
+        "org_unit_name": str,
+        "level": str,
+        "parent_id": lambda value: None if value in (None, "") else int(value),
+    },
+    "team_units": {
+        "team_id": int,
+        "org_unit_id": int,
+    },
+}
+
+
+def _convert(records: Iterable[Mapping[str, Any]], table: str) -> List[Tuple]:
+    rows = []
+    for number, record in enumerate(records, start=1):
+        try:
+            rows.append(tuple(convert(record[column]) for column, convert in columns[table].items()))
+        except (KeyError, TypeError, ValueError) as error:
+            raise ValueError(f"Invalid {table} record {number}: {error!r}") from error
+    return rows
+
+
+def unit_depths(parents: Mapping[int, int | None]) -> Dict[int, int]:
+    """Depth of every unit below the top level, from the parent of every unit.
+
+    Args:
+        parents (Mapping[int, int | None]): The parent_id of every org_unit_id, `None` at the top level.
+
+    Returns:
+        Dict[int, int]: The depth of every org_unit_id, 0 at the top level.
+
+    Raises:
+        ValueError: If a parent is not a unit, or a unit is its own ancestor.
+    """
+    depths: Dict[int, int] = {}
+    for unit_id in parents:
+        chain: List[int] = []
+        current = unit_id
+        while current is not None and current not in depths:
+            if current not in parents:
+                raise ValueError(f"Unknown parent_id {current} of org unit {chain[-1]}.")
+            if current in chain:
+                raise ValueError(f"Org unit {current} is its own ancestor.")
+            chain.append(current)
+            current = parents[current]
+
+        depth = -1 if current is None else depths[current]
+        for offset, chained_id in enumerate(reversed(chain), start=1):
+            depths[chained_id] = depth + offset
+
+    return depths
+
+
+def load_org(
+    db_conn: Connection, units: Iterable[Mapping[str, Any]], team_units: Iterable[Mapping[str, Any]]
+) -> Dict[str, int]:
+    """Replaces the org hierarchy and rolls up its events, within the caller's transaction.
+
+    Args:
+        db_conn (Connection): A writable connection to the database.
+        units (Iterable[Mapping[str, Any]]): Records of org_unit_id, org_unit_name, level and
+            parent_id, empty for the units of the top level.
+        team_units (Iterable[Mapping[str, Any]]): Records of team_id and org_unit_id.
+
+    Returns:
+        Dict[str, int]: The number of rows of every hierarchy table.
+
+    Raises:
+        ValueError: If a record or level is invalid, the units are not a hierarchy, or a team or unit does not exist.
+    """
+    unit_rows = _convert(units, "org_units")
+    team_rows = _convert(team_units, "team_units")
+
+    for unit_id, _, level, _ in unit_rows:
+        if not level.isidentifier() or level in ("employee", "team"):
+            raise ValueError(f"Invalid level {level!r} of org unit {unit_id}.")
+
+    depths = unit_depths({unit_id: parent_id for unit_id, _, _, parent_id in unit_rows})
+    team_ids = {team_id for (team_id,) in db_conn.execute("SELECT team_id FROM team")}
+    for team_id, org_unit_id in team_rows:
+        if team_id not in team_ids:
+            raise ValueError(f"Unknown team_id {team_id}.")
+        if org_unit_id not in depths:
+            raise ValueError(f"Unknown org_unit_id {org_unit_id} of team {team_id}.")
+
+    for table in ["org_units", "team_units", "org_closure", "org_unit_daily_events"]:
+        db_conn.execute(f"DELETE FROM {table}")
+
+    db_conn.executemany("INSERT INTO org_units VALUES (?, ?, ?, ?, ?)", [(*row, depths[row[0]]) for row in unit_rows])
+    db_conn.executemany("INSERT INTO team_units VALUES (?, ?)", team_rows)
+    db_conn.execute(
+        """
+        INSERT INTO org_closure
+        WITH RECURSIVE closure(ancestor_id, descendant_id) AS (
+            SELECT org_unit_id, org_unit_id FROM org_units
+            UNION ALL
+            SELECT closure.ancestor_id, child.org_unit_id
+            FROM closure
+            JOIN org_units child ON child.parent_id = closure.descendant_id
+        )
+        SELECT ancestor_id, descendant_id FROM closure
+        """
+    )
+
+    rollups.refresh_org_rollups(db_conn)
+    rollups.increment_data_version(db_conn)
+
+    return {
+        table: db_conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ["org_units", "team_units", "org_closure", "org_unit_daily_events"]
+    }
@@ -0,0 +1,189 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, override
+
+from employee_events.date_range import DateRange
+from employee_events.query_base import QueryBase, Statement
+from employee_events.sql_execution import ConnectionPool, get_pool
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# The unit `:id` if it is of the `:level`, so the id of a unit of another level selects nothing
+unit_id = "(SELECT org_unit_id FROM org_units WHERE org_unit_id = :id AND level = :level)"
+
+# The teams below the unit `:id` of the `:level`, at any depth of the org hierarchy
+unit_teams = f"""
+                        SELECT team_units.team_id
+                        FROM org_closure
+                        JOIN team_units
+                            ON team_units.org_unit_id = org_closure.descendant_id
+                        WHERE org_closure.ancestor_id = {unit_id}
+                    """
+
+
+def org_levels(pool: ConnectionPool | None = None) -> List[str]:
+    """Retrieves the levels of the org hierarchy, from the lowest to the highest.
+
+    Args:
+        pool (ConnectionPool | None): Pool of the database, the shared one by default.
+
+    Returns:
+        List[str]: The levels, e.g. `["department", "division"]`, empty without a hierarchy.
+    """
+    with (pool or get_pool()).connection() as db_conn:
+        rows = db_conn.execute("SELECT level FROM org_units GROUP BY level ORDER BY MAX(depth) DESC, level").fetchall()
+    return [level for (level,) in rows]
+
+
+class OrgUnit(QueryBase):
+    """Query class for retrieving the data of the units of one level of the org hierarchy, e.g. departments.
+
+    A unit covers the employees of every team below it. Its events are read from the
+    `org_unit_daily_events` rollup, its model data from the `employee_event_totals` of its teams,
+    found through `org_closure`.
+
+    Args:
+        level (str): The level of the units, also the `name` of the query class.
+        dates (DateRange | None): Restricts the events, model data and notes, see `QueryBase`.
+
+    Raises:
+        ValueError: If the level is not a valid identifier.
+    """
+
+    def __init__(self, level: str, dates: DateRange | None = None):
+        if not level.isidentifier():
+            raise ValueError(f"Invalid org level {level!r}.")
+
+        super().__init__(dates)
+        self.level = level
+
+    @property
+    @override
+    def name(self) -> str:
+        """Returns the level of the units.
+
+        Returns:
+            str: The level, e.g. `"department"`.
+        """
+        return self.level
+
+    @property
+    @override
+    def rollup(self) -> str:
+        return "org_unit"
+
+    @property
+    @override
+    def notes_condition(self) -> str:
+        return f"team_id IN ({unit_teams})"
+
+    @property
+    @override
+    def rollup_condition(self) -> str:
+        return f"org_unit_id = {unit_id}"
+
+    @override
+    def id_params(self, id: int) -> Dict[str, Any]:
+        return {"id": id, "level": self.level}
+
+    @override
+    def names(self) -> List[Tuple[str, ...]]:
+        """Retrieves the names and IDs of all units of the level.
+
+        Returns:
+            List[Tuple[str, ...]]: A list of tuples containing unit name and org_unit_id.
+        """
+        sql_query = """
+                    SELECT
+                        org_unit_name,
+                        org_unit_id
+                    FROM org_units
+                    WHERE level = :level
+                    ORDER BY org_unit_id;
+                    """
+        return self.query(sql_query, {"level": self.level}, method="names")
+
+    @override
+    def username_statement(self, id: int) -> Statement:
+        """The statement retrieving the name of a specific unit by ID.
+
+        Args:
+            id (int): The org_unit_id to filter by.
+
+        Returns:
+            Statement: The query of the unit name, and its parameters.
+        """
+        sql_query = """
+                    SELECT org_unit_name
+                    FROM org_units
+                    WHERE level = :level
+                        AND org_unit_id = :id;
+                    """
+        return sql_query, self.id_params(id)
+
+    @override
+    def model_data_statement(self, id: int, dates: DateRange | None = None) -> Statement:
+        """The statement aggregating positive and negative events per employee below a specific unit.
+
+        The per-employee totals are summed over the teams of the unit from the `employee_event_totals`
+        rollup, within a date range from the events in those teams in the `employee_daily_events`
+        rollup. An employee of several teams of the unit is a single row.
+
+        Args:
+            id (int): The org_unit_id to filter by.
+            dates (DateRange | None): The event dates to sum, the `dates` of the instance by default.
+
+        Returns:
+            Statement: The query of employee-level sums of positive and negative events and the employee_id,
+                and its parameters.
+        """
+        dates = dates or self.dates
+        if dates is not None:
+            conditions, params = dates.sql("daily.event_date")
+            sql_query = f"""
+                        SELECT COALESCE(SUM(daily.positive_events), 0) positive_events
+                             , COALESCE(SUM(daily.negative_events), 0) negative_events
+                             , totals.employee_id
+                        FROM employee_event_totals totals
+                        LEFT JOIN employee_daily_events daily
+                            ON daily.employee_id = totals.employee_id AND daily.team_id = totals.team_id{conditions}
+                        WHERE totals.team_id IN ({unit_teams})
+                        GROUP BY totals.employee_id
+                        ORDER BY totals.employee_id
+                        """
+            return sql_query, {**self.id_params(id), **params}
+
+        sql_query = f"""
+                    SELECT SUM(positive_events) positive_events
+                         , SUM(negative_events) negative_events
+                         , employee_id
+                    FROM employee_event_totals
+                    WHERE team_id IN ({unit_teams})
+                    GROUP BY employee_id
+                    ORDER BY employee_id
+                    """
+        return sql_query, self.id_params(id)
+
+    @override
+    def all_model_data(self) -> "pd.DataFrame":
+        """Aggregates positive and negative events per employee for every unit of the level.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing the org_unit_id, as `{level}_id`, and the
+                employee-level sums of positive and negative events.
+        """
+        sql_query = f"""
+                    SELECT unit.org_unit_id {self.name}_id
+                         , SUM(totals.positive_events) positive_events
+                         , SUM(totals.negative_events) negative_events
+                    FROM org_units unit
+                    JOIN org_closure
+                        ON org_closure.ancestor_id = unit.org_unit_id
+                    JOIN team_units
+                        ON team_units.org_unit_id = org_closure.descendant_id
+                    JOIN employee_event_totals totals
+                        ON totals.team_id = team_units.team_id
+                    WHERE unit.level = :level
+                    GROUP BY unit.org_unit_id, totals.employee_id
+                    ORDER BY unit.org_unit_id, totals.employee_id
+                    """
+        return self.pandas_query(sql_query, {"level": self.level}, method="all_model_data")
@@ -1,64 +1,532 @@
 from abc import ABC, abstractmethod
-from typing import List, Tuple
-
-import pandas as pd
+from datetime import date
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
 
+from employee_events.date_range import DateRange, bucket_expressions
+from employee_events.entity_bundle import EntityBundle
+from employee_events.rows import Rows
 from employee_events.sql_execution import QueryMixin
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+# The SQL text and the named parameters of a query, e.g. of a part of `QueryBase.bundle`
+Statement = Tuple[str, Dict[str, Any]]
+
+# Rollup columns of the running sums, by result column
+cumulative_columns = {"positive_events": "cumulative_positive_events", "negative_events": "cumulative_negative_events"}
+
+# Columns of the input of the recruitment risk classifier, see `QueryBase.model_data_rows`
+model_data_columns = ("positive_events", "negative_events")
+
+# Columns of the parts of a bundle, by section of the statement of `QueryBase.bundle`
+bundle_sections: Dict[str, Tuple[str, ...]] = {
+    "state": ("data_version", "model_version", "score"),
+    "username": ("username",),
+    "model_data": model_data_columns,
+    "cumulative_event_counts": ("event_date", "positive_events", "negative_events"),
+    "notes": ("note_date", "note", "cursor"),
+}
+
+# Columns ending the statements of some sections, after those of `bundle_sections`
+bundle_keys: Dict[str, Tuple[str, ...]] = {"state": ("scored_at",), "model_data": ("employee_id",)}
+
+# Order of the rows of each section of a bundle, over the columns of the statement of the section.
+# A compound select does not keep the order of its subqueries, the rows are numbered by these.
+bundle_order = {
+    "state": "scored_at",
+    "username": "NULL",
+    "model_data": "employee_id",
+    "cumulative_event_counts": "event_date",
+    "notes": "note_date, CAST(substr(cursor, length(note_date) + 2) AS INTEGER)",
+}
+
 
 class QueryBase(QueryMixin, ABC):
-    """Base class for executing SQL queries on the employee events database."""
+    """Base class for executing SQL queries on the employee events database.
+
+    Args:
+        dates (DateRange | None): Restricts the events, model data and notes of every query to these
+            dates, unless the query is given its own. Every date by default.
+    """
+
+    dates: DateRange | None = None
+
+    # Parts of `bundle` read by its statement, a backend answering `model_data_rows` or
+    # `daily_event_rows` without SQL leaves them out and `bundle` calls those methods instead
+    sql_sections: Tuple[str, ...] = tuple(bundle_sections)
+
+    def __init__(self, dates: DateRange | None = None):
+        self.dates = dates
 
     @property
     @abstractmethod
     def name(self) -> str: ...
 
+    @property
+    def rollup(self) -> str:
+        """Prefix of the daily event rollup table and of its id column, the `name` by default."""
+        return self.name
+
+    @property
+    def notes_condition(self) -> str:
+        """SQL condition selecting the notes of the employee or team `:id`."""
+        return f"{self.name}_id = :id"
+
+    @property
+    def rollup_condition(self) -> str:
+        """SQL condition selecting the daily event rollup rows of the employee or team `:id`."""
+        return f"{self.rollup}_id = :id"
+
+    def id_params(self, id: int) -> Dict[str, Any]:
+        """Parameters of the conditions selecting the employee or team, `:id` by default."""
+        return {"id": id}
+
     @abstractmethod
     def names(self) -> List[Tuple[str, ...]]: ...
 
     @abstractmethod
-    def username(self, id: int) -> List[Tuple[str, ...]]: ...
+    def username_statement(self, id: int) -> Statement: ...
+
+    def username(self, id: int) -> List[Tuple[str, ...]]:
+        """Retrieves the full name of an employee or the name of a team by ID.
+
+        Args:
+            id (int): The employee_id or team_id to filter by.
+
+        Returns:
+            List[Tuple[str, ...]]: A list containing a single tuple with the name.
+        """
+        return self.query(*self.username_statement(id), method="username")
 
     @abstractmethod
-    def model_data(self, id: int) -> pd.DataFrame: ...
+    def model_data_statement(self, id: int, dates: DateRange | None = None) -> Statement:
+        """The statement of `model_data_rows`, its rows end with the employee_id they are ordered by."""
 
-    def event_counts(self, id: int) -> pd.DataFrame:
-        """Retrieves the sum of positive and negative events grouped by event date
-        for a given employee or team ID.
+    def model_data_rows(self, id: int, dates: DateRange | None = None) -> Rows:
+        """Retrieves the input of the recruitment risk classifier for a given employee or team ID.
 
         Args:
             id (int): The employee_id or team_id to filter by.
+            dates (DateRange | None): The event dates to sum, the `dates` of the instance by default.
 
         Returns:
-            pd.DataFrame: A DataFrame containing event_date, positive_events, and negative_events.
+            Rows: Rows of positive_events and negative_events, one per employee.
         """
+        rows = self.rows(*self.model_data_statement(id, dates), method="model_data_rows")
+        return Rows(model_data_columns, (row[: len(model_data_columns)] for row in rows))
+
+    def model_data(self, id: int, dates: DateRange | None = None) -> "pd.DataFrame":
+        """The `model_data_rows` of an employee or team as a DataFrame, the input of the classifier."""
+        return self.model_data_rows(id, dates).to_frame()
+
+    @abstractmethod
+    def all_model_data(self) -> "pd.DataFrame": ...
+
+    def data_version(self) -> int:
+        """Retrieves the version of the event rollups, incremented whenever they are refreshed.
+
+        Returns:
+            int: The rollup data version, 0 if they were never refreshed.
+        """
+        sql_query = """
+                    SELECT COALESCE(MAX(value), 0)
+                    FROM rollup_state
+                    WHERE name = 'data_version';
+                    """
+        return int(self.query(sql_query, method="data_version")[0][0])
+
+    def last_event_date(self) -> str | None:
+        """Retrieves the date of the latest event of any employee, the end of the rolling windows.
+
+        Returns:
+            str | None: The ISO date, `None` if there are no events.
+        """
+        return self.query("SELECT MAX(event_date) FROM employee_events;", method="last_event_date")[0][0]
+
+    def daily_event_rows(
+        self,
+        id: int,
+        columns: Dict[str, str],
+        aggregate: str,
+        dates: DateRange | None = None,
+        max_points: int | None = None,
+    ) -> Rows:
+        """Retrieves columns of the daily event rollups, see `daily_event_statement`."""
+        return self.rows(
+            *self.daily_event_statement(id, columns, aggregate, dates, max_points), method="daily_event_rows"
+        )
+
+    def daily_event_statement(
+        self,
+        id: int,
+        columns: Dict[str, str],
+        aggregate: str,
+        dates: DateRange | None = None,
+        max_points: int | None = None,
+    ) -> Statement:
+        """The statement retrieving columns of the `employee_daily_events`/`team_daily_events` rollups by event date
+        for a given employee or team ID, optionally within a date range and downsampled.
+
+        With `max_points`, the dates are grouped by day, week or month, whichever is the finest
+        resolution with at most `max_points` buckets over the selected dates, and every bucket is
+        labelled with its first day. The bucket is chosen and aggregated by the database.
+
+        Args:
+            id (int): The employee_id or team_id to filter by.
+            columns (Dict[str, str]): The rollup columns to retrieve, by result column name.
+            aggregate (str): The SQL aggregate combining the days of a bucket, e.g. `"SUM"`, or
+                `"LAST"` for the values of its last day.
+            dates (DateRange | None): The event dates to retrieve, the `dates` of the instance by default.
+            max_points (int | None): Maximum number of dates for up to `max_points` months of events.
+
+        Returns:
+            Statement: The query of event_date and the columns, and its parameters.
+        """
+        conditions, params = (dates or self.dates or DateRange()).sql()
+        params = {**self.id_params(id), **params}
+
+        if max_points is None:
+            # the employee rollup has a row per team of the employee on a date, the running sums are
+            # the same on every row of a date
+            combine = "MAX" if aggregate == "LAST" else aggregate
+            selected = ",\n                            ".join(
+                f"{combine}({column}) AS {name}" for name, column in columns.items()
+            )
+            sql_query = f"""
+                        SELECT 
+                            event_date,
+                            {selected}
+                        FROM {self.rollup}_daily_events
+                        WHERE {self.rollup_condition}{conditions}
+                        GROUP BY event_date
+                        ORDER BY event_date;
+                        """
+            return sql_query, params
+
+        if aggregate == "LAST":
+            # the bare columns of a query with a single MAX() are read from the row with the maximum
+            values = ", ".join(f"{column} AS {name}" for name, column in columns.items())
+            aggregated = f"MAX(event_date) AS last_date, {values}"
+        else:
+            aggregated = ", ".join(f"{aggregate}({column}) AS {name}" for name, column in columns.items())
+
         sql_query = f"""
+                    WITH span AS (
+                        SELECT julianday(MAX(event_date)) - julianday(MIN(event_date)) + 1 AS days
+                        FROM {self.rollup}_daily_events
+                        WHERE {self.rollup_condition}{conditions}
+                    )
                     SELECT 
                         event_date,
-                        SUM(positive_events) AS positive_events,
-                        SUM(negative_events) AS negative_events
-                    FROM employee_events
-                    WHERE {self.name}_id = {id}
-                    GROUP BY event_date
+                        {", ".join(columns)}
+                    FROM (
+                        SELECT 
+                            CASE
+                                WHEN span.days <= :max_points THEN {bucket_expressions["day"]}
+                                WHEN span.days <= :max_points * 7 THEN {bucket_expressions["week"]}
+                                ELSE {bucket_expressions["month"]}
+                            END AS event_date,
+                            {aggregated}
+                        FROM {self.rollup}_daily_events, span
+                        WHERE {self.rollup_condition}{conditions}
+                        GROUP BY 1
+                    )
                     ORDER BY event_date;
                     """
-        return self.pandas_query(sql_query)
+        return sql_query, {**params, "max_points": max_points}
+
+    def event_counts(self, id: int, dates: DateRange | None = None, max_points: int | None = None) -> "pd.DataFrame":
+        """Retrieves the sum of positive and negative events grouped by event date
+        for a given employee or team ID.
+
+        The daily sums are read from the `employee_daily_events`/`team_daily_events` rollups.
+
+        Args:
+            id (int): The employee_id or team_id to filter by.
+            dates (DateRange | None): The event dates to retrieve, the `dates` of the instance by default.
+            max_points (int | None): Sums the events by week or month instead of by day if there
+                would be more dates, see `daily_event_rows`.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing event_date, positive_events, and negative_events.
+        """
+        columns = {"positive_events": "positive_events", "negative_events": "negative_events"}
+        return self.daily_event_rows(id, columns, "SUM", dates, max_points).to_frame()
+
+    def cumulative_event_count_rows(
+        self, id: int, dates: DateRange | None = None, max_points: int | None = None
+    ) -> Rows:
+        """Retrieves the running sum of positive and negative events up to each event date
+        for a given employee or team ID.
+
+        The running sums always start at the first event, also for a date range.
+
+        Args:
+            id (int): The employee_id or team_id to filter by.
+            dates (DateRange | None): The event dates to retrieve, the `dates` of the instance by default.
+            max_points (int | None): Keeps the last running sum of every week or month instead of
+                every day if there would be more dates, see `daily_event_rows`.
+
+        Returns:
+            Rows: Rows containing event_date, positive_events, and negative_events.
+        """
+        return self.daily_event_rows(id, cumulative_columns, "LAST", dates, max_points)
+
+    def cumulative_event_counts(
+        self, id: int, dates: DateRange | None = None, max_points: int | None = None
+    ) -> "pd.DataFrame":
+        """The `cumulative_event_count_rows` of an employee or team as a DataFrame."""
+        return self.cumulative_event_count_rows(id, dates, max_points).to_frame()
 
-    def notes(self, id: int) -> pd.DataFrame:
+    def notes_rows(self, id: int, dates: DateRange | None = None) -> Rows:
         """Retrieves notes and their dates for a given employee or team ID.
 
         Args:
             id (int): The employee_id or team_id to filter by.
+            dates (DateRange | None): The note dates to retrieve, the `dates` of the instance by default.
 
         Returns:
-            pd.DataFrame: A DataFrame containing note_date and note.
+            Rows: Rows containing note_date and note.
         """
+        conditions, params = (dates or self.dates or DateRange()).sql("note_date")
         sql_query = f"""
                     SELECT 
                         note_date,
                         note
                     FROM notes
-                    WHERE {self.name}_id = {id}            
+                    WHERE {self.notes_condition}{conditions}
                     ORDER BY note_date;
                     """
-        return self.pandas_query(sql_query)
+        return self.rows(sql_query, {**self.id_params(id), **params}, method="notes_rows")
+
+    def notes(self, id: int, dates: DateRange | None = None) -> "pd.DataFrame":
+        """The `notes_rows` of an employee or team as a DataFrame."""
+        return self.notes_rows(id, dates).to_frame()
+
+    def notes_page_rows(self, id: int, limit: int, after: str | None = None, dates: DateRange | None = None) -> Rows:
+        """Retrieves a page of the notes of a given employee or team ID, see `notes_page_statement`."""
+        return self.rows(*self.notes_page_statement(id, limit, after, dates), method="notes_page_rows")
+
+    @staticmethod
+    def parse_cursor(cursor: str) -> Tuple[str, int]:
+        """Splits the cursor of a note, see `notes_page_statement`.
+
+        Args:
+            cursor (str): The cursor, `<note_date>/<rowid>`.
+
+        Returns:
+            Tuple[str, int]: The ISO note date and the rowid of the note.
+
+        Raises:
+            ValueError: If the cursor is not an ISO date and an integer separated by a slash.
+        """
+        note_date, _, rowid = cursor.rpartition("/")
+        try:
+            return date.fromisoformat(note_date).isoformat(), int(rowid)
+        except ValueError:
+            raise ValueError(f"Invalid notes cursor {cursor!r}, expected <date>/<rowid>.") from None
+
+    def notes_page_statement(
+        self, id: int, limit: int, after: str | None = None, dates: DateRange | None = None
+    ) -> Statement:
+        """The statement retrieving a page of the notes of a given employee or team ID, ordered by date.
+
+        Pages are selected with a keyset on (note_date, rowid), so every page is found
+        through the notes index, however deep into the notes it is.
+
+        Args:
+            id (int): The employee_id or team_id to filter by.
+            limit (int): Maximum number of notes in the page.
+            after (str | None): The cursor of the last note of the previous page, `None` for the first page.
+            dates (DateRange | None): The note dates to retrieve, the `dates` of the instance by default.
+
+        Returns:
+            Statement: The query of note_date, note and the cursor of each note, and its parameters.
+
+        Raises:
+            ValueError: If `after` is not a cursor, see `parse_cursor`.
+        """
+        after_date, after_rowid = self.parse_cursor(after) if after else ("", 0)
+        conditions, params = (dates or self.dates or DateRange()).sql("note_date")
+        sql_query = f"""
+                    SELECT 
+                        note_date,
+                        note,
+                        note_date || '/' || rowid AS cursor
+                    FROM notes
+                    WHERE {self.notes_condition}{conditions}
+                        AND (note_date, rowid) > (:after_date, :after_rowid)
+                    ORDER BY note_date, rowid
+                    LIMIT :limit;
+                    """
+        return sql_query, {
+            **self.id_params(id),
+            "after_date": after_date,
+            "after_rowid": after_rowid,
+            "limit": limit,
+            **params,
+        }
+
+    def notes_page(
+        self, id: int, limit: int, after: str | None = None, dates: DateRange | None = None
+    ) -> "pd.DataFrame":
+        """The `notes_page_rows` of an employee or team as a DataFrame."""
+        return self.notes_page_rows(id, limit, after, dates).to_frame()
+
+    def risk_score(self, id: int, model_version: str) -> float | None:
+        """Retrieves the latest stored recruitment risk of an employee or team, if it is current.
+
+        A score is current if it was computed by `model_version` from the current rollups.
+
+        Args:
+            id (int): The employee_id or team_id to filter by.
+            model_version (str): Version of the model that should have computed the score.
+
+        Returns:
+            float | None: The stored score, `None` if there is no current score.
+        """
+        sql_query = """
+                    SELECT score
+                    FROM risk_scores
+                    WHERE entity_type = :entity_type
+                        AND entity_id = :id
+                        AND model_version = :model_version
+                        AND data_version = (
+                            SELECT COALESCE(MAX(value), 0) FROM rollup_state WHERE name = 'data_version'
+                        )
+                    ORDER BY scored_at DESC
+                    LIMIT 1;
+                    """
+        params = {"entity_type": self.name, "id": id, "model_version": model_version}
+        result = self.query(sql_query, params, method="risk_score")
+        return float(result[0][0]) if result else None
+
+    def risk_state(self, id: int) -> List[Tuple]:
+        """Retrieves the rollup data version together with the current stored risk scores of a given
+        employee or team ID, in one query.
+
+        Args:
+            id (int): The employee_id or team_id to filter by.
+
+        Returns:
+            List[Tuple]: Tuples of data_version, model_version, score and scored_at, ordered by
+                scored_at. A single tuple with `None` model_version, score and scored_at if there is
+                no current score.
+        """
+        return self.query(*self.risk_state_statement(id), method="risk_state")
+
+    def risk_state_statement(self, id: int) -> Statement:
+        """The statement of `risk_state`."""
+        sql_query = """
+                    SELECT 
+                        state.data_version,
+                        risk_scores.model_version,
+                        risk_scores.score,
+                        risk_scores.scored_at
+                    FROM (
+                        SELECT COALESCE(MAX(value), 0) AS data_version
+                        FROM rollup_state
+                        WHERE name = 'data_version'
+                    ) state
+                    LEFT JOIN risk_scores
+                        ON risk_scores.entity_type = :entity_type
+                        AND risk_scores.entity_id = :id
+                        AND risk_scores.data_version = state.data_version
+                    ORDER BY risk_scores.scored_at;
+                    """
+        return sql_query, {"entity_type": self.name, "id": id}
+
+    def bundle(self, id: int, notes_limit: int = 50, max_points: int | None = None) -> EntityBundle:
+        """Retrieves everything a report shows for a given employee or team ID.
+
+        The parts of the bundle are read by a single statement, the `UNION ALL` of the statements
+        of the parts keyed by section and numbered in the `bundle_order` of the section, so every
+        part is read from the same state of the database in one round trip. The parts not in
+        `sql_sections` are read by their methods. The events, model data and notes are restricted
+        to the `dates` of the instance, and the stored risk scores, which are computed from every
+        event, are left out of a bundle restricted to some dates.
+
+        Args:
+            id (int): The employee_id or team_id to filter by.
+            notes_limit (int): Maximum number of notes in the first notes page.
+            max_points (int | None): Downsamples the cumulative event counts, see `daily_event_rows`.
+
+        Returns:
+            EntityBundle: The data of the employee or team.
+        """
+        statements = {
+            "state": self.risk_state_statement(id),
+            "username": self.username_statement(id),
+            "model_data": self.model_data_statement(id),
+            "cumulative_event_counts": self.daily_event_statement(id, cumulative_columns, "LAST", None, max_points),
+            "notes": self.notes_page_statement(id, notes_limit),
+        }
+        statements = {section: statements[section] for section in self.sql_sections}
+
+        # every row holds its section, its number within the section and the columns of the section,
+        # padded to the widest section
+        widths = {
+            section: len(columns) + len(bundle_keys.get(section, ())) for section, columns in bundle_sections.items()
+        }
+        selects, params = [], {}
+        for section, (sql_query, section_params) in statements.items():
+            padding = ", NULL" * (max(widths.values()) - widths[section])
+            selects.append(
+                f"SELECT '{section}', ROW_NUMBER() OVER (ORDER BY {bundle_order[section]}), *{padding} "
+                f"FROM ({sql_query.strip().rstrip(';')})"
+            )
+            params.update(section_params)  # the sections share the id and the dates of the instance
+
+        rows: Dict[str, List[Tuple]] = {section: [] for section in statements}
+        sql_query = "\nUNION ALL\n".join(selects) + "\nORDER BY 1, 2"
+        for section, _, *values in self.query(sql_query, params, method="bundle"):
+            rows[section].append(tuple(values[: len(bundle_sections[section])]))
+
+        sections = {section: Rows(bundle_sections[section], rows[section]) for section in statements}
+        if "model_data" not in sections:
+            sections["model_data"] = self.model_data_rows(id)
+        if "cumulative_event_counts" not in sections:
+            sections["cumulative_event_counts"] = self.cumulative_event_count_rows(id, max_points=max_points)
+        username, state = rows["username"], rows["state"]
+
+        return EntityBundle(
+            entity_type=self.name,
+            entity_id=id,
+            username=username[0][0] if username else "",
+            data_version=state[0][0],
+            dates=self.dates,
+            cumulative_event_counts=sections["cumulative_event_counts"],
+            model_data=sections["model_data"],
+            notes=sections["notes"],
+            notes_limit=notes_limit,
+            risk_scores=MappingProxyType(
+                {
+                    model_version: float(score)
+                    for _, model_version, score in state
+                    if model_version is not None and self.dates is None
+                }
+            ),
+        )
+
+    def risk_history(self, id: int) -> "pd.DataFrame":
+        """Retrieves every stored recruitment risk of an employee or team.
+
+        Args:
+            id (int): The employee_id or team_id to filter by.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing scored_at, score and model_version.
+        """
+        sql_query = """
+                    SELECT 
+                        scored_at,
+                        score,
+                        model_version
+                    FROM risk_scores
+                    WHERE entity_type = :entity_type
+                        AND entity_id = :id
+                    ORDER BY scored_at;
+                    """
+        return self.pandas_query(sql_query, {"entity_type": self.name, "id": id}, method="risk_history")
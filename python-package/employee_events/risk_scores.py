@@ -0,0 +1,57 @@
+"""Stored recruitment-risk scores.
+
+The scores are computed outside of this package, by the classifier of the dashboard, and
+appended to `risk_scores` with the version of the model and of the event rollups they were
+computed from. Older rows are kept as the score history of each employee and team.
+"""
+
+from datetime import UTC, datetime
+from sqlite3 import Connection
+from typing import Mapping
+
+create_statements = (
+    """CREATE TABLE IF NOT EXISTS risk_scores (
+           entity_type TEXT NOT NULL,
+           entity_id INTEGER NOT NULL,
+           score REAL NOT NULL,
+           model_version TEXT NOT NULL,
+           data_version INTEGER NOT NULL,
+           scored_at TEXT NOT NULL
+       )""",
+    """CREATE INDEX IF NOT EXISTS ix_risk_scores_entity
+           ON risk_scores (entity_type, entity_id, scored_at)""",
+)
+
+
+def store_risk_scores(
+    db_conn: Connection,
+    entity_type: str,
+    scores: Mapping[int, float],
+    model_version: str,
+    data_version: int,
+    scored_at: datetime | None = None,
+) -> int:
+    """Appends the risk scores of many employees or teams, within the caller's transaction.
+
+    Args:
+        db_conn (Connection): A writable connection to the database.
+        entity_type (str): `"employee"` or `"team"`, the `QueryBase.name` of the scored entities.
+        scores (Mapping[int, float]): The risk score of each employee_id or team_id.
+        model_version (str): Identifies the model that computed the scores.
+        data_version (int): The `QueryBase.data_version` the scores were computed from.
+        scored_at (datetime | None): Time of the scoring, now by default.
+
+    Returns:
+        int: The number of stored scores.
+    """
+    scored_at = scored_at or datetime.now(UTC)
+    db_conn.executemany(
+        """INSERT INTO risk_scores (entity_type, entity_id, score, model_version, data_version, scored_at)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        [
+            (entity_type, entity_id, score, model_version, data_version, scored_at.isoformat(timespec="seconds"))
+            for entity_id, score in scores.items()
+        ],
+    )
+
+    return len(scores)
@@ -0,0 +1,196 @@
+"""Pre-aggregated event rollups, kept up to date incrementally.
+
+The rollup tables are created by the schema migrations, which keep the SQL of every version:
+
+- `employee_daily_events` / `team_daily_events`: positive and negative events per entity and
+  date, with their running (cumulative) sums. The employee rollup is also keyed by the team of
+  the events (schema version 5), its running sums cover every team of the employee.
+- `employee_event_totals`: lifetime totals per employee and team, used by `model_data`.
+- `org_unit_daily_events` (schema version 4, see `org`): the `team_daily_events` of the org
+  hierarchy, rolled up bottom-up.
+
+`employee_events` is treated as append-only. The rowid of the last aggregated event is kept in
+`rollup_state`, so a refresh only recomputes the dates from the earliest appended event onwards
+and the totals of the employees that received new events. Run a full refresh after updating or
+deleting events:
+
+    python -m employee_events refresh-rollups [--full] [--db PATH]
+
+Every refresh increments the `data_version` stored in `rollup_state`, which caches use to
+detect changed data.
+"""
+
+from sqlite3 import Connection
+
+# Columns identifying the rows of the daily rollups, besides the event date
+daily_keys = {"employee": "employee_id, team_id", "team": "team_id"}
+
+
+def _refresh_daily(db_conn: Connection, entity: str, since: str) -> None:
+    # the running sums are ordered by date only, the rows of an employee's teams on one date are
+    # peers and share the running sums up to the end of that date
+    keys = daily_keys[entity]
+    db_conn.execute(f"DELETE FROM {entity}_daily_events WHERE event_date >= :since", {"since": since})
+    db_conn.execute(
+        f"""
+        INSERT INTO {entity}_daily_events
+        SELECT {keys}
+             , event_date
+             , positive_events
+             , negative_events
+             , previous_positive + SUM(positive_events) OVER running
+             , previous_negative + SUM(negative_events) OVER running
+        FROM (
+            SELECT {keys}
+                 , event_date
+                 , SUM(positive_events) positive_events
+                 , SUM(negative_events) negative_events
+                 , COALESCE((
+                       SELECT cumulative_positive_events FROM {entity}_daily_events previous
+                       WHERE previous.{entity}_id = employee_events.{entity}_id AND previous.event_date < :since
+                       ORDER BY previous.event_date DESC LIMIT 1
+                   ), 0) previous_positive
+                 , COALESCE((
+                       SELECT cumulative_negative_events FROM {entity}_daily_events previous
+                       WHERE previous.{entity}_id = employee_events.{entity}_id AND previous.event_date < :since
+                       ORDER BY previous.event_date DESC LIMIT 1
+                   ), 0) previous_negative
+            FROM employee_events
+            WHERE event_date >= :since
+            GROUP BY {keys}, event_date
+        )
+        WINDOW running AS (PARTITION BY {entity}_id ORDER BY event_date)
+        """,
+        {"since": since},
+    )
+
+
+def _refresh_totals(db_conn: Connection, after_rowid: int) -> None:
+    touched = "SELECT DISTINCT employee_id FROM employee_events WHERE rowid > :after_rowid"
+    params = {"after_rowid": after_rowid}
+
+    db_conn.execute(f"DELETE FROM employee_event_totals WHERE employee_id IN ({touched})", params)
+    db_conn.execute(
+        f"""
+        INSERT INTO employee_event_totals
+        SELECT employee_id
+             , team_id
+             , SUM(positive_events)
+             , SUM(negative_events)
+        FROM employee_events
+        WHERE employee_id IN ({touched})
+        GROUP BY employee_id, team_id
+        """,
+        params,
+    )
+
+
+def refresh_org_rollups(db_conn: Connection, since: str = "") -> None:
+    """Rolls up the daily events of the org units from `since` onwards, within the caller's transaction.
+
+    The units are refreshed bottom-up, one depth at a time: a unit sums the `team_daily_events` of
+    its own teams and the `org_unit_daily_events` of its child units, which were refreshed before
+    it. No unit reads the raw events, or the rollups of the units below its children.
+
+    Args:
+        db_conn (Connection): A writable connection to the database.
+        since (str): The earliest event date to refresh, every date by default.
+    """
+    db_conn.execute("DELETE FROM org_unit_daily_events WHERE event_date >= :since", {"since": since})
+
+    depths = [depth for (depth,) in db_conn.execute("SELECT DISTINCT depth FROM org_units ORDER BY depth DESC")]
+    for depth in depths:
+        db_conn.execute(
+            """
+            INSERT INTO org_unit_daily_events
+            SELECT org_unit_id
+                 , event_date
+                 , positive_events
+                 , negative_events
+                 , previous_positive + SUM(positive_events) OVER running
+                 , previous_negative + SUM(negative_events) OVER running
+            FROM (
+                SELECT org_unit_id
+                     , event_date
+                     , SUM(positive_events) positive_events
+                     , SUM(negative_events) negative_events
+                     , COALESCE((
+                           SELECT cumulative_positive_events FROM org_unit_daily_events previous
+                           WHERE previous.org_unit_id = parts.org_unit_id AND previous.event_date < :since
+                           ORDER BY previous.event_date DESC LIMIT 1
+                       ), 0) previous_positive
+                     , COALESCE((
+                           SELECT cumulative_negative_events FROM org_unit_daily_events previous
+                           WHERE previous.org_unit_id = parts.org_unit_id AND previous.event_date < :since
+                           ORDER BY previous.event_date DESC LIMIT 1
+                       ), 0) previous_negative
+                FROM (
+                    SELECT unit.org_unit_id, daily.event_date, daily.positive_events, daily.negative_events
+                    FROM org_units unit
+                    JOIN team_units USING (org_unit_id)
+                    JOIN team_daily_events daily USING (team_id)
+                    WHERE unit.depth = :depth AND daily.event_date >= :since
+                    UNION ALL
+                    SELECT child.parent_id, daily.event_date, daily.positive_events, daily.negative_events
+                    FROM org_units child
+                    JOIN org_unit_daily_events daily USING (org_unit_id)
+                    WHERE child.depth = :depth + 1 AND daily.event_date >= :since
+                ) parts
+                GROUP BY org_unit_id, event_date
+            )
+            WINDOW running AS (PARTITION BY org_unit_id ORDER BY event_date)
+            """,
+            {"since": since, "depth": depth},
+        )
+
+
+def refresh_rollups(db_conn: Connection, full: bool = False) -> str | None:
+    """Brings the rollup tables up to date with `employee_events`, within the caller's transaction.
+
+    Args:
+        db_conn (Connection): A writable connection to the database.
+        full (bool): Recomputes every rollup instead of only the appended events.
+
+    Returns:
+        str | None: The earliest refreshed event date ("" for a full refresh), `None` if there
+            were no new events.
+    """
+    state = db_conn.execute("SELECT value FROM rollup_state WHERE name = 'last_rowid'").fetchone()
+    last_rowid = 0 if full or state is None else state[0]
+    max_rowid = db_conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM employee_events").fetchone()[0]
+
+    if full:
+        since = ""
+    elif max_rowid > last_rowid:
+        since = db_conn.execute(
+            "SELECT MIN(event_date) FROM employee_events WHERE rowid > :last_rowid", {"last_rowid": last_rowid}
+        ).fetchone()[0]
+    else:
+        return None
+
+    _refresh_daily(db_conn, "employee", since)
+    _refresh_daily(db_conn, "team", since)
+    _refresh_totals(db_conn, last_rowid)
+    # the org rollups are created by a later migration than the other rollups
+    if db_conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'org_unit_daily_events'").fetchone():
+        refresh_org_rollups(db_conn, since)
+
+    db_conn.execute(
+        "INSERT OR REPLACE INTO rollup_state (name, value) VALUES ('last_rowid', :max_rowid)",
+        {"max_rowid": max_rowid},
+    )
+    increment_data_version(db_conn)
+
+    return since
+
+
+def increment_data_version(db_conn: Connection) -> None:
+    """Marks the data as changed for the caches keyed by `QueryBase.data_version`, within the caller's transaction.
+
+    Args:
+        db_conn (Connection): A writable connection to the database.
+    """
+    db_conn.execute(
+        """INSERT INTO rollup_state (name, value) VALUES ('data_version', 1)
+           ON CONFLICT (name) DO UPDATE SET value = value + 1"""
+    )
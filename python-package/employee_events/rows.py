@@ -0,0 +1,108 @@
+"""Query results as named tuples, without pandas.
+
+`QueryMixin.rows` returns a `Rows`: the column names, and every row as a named tuple. Named tuples
+have empty `__slots__`, so a row costs no more memory than the plain tuple sqlite3 returns, and its
+values are read by index or by column name. For the small results of the dashboard this is several
+times faster than `pd.read_sql_query`, and never imports pandas. `Rows.to_frame` builds the
+DataFrame for the callers that need one, e.g. the classifier.
+"""
+
+import sys
+from collections import namedtuple
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Mapping, Sequence, Tuple, overload
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+@lru_cache(maxsize=256)
+def row_type(columns: Tuple[str, ...]) -> type:
+    """Named tuple class of the rows with these columns, shared by every result with the same columns."""
+    # renames the columns that are not identifiers, e.g. `COUNT(*)`, to their position like `_0`
+    return namedtuple("Row", columns, rename=True)
+
+
+class Rows(Sequence[Tuple]):
+    """Rows of a query result, as named tuples, in the order of the query.
+
+    Args:
+        columns (Sequence[str]): The column names, as selected by the query.
+        rows (Iterable[Tuple]): The rows, tuples of one value per column.
+    """
+
+    __slots__ = ("columns", "_rows")
+
+    def __init__(self, columns: Sequence[str], rows: Iterable[Tuple] = ()):
+        self.columns = tuple(columns)
+        self._rows: List[Tuple] = list(map(row_type(self.columns)._make, rows))
+
+    @classmethod
+    def from_columns(cls, columns: Mapping[str, "Sequence[Any] | np.ndarray"]) -> "Rows":
+        """Rows of columns of equal length, e.g. NumPy arrays, converted to Python values.
+
+        Args:
+            columns (Mapping[str, Sequence[Any] | np.ndarray]): The values of every column, by column name.
+
+        Returns:
+            Rows: One row per position of the columns.
+        """
+        values = [column if isinstance(column, Sequence) else column.tolist() for column in columns.values()]
+        return cls(list(columns), zip(*values))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @overload
+    def __getitem__(self, index: int) -> Tuple: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "Rows": ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Rows(self.columns, self._rows[index])
+
+        return self._rows[index]
+
+    def __iter__(self) -> Iterator[Tuple]:
+        return iter(self._rows)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Rows):
+            return NotImplemented
+
+        return self.columns == other.columns and self._rows == other._rows
+
+    def __repr__(self) -> str:
+        return f"Rows(columns={self.columns}, rows={len(self)})"
+
+    def column(self, name: str) -> List[Any]:
+        """The values of a column, in row order.
+
+        Args:
+            name (str): The column name.
+
+        Returns:
+            List[Any]: One value per row.
+        """
+        index = self.columns.index(name)
+        return [row[index] for row in self._rows]
+
+    def to_frame(self) -> "pd.DataFrame":
+        """The rows as a DataFrame, with the column types `pd.read_sql_query` would infer.
+
+        Returns:
+            pd.DataFrame: One row per row and one column per column.
+        """
+        import pandas as pd
+
+        return pd.DataFrame.from_records(self._rows, columns=list(self.columns), coerce_float=True)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the rows and their values."""
+        return sys.getsizeof(self._rows) + sum(
+            sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in self._rows
+        )
@@ -1,34 +1,250 @@
+import os
+import threading
+import time
+from contextlib import AbstractContextManager, contextmanager
 from pathlib import Path
-from sqlite3 import connect
-from typing import List, Tuple
+from queue import Empty, LifoQueue
+from sqlite3 import Connection, connect
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Mapping, Sequence, Tuple
 
-import pandas as pd
+from employee_events.rows import Rows
 
-db_path = Path(__file__).parent / "employee_events.db"
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# The bundled database, at the schema of the course, `python -m employee_events migrate` upgrades it.
+# EMPLOYEE_EVENTS_DB points the package at another database, e.g. a migrated copy.
+db_path = Path(os.environ.get("EMPLOYEE_EVENTS_DB") or Path(__file__).parent / "employee_events.db")
+
+# Query parameters bound by sqlite3, either positional (`?`) or named (`:name`)
+Params = Sequence[Any] | Mapping[str, Any]
+
+# PRAGMAs applied to every pooled connection. The database is only read by the
+# dashboard, so it is memory-mapped and queried with a larger page cache.
+default_pragmas: Dict[str, Any] = {
+    "query_only": 1,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -16 * 1024,  # negative values are KiB, i.e. 16 MiB
+    "temp_store": "MEMORY",
+}
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable SQLite connections.
+
+    Connections are created lazily up to `size` and handed out one per thread. A thread that
+    already holds a connection gets the same one back when it checks out again, so nested
+    queries never deadlock on an exhausted pool.
+
+    Args:
+        path (Path | str): Path to the SQLite database file.
+        size (int): Maximum number of open connections.
+        read_only (bool): Opens the database with the read-only URI mode and `query_only`.
+        timeout (float): Seconds to wait for a free connection before raising `TimeoutError`.
+        pragmas (Dict[str, Any] | None): PRAGMAs overriding or extending `default_pragmas`.
+        cached_statements (int): Size of each connection's prepared statement cache. Queries
+            bind their parameters, so their SQL text (the cache key) is the same for every id.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = db_path,
+        size: int = 8,
+        read_only: bool = True,
+        timeout: float = 10.0,
+        pragmas: Dict[str, Any] | None = None,
+        cached_statements: int = 256,
+    ):
+        if size < 1:
+            raise ValueError("The pool size should be at least 1.")
+
+        self.path = Path(path)
+        self.size = size
+        self.read_only = read_only
+        self.timeout = timeout
+        self.pragmas = {**default_pragmas, "query_only": int(read_only), **(pragmas or {})}
+        self.cached_statements = cached_statements
+
+        self._idle: LifoQueue[Connection] = LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._opened: List[Connection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Connection:
+        mode = "ro" if self.read_only else "rw"
+        conn = connect(
+            f"file:{self.path.as_posix()}?mode={mode}",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        for pragma, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+
+        with self._lock:
+            self._opened.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """Checks out a connection for the current thread and returns it to the pool afterwards.
+
+        Yields:
+            Connection: An open SQLite connection.
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No database connection available after {self.timeout}s (pool size {self.size}).")
+
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                conn = self._connect()
+
+            self._local.conn = conn
+            try:
+                yield conn
+            finally:
+                self._local.conn = None
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    @property
+    def opened(self) -> int:
+        """Number of connections opened by the pool so far."""
+        return len(self._opened)
+
+    def close(self) -> None:
+        """Closes every connection opened by the pool."""
+        with self._lock:
+            for conn in self._opened:
+                conn.close()
+            self._opened.clear()
+
+        while True:
+            try:
+                self._idle.get_nowait()
+            except Empty:
+                break
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def configure_pool(**kwargs) -> ConnectionPool:
+    """Replaces the shared connection pool, closing the previous one.
+
+    Args:
+        **kwargs: Keyword arguments forwarded to `ConnectionPool`.
+
+    Returns:
+        ConnectionPool: The new shared pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(**kwargs)
+        return _pool
+
+
+def get_pool() -> ConnectionPool:
+    """Returns the shared connection pool, creating it with default settings on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+# Callbacks run after every query with the entity name, the name of the method issuing the query,
+# its duration in seconds and number of rows, e.g. to record metrics. Queries are not timed without hooks.
+query_hooks: List[Callable[[str, str, float, int], None]] = []
+
+
+def _run_query_hooks(query_mixin: "QueryMixin", method: str, start: float, rows: int) -> None:
+    seconds = time.perf_counter() - start
+    entity = getattr(query_mixin, "name", type(query_mixin).__name__)
+    for hook in query_hooks:
+        hook(entity, method, seconds, rows)
 
 
 class QueryMixin:
-    def pandas_query(self, sql_query: str) -> pd.DataFrame:
+    # Pool used by this class; `None` means the shared pool from `get_pool()`
+    pool: ConnectionPool | None = None
+
+    def connection(self) -> AbstractContextManager[Connection]:
+        """Checks out a pooled connection, see `ConnectionPool.connection`."""
+        return (self.pool or get_pool()).connection()
+
+    def pandas_query(self, sql_query: str, params: Params = (), method: str = "pandas_query") -> "pd.DataFrame":
         """Executes an SQL query using pandas and returns the result as a DataFrame.
 
         Args:
             sql_query (str): A valid SQL query.
+            params (Params): Values bound to the query placeholders.
+            method (str): Name of the method issuing the query, reported to the `query_hooks`.
 
         Returns:
             A pandas DataFrame containing the query results.
         """
-        return pd.read_sql_query(sql_query, connect(db_path))
+        import pandas as pd  # only the DataFrame queries need pandas, e.g. not `names` or the migrations
 
-    def query(self, sql_query: str) -> List[Tuple[str, ...]]:
+        start = time.perf_counter()
+        with self.connection() as db_conn:
+            df = pd.read_sql_query(sql_query, db_conn, params=params if isinstance(params, Mapping) else list(params))
+
+        if query_hooks:
+            _run_query_hooks(self, method, start, len(df))
+        return df
+
+    def rows(self, sql_query: str, params: Params = (), method: str = "rows") -> Rows:
+        """Executes an SQL query and returns the result as named tuples, without pandas.
+
+        Args:
+            sql_query (str): A valid SQL query.
+            params (Params): Values bound to the query placeholders.
+            method (str): Name of the method issuing the query, reported to the `query_hooks`.
+
+        Returns:
+            Rows: The column names and the rows of the query results, see `Rows.to_frame`.
+        """
+        start = time.perf_counter()
+        with self.connection() as db_conn:
+            cursor = db_conn.execute(sql_query, params)
+            result = Rows([column[0] for column in cursor.description], cursor.fetchall())
+
+        if query_hooks:
+            _run_query_hooks(self, method, start, len(result))
+        return result
+
+    def query(self, sql_query: str, params: Params = (), method: str = "query") -> List[Tuple[str, ...]]:
         """Executes an SQL query and returns the result as a list of tuples.
 
         Args:
             sql_query (str): A valid SQL query.
+            params (Params): Values bound to the query placeholders.
+            method (str): Name of the method issuing the query, reported to the `query_hooks`.
 
         Returns:
             A list of tuples containing the query results.
         """
-        with connect(db_path) as db_conn:
-            cursor = db_conn.cursor()
-            result = cursor.execute(sql_query).fetchall()
-            return list(result)
+        start = time.perf_counter()
+        with self.connection() as db_conn:
+            result = db_conn.execute(sql_query, params).fetchall()
+
+        if query_hooks:
+            _run_query_hooks(self, method, start, len(result))
+        return list(result)
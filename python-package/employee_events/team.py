@@ -1,8 +1,10 @@
-from typing import List, Tuple, override
+from typing import TYPE_CHECKING, List, Tuple, override
 
-import pandas as pd
+from employee_events.date_range import DateRange
+from employee_events.query_base import QueryBase, Statement
 
-from employee_events.query_base import QueryBase
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class Team(QueryBase):
@@ -32,46 +34,80 @@ class Team(QueryBase):
                     FROM team
                     ORDER BY team_id
                     """
-        return self.query(sql_query)
+        return self.query(sql_query, method="names")
 
     @override
-    def username(self, id: int) -> List[Tuple[str, ...]]:
-        """Retrieves the name of a specific team by ID.
+    def username_statement(self, id: int) -> Statement:
+        """The statement retrieving the name of a specific team by ID.
 
         Args:
             id (int): The team ID to filter by.
 
         Returns:
-            List[Tuple[str, ...]]: A list containing a single tuple with the team name.
+            Statement: The query of the team name, and its parameters.
         """
         sql_query = f"""
                     SELECT 
                         team_name
                     FROM {self.name}
-                    WHERE team_id = {id};
+                    WHERE team_id = :id;
                     """
-        return self.query(sql_query)
+        return sql_query, {"id": id}
 
     @override
-    def model_data(self, id: int) -> pd.DataFrame:
-        """Aggregates positive and negative events per employee within a specific team.
+    def model_data_statement(self, id: int, dates: DateRange | None = None) -> Statement:
+        """The statement aggregating positive and negative events per employee within a specific team.
+
+        The per-employee totals are read from the `employee_event_totals` rollup. Within a date
+        range, the employees of the team are read from the same rollup and their events in the team
+        are summed from the `employee_daily_events` rollup.
 
         Args:
             id (int): The team ID to filter by.
+            dates (DateRange | None): The event dates to sum, the `dates` of the instance by default.
 
         Returns:
-            pd.DataFrame: A DataFrame containing employee-level sums of positive and negative events.
+            Statement: The query of employee-level sums of positive and negative events and the employee_id,
+                and its parameters.
         """
+        dates = dates or self.dates
+        if dates is not None:
+            conditions, params = dates.sql("daily.event_date")
+            sql_query = f"""
+                        SELECT COALESCE(SUM(daily.positive_events), 0) positive_events
+                             , COALESCE(SUM(daily.negative_events), 0) negative_events
+                             , totals.employee_id
+                        FROM employee_event_totals totals
+                        LEFT JOIN employee_daily_events daily
+                            ON daily.employee_id = totals.employee_id AND daily.team_id = totals.team_id{conditions}
+                        WHERE totals.{self.name}_id = :id
+                        GROUP BY totals.employee_id
+                        ORDER BY totals.employee_id
+                        """
+            return sql_query, {"id": id, **params}
+
         sql_query = f"""
-                    SELECT positive_events, negative_events FROM (
-                        SELECT employee_id
-                            , SUM(positive_events) positive_events
-                            , SUM(negative_events) negative_events
-                        FROM {self.name}
-                        JOIN employee_events
-                            USING({self.name}_id)
-                        WHERE {self.name}.{self.name}_id = {id}
-                        GROUP BY employee_id
-                    )
+                    SELECT positive_events, negative_events, employee_id
+                    FROM {self.name}
+                    JOIN employee_event_totals
+                        USING({self.name}_id)
+                    WHERE {self.name}.{self.name}_id = :id
+                    ORDER BY employee_id
+                    """
+        return sql_query, {"id": id}
+
+    @override
+    def all_model_data(self) -> "pd.DataFrame":
+        """Aggregates positive and negative events per employee for every team.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing team_id and the employee-level sums of positive and negative events.
+        """
+        sql_query = f"""
+                    SELECT {self.name}_id, positive_events, negative_events
+                    FROM {self.name}
+                    JOIN employee_event_totals
+                        USING({self.name}_id)
+                    ORDER BY {self.name}_id, employee_id
                     """
-        return self.pandas_query(sql_query)
+        return self.pandas_query(sql_query, method="all_model_data")
@@ -1,13 +1,67 @@
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
 __all__ = [
     "BaseComponent",
     "Dropdown",
     "Radio",
     "MatplotlibViz",
+    "ChartSpec",
+    "Series",
+    "chart_backends",
+    "plot_width",
     "DataTable",
+    "LRUCache",
+    "run_in_render_pool",
+    "request_data_version",
+    "RequestStateMiddleware",
+    "component_hooks",
 ]
 
-from .base_component import BaseComponent
-from .data_table import DataTable
-from .dropdown import Dropdown
-from .matplotlib_viz import MatplotlibViz
-from .radio import Radio
+# Module of every exported name, imported on first access (PEP 562), e.g. NumPy is only imported
+# with the charts
+_modules = {
+    "BaseComponent": "base_component",
+    "component_hooks": "base_component",
+    "run_in_render_pool": "base_component",
+    "request_data_version": "base_component",
+    "RequestStateMiddleware": "base_component",
+    "LRUCache": "cache",
+    "ChartSpec": "chart_rendering",
+    "Series": "chart_rendering",
+    "chart_backends": "chart_rendering",
+    "plot_width": "chart_rendering",
+    "DataTable": "data_table",
+    "Dropdown": "dropdown",
+    "MatplotlibViz": "matplotlib_viz",
+    "Radio": "radio",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _modules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{_modules[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted({*globals(), *__all__})
+
+
+if TYPE_CHECKING:
+    from .base_component import (
+        BaseComponent,
+        RequestStateMiddleware,
+        component_hooks,
+        request_data_version,
+        run_in_render_pool,
+    )
+    from .cache import LRUCache
+    from .chart_rendering import ChartSpec, Series, chart_backends, plot_width
+    from .data_table import DataTable
+    from .dropdown import Dropdown
+    from .matplotlib_viz import MatplotlibViz
+    from .radio import Radio
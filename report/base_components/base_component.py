@@ -1,21 +1,142 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Any, List
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Hashable, List
 
-import pandas as pd
-from employee_events import QueryBase
+from employee_events import DateRange, QueryBase, Rows, get_pool
+from fastcore.basics import NotStr
+from fastcore.xml import to_xml
+
+from .cache import LRUCache
+
+# Threads running the blocking database queries and chart rendering of the async routes. Kept at
+# the default size of the employee_events connection pool, so no render thread waits for a connection.
+render_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="render")
+
+
+async def run_in_render_pool(func: Callable, *args) -> Any:
+    """Runs a blocking function in `render_executor` without blocking the event loop, in the current context"""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        render_executor, functools.partial(context.run, func, *args)
+    )
+
+
+class RequestState:
+    """Values read once per request and shared by every component rendering it, in any render thread"""
+
+    def __init__(self):
+        self._data_versions: dict[Path, int] = {}
+        self._lock = threading.Lock()
+
+    def data_version(self, model: QueryBase) -> int:
+        path = (model.pool or get_pool()).path
+        with self._lock:  # the other components of the request wait for the first read
+            if path not in self._data_versions:
+                self._data_versions[path] = model.data_version()
+            return self._data_versions[path]
+
+
+# State of the request being served, set by `RequestStateMiddleware` and copied into the render threads
+current_request: contextvars.ContextVar[RequestState | None] = contextvars.ContextVar("current_request", default=None)
+
+
+def request_data_version(model: QueryBase) -> int:
+    """The data version of the database of `model`, read once per request, and on every call outside of one"""
+    state = current_request.get()
+    return model.data_version() if state is None else state.data_version(model)
+
+
+class RequestStateMiddleware:
+    """ASGI middleware giving every request its own `RequestState`"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        token = current_request.set(RequestState())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request.reset(token)
+
+
+# Callbacks run after every component call with the component name, the duration in seconds and the
+# rendered result, e.g. to record metrics. Components are not timed without hooks.
+component_hooks: List[Callable[[str, float, Any], None]] = []
+
+
+def run_component_hooks(name: str, start: float, result: Any) -> None:
+    seconds = time.perf_counter() - start
+    for hook in component_hooks:
+        hook(name, seconds, result)
+
+
+# Rendered HTML of the components declaring a `fragment_key`, shared by all requests
+fragment_cache = LRUCache(max_entries=1024, max_bytes=16 * 1024 * 1024)
 
 
 class BaseComponent(ABC):
+    # Components returning a `fragment_key` are rendered once per key, and their HTML is reused
+    # until the key changes or `fragment_ttl` seconds passed
+    fragment_cache: LRUCache | None = fragment_cache
+    fragment_ttl: float | None = None
+
     @abstractmethod
     def build_component(self, entity_id: int, model: QueryBase) -> None | Any | List[Any]: ...
 
-    def component_data(self, entity_id: int, model: QueryBase) -> pd.DataFrame:
-        return pd.DataFrame()
+    def component_data(self, entity_id: int, model: QueryBase) -> Rows:
+        return Rows(())
+
+    @staticmethod
+    def date_params(dates: DateRange | None) -> dict[str, str]:
+        """The `start` and `end` query parameters of the routes restricted to `dates`"""
+        return {} if dates is None else dates.sql()[1]
 
     def outer_div(self, component):
         return component
 
+    def fragment_key(self, entity_id: int, model: QueryBase) -> Hashable | None:
+        """Identifies the rendered component among the calls of this component, `None` is never cached.
+
+        The key must cover everything the HTML depends on, such as `request_data_version(model)` for
+        components showing data.
+        """
+        return None
+
     def __call__(self, entity_id: int, model: QueryBase):
+        if not component_hooks:
+            return self.render_cached(entity_id, model)
+
+        start = time.perf_counter()
+        result = self.render_cached(entity_id, model)
+        run_component_hooks(type(self).__name__, start, result)
+        return result
+
+    def render_cached(self, entity_id: int, model: QueryBase):
+        key = self.fragment_key(entity_id, model)
+        if key is None or self.fragment_cache is None:
+            return self.render_fragment(entity_id, model)
+
+        # the configuration of the component is part of the key, different instances can share a fragment
+        key = type(self).__qualname__, repr(vars(self)), key
+        return self.fragment_cache.get_or_set(
+            key, lambda: NotStr(to_xml(self.render_fragment(entity_id, model), indent=False)), self.fragment_ttl
+        )
+
+    def render_fragment(self, entity_id: int, model: QueryBase):
         component = self.build_component(entity_id, model)
 
         return self.outer_div(component)
+
+    async def acall(self, entity_id: int, model: QueryBase):
+        """Async version of `__call__`, rendering the component in the render thread pool"""
+        return await run_in_render_pool(self, entity_id, model)
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class LRUCache:
+    """Thread-safe least recently used cache, bounded by entry count and total size.
+
+    Values set with a `ttl` expire after that many seconds, and are then treated as missing.
+
+    Args:
+        max_entries (int): Maximum number of cached values.
+        max_bytes (int): Maximum total size of the cached values, as measured by `sizeof`.
+        sizeof (Callable[[object], int]): Returns the size of a cached value.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024, sizeof: Callable = len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+
+        self._values: OrderedDict[Hashable, object] = OrderedDict()
+        self._expires: dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._expires and self._expires[key] <= time.monotonic():
+                self._pop(key)
+
+            if key in self._values:
+                self.hits += 1
+                self._values.move_to_end(key)
+                return self._values[key]
+
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value, ttl: float | None = None) -> None:
+        value_size = self.sizeof(value)
+        if value_size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._values:
+                self._pop(key)
+
+            self._values[key] = value
+            self.size += value_size
+            if ttl is not None:
+                self._expires[key] = time.monotonic() + ttl
+
+            while len(self._values) > self.max_entries or self.size > self.max_bytes:
+                self._pop(next(iter(self._values)))
+                self.evictions += 1
+
+    def get_or_set(self, key: Hashable, compute: Callable[[], T], ttl: float | None = None) -> T:
+        """Returns the cached value for `key`, computing and caching it on a miss."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.set(key, value, ttl)
+
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+            self._expires.clear()
+            self.size = 0
+
+    def _pop(self, key: Hashable) -> None:
+        self.size -= self.sizeof(self._values.pop(key))
+        self._expires.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._values),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
@@ -0,0 +1,188 @@
+import html
+import json
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Literal, NamedTuple, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+@dataclass(frozen=True)
+class Series:
+    """One line, or the bars of a bar chart, `x` holds the dates or the bar labels"""
+
+    label: str
+    x: "np.ndarray"
+    y: "np.ndarray"
+    color: str
+
+
+@dataclass(frozen=True)
+class ChartSpec:
+    """Backend independent description of a chart, drawn by every chart renderer
+
+    Args:
+        kind (str): "line" for series over dates, or "barh" for horizontal bars.
+        title (str): Title above the chart.
+        xlabel (str): Label of the horizontal axis.
+        ylabel (str): Label of the vertical axis.
+        series (Tuple[Series, ...]): The data of the chart.
+        value_range (Tuple[float, float] | None): Fixed limits of the value axis, from the data by default.
+    """
+
+    kind: Literal["line", "barh"]
+    title: str = ""
+    xlabel: str = ""
+    ylabel: str = ""
+    series: Tuple[Series, ...] = ()
+    value_range: Tuple[float, float] | None = None
+
+
+def to_json(spec: ChartSpec) -> bytes:
+    """The chart data as compact JSON, to be drawn by a client-side chart library"""
+    import numpy as np
+
+    def values(array: np.ndarray) -> list:
+        if np.issubdtype(array.dtype, np.datetime64):
+            return np.datetime_as_string(array, unit="D").tolist()
+        return array.tolist()
+
+    payload = {
+        "kind": spec.kind,
+        "title": spec.title,
+        "xlabel": spec.xlabel,
+        "ylabel": spec.ylabel,
+        "value_range": spec.value_range,
+        "series": [
+            {"label": series.label, "color": series.color, "x": values(series.x), "y": values(series.y)}
+            for series in spec.series
+        ],
+    }
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+# Size of the svg charts, the default matplotlib figure size at 100 dpi
+width, height = 640, 480
+left, right, top, bottom = 70, 620, 40, 420
+plot_width = right - left
+
+
+def nice_scale(low: float, high: float, count: int = 5) -> Tuple["np.ndarray", float, float]:
+    """Round tick values covering [low, high], and the range they span"""
+    import numpy as np
+
+    if high <= low:
+        high = low + 1
+
+    raw_step = (high - low) / count
+    magnitude = 10 ** np.floor(np.log10(raw_step))
+    step = next(factor * magnitude for factor in (1, 2, 2.5, 5, 10) if factor * magnitude >= raw_step)
+    low, high = np.floor(low / step) * step, np.ceil(high / step) * step
+
+    return np.arange(low, high + step / 2, step), low, high
+
+
+def _number(value: float) -> str:
+    return f"{round(float(value), 10):g}"
+
+
+def _text(x: float, y: float, text: str, **attributes) -> str:
+    attributes_str = "".join(f' {name.replace("_", "-")}="{value}"' for name, value in attributes.items())
+    return f'<text x="{x:.1f}" y="{y:.1f}"{attributes_str}>{html.escape(text)}</text>'
+
+
+def _scale(values: "np.ndarray", low: float, high: float, start: float, end: float) -> "np.ndarray":
+    return start + (values - low) / (high - low) * (end - start)
+
+
+def to_svg(spec: ChartSpec) -> bytes:
+    """The chart as a compact svg, written from the data without matplotlib"""
+    import numpy as np
+
+    elements = []
+
+    if spec.kind == "line":
+        days = [series.x.astype("datetime64[D]").astype(np.int64) for series in spec.series]
+        all_days = np.concatenate(days) if days else np.array([0])
+        all_values = np.concatenate([series.y for series in spec.series]) if spec.series else np.array([0])
+        x_low, x_high = (all_days.min(), all_days.max()) if len(all_days) else (0, 1)
+        x_high = max(x_high, x_low + 1)
+        y_ticks, y_low, y_high = nice_scale(
+            *(spec.value_range or (min(0, all_values.min(initial=0)), all_values.max(initial=1)))
+        )
+
+        # a tick on the first day of the months, at most 7 labels
+        months = np.arange(np.datetime64(int(x_low), "D"), np.datetime64(int(x_high), "D") + 1, dtype="datetime64[M]")
+        months = months[months.astype("datetime64[D]").astype(np.int64) >= x_low]
+        months = months[:: max(1, int(np.ceil(len(months) / 7)))]
+        x_ticks = [(day, str(month)) for day, month in zip(months.astype("datetime64[D]").astype(np.int64), months)]
+
+        for series, series_days in zip(spec.series, days):
+            xs = _scale(series_days, x_low, x_high, left, right)
+            ys = _scale(series.y.astype(float), y_low, y_high, bottom, top)
+            points = " ".join(f"{x:.1f},{y:.1f}" for x, y in zip(xs, ys))
+            elements.append(
+                f'<polyline points="{points}" fill="none" stroke="{series.color}" '
+                'stroke-width="4" stroke-dasharray="12 6 3 6"/>'
+            )
+
+        for i, series in enumerate(spec.series):
+            y = top + 20 + i * 20
+            elements.append(
+                f'<line x1="{left + 10}" y1="{y}" x2="{left + 40}" y2="{y}" stroke="{series.color}" stroke-width="4"/>'
+            )
+            elements.append(_text(left + 48, y + 4, series.label))
+
+    else:
+        x_ticks_values, x_low, x_high = nice_scale(*(spec.value_range or (0, max(s.y.max() for s in spec.series))))
+        x_ticks = [(value, _number(value)) for value in x_ticks_values]
+        y_ticks, y_low, y_high = np.array([]), -0.5, 0.5
+
+        bars = [(label, value, series.color) for series in spec.series for label, value in zip(series.x, series.y)]
+        band = (bottom - top) / max(len(bars), 1)
+        for i, (label, value, color) in enumerate(bars):
+            x0, x1 = _scale(np.array([0.0, value]), x_low, x_high, left, right)
+            y = top + band * (i + 0.1)
+            elements.append(
+                f'<rect x="{x0:.1f}" y="{y:.1f}" width="{x1 - x0:.1f}" height="{band * 0.8:.1f}" '
+                f'fill="{color}" stroke="black"/>'
+            )
+            if label:
+                elements.append(
+                    _text(left - 6, y + band * 0.4, str(label), text_anchor="end", dominant_baseline="middle")
+                )
+
+    axes = [f'<rect x="{left}" y="{top}" width="{right - left}" height="{bottom - top}" fill="none" stroke="black"/>']
+    for tick, label in x_ticks:
+        x = float(_scale(np.array(tick, dtype=float), x_low, x_high, left, right))
+        axes.append(f'<line x1="{x:.1f}" y1="{bottom}" x2="{x:.1f}" y2="{bottom + 5}" stroke="black"/>')
+        axes.append(_text(x, bottom + 20, label, text_anchor="middle"))
+    for tick in y_ticks:
+        y = float(_scale(np.array(tick, dtype=float), y_low, y_high, bottom, top))
+        axes.append(f'<line x1="{left - 5}" y1="{y:.1f}" x2="{left}" y2="{y:.1f}" stroke="black"/>')
+        axes.append(_text(left - 8, y, _number(tick), text_anchor="end", dominant_baseline="middle"))
+
+    ylabel = _text(0, 0, spec.ylabel, text_anchor="middle")
+    labels = [
+        _text(width / 2, 24, spec.title, text_anchor="middle", font_size="16"),
+        _text((left + right) / 2, height - 20, spec.xlabel, text_anchor="middle"),
+        f'<g transform="translate(18 {(top + bottom) / 2:.1f}) rotate(-90)">{ylabel}</g>',
+    ]
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="{width}" height="{height}" '
+        f'font-family="sans-serif" font-size="12">{"".join(axes + elements + labels)}</svg>'
+    ).encode()
+
+
+class ChartBackend(NamedTuple):
+    media_type: str
+    render: Callable[[ChartSpec], bytes]
+
+
+# Renderers drawing a `ChartSpec` without matplotlib, by format. MatplotlibViz renders "png" with
+# matplotlib and any other format with these, new formats can be registered here.
+chart_backends: Dict[str, ChartBackend] = {
+    "svg": ChartBackend("image/svg+xml", to_svg),
+    "json": ChartBackend("application/json", to_json),
+}
@@ -1,24 +1,54 @@
 from typing import override
+from urllib.parse import urlencode
 
-import pandas as pd
-from employee_events import QueryBase
-from fasthtml.common import Table, Td, Th, Tr
+from employee_events import QueryBase, Rows
+from fasthtml.components import Table, Tbody, Td, Th, Thead, Tr
 
 from .base_component import BaseComponent
 
 
 class DataTable(BaseComponent):
+    # Rows rendered per request, `None` renders the whole table at once. The following pages are
+    # fetched by htmx from `page_route`, once the last row is scrolled into view.
+    page_size: int | None = None
+    page_route = ""
+    # Column holding the keyset cursor of each row, not displayed
+    cursor_column = "cursor"
+
     @override
     def build_component(self, entity_id: int, model: QueryBase):
         if model.name:
-            data: pd.DataFrame = self.component_data(entity_id, model)
-
-            table = Table(Tr(Th(column) for column in data.columns))
-
-            for data_row in data.to_numpy():
-                table_row = Tr(Td(val) for val in data_row)
-
-                children = (*table.children, table_row)
-                table.children = children
-
-            return table
+            data = self.page_data(entity_id, model, after=None)
+            columns = [column for column in data.columns if column != self.cursor_column]
+
+            return Table(
+                Thead(Tr(*(Th(column) for column in columns))),
+                Tbody(*self.build_rows(data, entity_id, model)),
+            )
+
+    def page_data(self, entity_id: int, model: QueryBase, after: str | None) -> Rows:
+        """Rows following the cursor `after`, all rows of `component_data` by default"""
+        return self.component_data(entity_id, model)
+
+    def build_rows(self, data: Rows, entity_id: int, model: QueryBase) -> list:
+        shown = [i for i, column in enumerate(data.columns) if column != self.cursor_column]
+        rows = [Tr(*(Td(data_row[i]) for i in shown)) for data_row in data]
+
+        if self.page_size and len(data) == self.page_size:
+            query = urlencode(
+                {"after": data[-1][data.columns.index(self.cursor_column)], **self.date_params(model.dates)}
+            )
+            rows.append(
+                Tr(
+                    Td("Loading more…", colspan=len(shown), aria_busy="true"),
+                    hx_get=f"{self.page_route}/{model.name}/{entity_id}?{query}",
+                    hx_trigger="revealed",
+                    hx_swap="outerHTML",
+                )
+            )
+
+        return rows
+
+    def next_rows(self, entity_id: int, model: QueryBase, after: str) -> list:
+        """Rows of the page following the cursor `after`, for the `page_route`"""
+        return self.build_rows(self.page_data(entity_id, model, after), entity_id, model)
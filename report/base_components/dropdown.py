@@ -1,7 +1,7 @@
 from typing import override
 
 from employee_events import QueryBase
-from fasthtml.common import Div, Label, Option, Select
+from fasthtml.components import Div, Label, Option, Select
 
 from .base_component import BaseComponent
 
@@ -15,16 +15,20 @@ class Dropdown(BaseComponent):
     @override
     def build_component(self, entity_id: int, model: QueryBase):
         options = []
-        for _, (text, value) in self.component_data(entity_id, model).iterrows():
-            option = Option(text, value=value, selected="selected" if value == entity_id else "")
+        selected = self.selected_value(entity_id, model)
+        for text, value in self.component_data(entity_id, model):
+            option = Option(text, value=value, selected="selected" if value == selected else "")
             options.append(option)
 
-        return Select(*options, name=self.name)
+        return [Label(self.label_text(model), _for=self.id), Select(*options, name=self.name)]
+
+    def label_text(self, model: QueryBase) -> str:
+        return self.label
+
+    def selected_value(self, entity_id: int, model: QueryBase) -> int | str:
+        """Value of the selected option, the entity id by default"""
+        return entity_id
 
     @override
     def outer_div(self, component):
-        return Div(
-            Label(self.label, _for=self.id),
-            component,
-            id=self.id,
-        )
+        return Div(*component, id=self.id)
@@ -1,62 +1,187 @@
 import base64
+import hashlib
 import io
+import time
 from abc import ABC, abstractmethod
-from typing import override
+from functools import cache
+from typing import TYPE_CHECKING, Callable, Concatenate, Hashable, Literal, ParamSpec, TypeVar, override
+from urllib.parse import urlencode
 
-import matplotlib
-import matplotlib.pylab as plt
-from employee_events import QueryBase
-from fasthtml.common import Img
-from matplotlib.axes import Axes
+from employee_events import DateRange, QueryBase
+from fasthtml.components import Div, Img
 
-from .base_component import BaseComponent
+from .base_component import BaseComponent, component_hooks, request_data_version, run_component_hooks
+from .cache import LRUCache
+from .chart_rendering import ChartSpec, chart_backends
 
-# This is necessary to prevent matplotlib from causing memory leaks
-# https://stackoverflow.com/questions/31156578/matplotlib-doesnt-release-memory-after-savefig-and-close
-matplotlib.use("Agg")
-matplotlib.rcParams["savefig.transparent"] = True
-matplotlib.rcParams["savefig.format"] = "png"
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
 
 
-def matplotlib2fasthtml(func):
+@cache
+def figure_class() -> type["Figure"]:
+    """Imports matplotlib on the first png, the svg and json charts and the other routes never need it"""
+    import matplotlib
+    from matplotlib.figure import Figure
+
+    # This is necessary to prevent matplotlib from causing memory leaks
+    # https://stackoverflow.com/questions/31156578/matplotlib-doesnt-release-memory-after-savefig-and-close
+    matplotlib.use("Agg")
+    matplotlib.rcParams["savefig.transparent"] = True
+    matplotlib.rcParams["savefig.format"] = "png"
+
+    return Figure
+
+
+# Rendered charts shared by all MatplotlibViz components, see `MatplotlibViz.cache_key`
+chart_cache = LRUCache(max_entries=512, max_bytes=64 * 1024 * 1024)
+
+
+Viz = TypeVar("Viz")
+P = ParamSpec("P")
+
+
+def matplotlib2png(func: Callable[Concatenate[Viz, "Figure", P], None]) -> Callable[Concatenate[Viz, P], bytes]:
     """
-    Copy of https://github.com/koaning/fh-matplotlib, which is currently hardcoding the
-    image format as jpg. png or svg is needed here.
+    Based on https://github.com/koaning/fh-matplotlib, which is currently hardcoding the
+    image format as jpg. Returns the figure drawn by `func` as png bytes, so it can be cached
+    and served on its own.
+
+    `func` draws on the `Figure` passed after `self`. The figure is created without pyplot,
+    so it is not registered in pyplot's global state: charts can be rendered concurrently from
+    several threads, and the figure is freed with its last reference.
     """
 
-    def wrapper(*args, **kwargs):
-        # Reset the figure to prevent accumulation. Maybe we need a setting for this?
-        fig = plt.figure()
+    def wrapper(self: Viz, *args: P.args, **kwargs: P.kwargs) -> bytes:
+        fig = figure_class()()
 
         # Run function as normal
-        func(*args, **kwargs)
+        func(self, fig, *args, **kwargs)
 
-        # Store it as base64 and put it into an image.
         my_string_io_bytes = io.BytesIO()
-        plt.savefig(my_string_io_bytes)
-        my_string_io_bytes.seek(0)
-        my_base64_jpg_data = base64.b64encode(my_string_io_bytes.read()).decode()
-
-        # Close the figure to prevent memory leaks
-        plt.close(fig)
-        plt.close("all")
-        return Img(
-            src=f"data:image/jpg;base64, {my_base64_jpg_data}", style="margin: 0 auto; width: auto; height: auto;"
-        )
+        fig.savefig(my_string_io_bytes)
+        return my_string_io_bytes.getvalue()
 
     return wrapper
 
 
 class MatplotlibViz(BaseComponent, ABC):
+    cache: LRUCache | None = chart_cache
+
+    # How the chart is embedded in the page: "inline" as a base64 data URI, "url" as an image
+    # served from `route`, "lazy" as a htmx placeholder fetching the "url" image after the page loaded,
+    # or "file" as an image `file_name` next to a static page
+    delivery: Literal["inline", "url", "lazy", "file"] = "inline"
+    route = "/chart"
+
+    # Format of the displayed image: "png" is drawn by `visualization` with matplotlib, the other
+    # formats of `chart_backends` are written from `chart_spec` without it
+    image_format: Literal["png", "svg"] = "png"
+
     @override
-    @matplotlib2fasthtml
     def build_component(self, entity_id: int, model: QueryBase):
-        return self.visualization(entity_id, model)
+        # the chart of a model restricted to some dates shows the events within them
+        if self.delivery == "lazy":
+            query = urlencode(self.date_params(model.dates))
+            return Div(
+                hx_get=f"{self.chart_path(entity_id, model)}?{query}" if query else self.chart_path(entity_id, model),
+                hx_trigger="load",
+                hx_swap="outerHTML",
+                aria_busy="true",
+            )
+
+        return self.image(entity_id, model, inline=self.delivery == "inline", dates=model.dates)
+
+    def image(self, entity_id: int, model: QueryBase, inline: bool = False, dates: DateRange | None = None):
+        if self.delivery == "file":
+            src = self.file_name
+        elif inline:
+            image = base64.b64encode(self.render(entity_id, model, dates=dates)).decode()
+            src = f"data:{self.media_type(self.image_format)};base64,{image}"
+        else:
+            query = urlencode({"v": self.etag(entity_id, model, dates=dates), **self.date_params(dates)})
+            src = f"{self.chart_path(entity_id, model)}/{self.image_format}?{query}"
+
+        return Img(src=src, style="margin: 0 auto; width: auto; height: auto;")
+
+    @property
+    def file_name(self) -> str:
+        return f"{type(self).__name__}.{self.image_format}"
+
+    def chart_path(self, entity_id: int, model: QueryBase) -> str:
+        return f"{self.route}/{type(self).__name__}/{model.name}/{entity_id}"
+
+    @property
+    def formats(self) -> list[str]:
+        return ["png", *chart_backends]
+
+    @staticmethod
+    def media_type(fmt: str) -> str:
+        return "image/png" if fmt == "png" else chart_backends[fmt].media_type
+
+    def etag(self, entity_id: int, model: QueryBase, fmt: str | None = None, dates: DateRange | None = None) -> str:
+        """Short hash of the cache key and format, so a chart url changes whenever the chart does"""
+        key = self.cache_key(entity_id, model, dates), fmt or self.image_format
+        return hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+
+    def cache_key(self, entity_id: int, model: QueryBase, dates: DateRange | None = None) -> tuple[Hashable, ...]:
+        """Identifies a rendered chart; changes whenever the events behind it change"""
+        return type(self).__name__, model.name, entity_id, dates, request_data_version(model)
+
+    def render(self, entity_id: int, model: QueryBase, fmt: str | None = None, dates: DateRange | None = None) -> bytes:
+        """Returns the chart in one of the `formats`, `image_format` by default, cached once rendered"""
+        fmt = fmt or self.image_format
+        if self.cache is None:
+            return self.render_format(entity_id, model, fmt, dates)
+
+        key = *self.cache_key(entity_id, model, dates), fmt
+        return self.cache.get_or_set(key, lambda: self.render_format(entity_id, model, fmt, dates))
+
+    def render_format(self, entity_id: int, model: QueryBase, fmt: str, dates: DateRange | None = None) -> bytes:
+        start = time.perf_counter()
+        if fmt == "png":
+            image = self.render_png(entity_id, model, dates)
+        else:
+            image = chart_backends[fmt].render(self.chart_spec(entity_id, model, dates))
+
+        if component_hooks:
+            run_component_hooks(f"{type(self).__name__}.{fmt}", start, image)
+        return image
+
+    @matplotlib2png
+    def render_png(self, fig: "Figure", entity_id: int, model: QueryBase, dates: DateRange | None = None) -> None:
+        self.visualization(fig, entity_id, model, dates)
 
     @abstractmethod
-    def visualization(self, entity_id: int, model: QueryBase): ...
-
-    def set_axis_styling(self, ax: Axes, bordercolor: str = "white", fontcolor: str = "white"):
+    def chart_spec(self, entity_id: int, model: QueryBase, dates: DateRange | None = None) -> ChartSpec:
+        """The data and labels of the chart, drawn by every renderer, of the events within `dates` if supported"""
+
+    def visualization(self, fig: "Figure", entity_id: int, model: QueryBase, dates: DateRange | None = None):
+        """Draws the `chart_spec` with matplotlib, override to draw what the other renderers cannot"""
+        spec = self.chart_spec(entity_id, model, dates)
+        ax = fig.subplots()
+
+        if spec.kind == "line":
+            for series in spec.series:
+                ax.plot(series.x, series.y, color=series.color, label=series.label)
+            ax.legend()
+            fig.autofmt_xdate()
+            if spec.value_range:
+                ax.set_ylim(*spec.value_range)
+        else:
+            for series in spec.series:
+                ax.barh(y=series.x, width=series.y, color=series.color, edgecolor="black")
+            if spec.value_range:
+                ax.set_xlim(*spec.value_range)
+            ax.set_ylim(-0.5, sum(len(series.x) for series in spec.series) - 0.5)
+
+        self.set_axis_styling(ax, bordercolor="black", fontcolor="black")
+        ax.set_xlabel(spec.xlabel)
+        ax.set_ylabel(spec.ylabel)
+        ax.set_title(spec.title)
+
+    def set_axis_styling(self, ax: "Axes", bordercolor: str = "white", fontcolor: str = "white"):
         ax.title.set_color(fontcolor)
         ax.xaxis.label.set_color(fontcolor)
         ax.yaxis.label.set_color(fontcolor)
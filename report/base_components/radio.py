@@ -1,7 +1,7 @@
-from typing import override
+from typing import Hashable, override
 
 from employee_events import QueryBase
-from fasthtml.common import Div, Input, Label
+from fasthtml.components import Div, Input, Label
 
 from .base_component import BaseComponent
 
@@ -14,10 +14,18 @@ class Radio(BaseComponent):
         self.hx_target = hx_target
         self.selected = selected
 
+    @override
+    def fragment_key(self, entity_id: int, model: QueryBase) -> Hashable | None:
+        return model.name
+
+    def radio_values(self, model: QueryBase):
+        """Values of the radio buttons, `values` by default"""
+        return self.values
+
     @override
     def build_component(self, entity_id: int, model: QueryBase):
         children = []
-        for value in self.values:
+        for value in self.radio_values(model):
             input_child = Input(
                 type="radio",
                 id=value.lower(),
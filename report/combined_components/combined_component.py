@@ -1,17 +1,31 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, List
+from typing import Any, Sequence
 
 from employee_events import QueryBase
 from fastcore.xml import FT
-from fasthtml.common import Div
+from fasthtml.components import Div
 
 
 class CombinedComponent(ABC):
-    outer_div_type = Div(cls="container")
+    """Components rendered together in an outer div.
+
+    Instances are shared by all requests and threads, they are never modified while rendering:
+    every call builds new FT elements, the children are built once by `make_children`.
+    """
+
+    outer_div_cls = "container"
+    _children: Sequence[Any] | None = None
 
     @property
+    def children(self) -> Sequence[Any]:
+        if self._children is None:
+            self._children = self.make_children()
+
+        return self._children
+
     @abstractmethod
-    def children(self) -> List[Any]: ...
+    def make_children(self) -> Sequence[Any]: ...
 
     def __call__(self, userid, model):
         called_children = self.call_children(userid, model)
@@ -30,10 +44,24 @@ class CombinedComponent(ABC):
 
         return called
 
+    async def acall(self, userid, model):
+        """Async version of `__call__`, rendering the children concurrently"""
+        called_children = await self.acall_children(userid, model)
+        div_args = self.div_args(userid, model)
+
+        return self.outer_div(called_children, div_args)
+
+    async def acall_children(self, userid: int, model: QueryBase):
+        async def call_child(child):
+            if isinstance(child, FT):
+                return child()
+
+            return await child.acall(userid, model)
+
+        return list(await asyncio.gather(*(call_child(child) for child in self.children)))
+
     def div_args(self, userid: int, model: QueryBase):
         return {}
 
     def outer_div(self, children, div_args):
-        self.outer_div_type.children = ()
-
-        return self.outer_div_type(*children, **div_args)
+        return Div(*children, cls=self.outer_div_cls, **div_args)
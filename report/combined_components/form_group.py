@@ -2,7 +2,9 @@ from abc import ABC
 from typing import override
 
 from employee_events import QueryBase
-from fasthtml.common import Button, Form, Group
+from fasthtml.components import Button
+from fasthtml.pico import Group
+from fasthtml.xtend import Form
 
 from .combined_component import CombinedComponent
 
@@ -20,6 +22,13 @@ class FormGroup(CombinedComponent, ABC):
 
         return children
 
+    @override
+    async def acall_children(self, userid: int, model: QueryBase):
+        children = await super().acall_children(userid, model)
+        children.append(Button(self.button_label, type="submit"))
+
+        return children
+
     @override
     def div_args(self, userid: int, model: QueryBase):
         return {
@@ -1,27 +1,118 @@
-from typing import override
-
-import fasthtml.common as fh
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-from base_components import BaseComponent, DataTable, Dropdown, MatplotlibViz, Radio
+import os
+import warnings
+from contextlib import asynccontextmanager
+from email.utils import formatdate
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Sequence, override
+from urllib.parse import urlencode
+
+import employee_events
+import fasthtml.core as fh
+import metrics
+from base_components import (
+    BaseComponent,
+    ChartSpec,
+    DataTable,
+    Dropdown,
+    LRUCache,
+    MatplotlibViz,
+    Radio,
+    RequestStateMiddleware,
+    Series,
+    plot_width,
+    request_data_version,
+    run_in_render_pool,
+)
 from combined_components import CombinedComponent, FormGroup
-from employee_events import Employee, QueryBase, Team
-from utils import ClassifierModel, load_model
+from employee_events import (
+    DateRange,
+    EntityBundle,
+    OrgUnit,
+    QueryBase,
+    Rows,
+    check_schema,
+    get_pool,
+    org_levels,
+)
+from fasthtml.pico import picolink
+from utils import model_registry
+
+# Query classes of the employees and teams, EMPLOYEE_EVENTS_BACKEND=columnar answers the event
+# queries from memory instead of SQLite. Only that backend imports NumPy, with `employee_events.backends`
+backend = os.environ.get("EMPLOYEE_EVENTS_BACKEND", "sqlite")
+Employee, Team = (
+    (employee_events.Employee, employee_events.Team) if backend == "sqlite" else employee_events.backends[backend]
+)
+
+# Notes shown before scrolling, the first page is part of the entity bundle
+notes_page_size = 50
+
+# Dates of the line chart, one per pixel of the plot at most, longer histories are summed by week or month
+chart_points = plot_width
+
+# Bundles read for the page and chart requests of the same entity, until its data changes
+bundle_cache = LRUCache(max_entries=256, max_bytes=64 * 1024 * 1024, sizeof=lambda bundle: bundle.nbytes)
+
+
+def entity_bundle(entity_id: int, model: QueryBase, notes_limit: int = notes_page_size) -> EntityBundle:
+    """Data of the employee or team shared by the components, read in one statement per data version"""
+    key = model.name, entity_id, model.dates, notes_limit, request_data_version(model)
+    return bundle_cache.get_or_set(key, lambda: model.bundle(entity_id, notes_limit, chart_points))
+
+
+def entity_exists(entity_id: int, model: QueryBase) -> bool:
+    """Whether the employee or team exists, from the name in its cached bundle"""
+    return bool(entity_bundle(entity_id, model).username)
+
+
+# Rolling windows of the window filter: label and days by `window` query parameter
+windows: dict[str, tuple[str, int | None]] = {
+    "all": ("All time", None),
+    "30": ("Last 30 days", 30),
+    "90": ("Last 90 days", 90),
+    "365": ("Last 365 days", 365),
+}
+
+# Date of the latest event by database and data version, the windows end on it so that older data keeps
+# its windows. `None` without events, every date counts as one entry.
+last_event_dates = LRUCache(max_entries=8, sizeof=lambda _: 1)
+
+
+def window_dates(window: str, model: QueryBase) -> DateRange | None:
+    """The dates of a rolling window of `windows`, `None` for every date"""
+    days = windows[window][1]
+    if days is None:
+        return None
+
+    key = (model.pool or get_pool()).path, request_data_version(model)
+    return DateRange.last(days, last_event_dates.get_or_set(key, model.last_event_date))
+
+
+# Levels of the org hierarchy by database and data version, loading a hierarchy increments the version
+levels_cache = LRUCache(max_entries=8)
+
+
+def current_levels(model: QueryBase) -> list[str]:
+    """The levels of the org hierarchy, from the lowest to the highest, empty without a hierarchy"""
+    pool = model.pool or get_pool()
+    return levels_cache.get_or_set((pool.path, request_data_version(model)), lambda: org_levels(pool))
 
 
 class Report(CombinedComponent):
     """Contains all components in the dashboard"""
 
-    @property
     @override
-    def children(self):
-        return [DashboardFilters(), Header(), Visualizations(), NotesTable()]
+    def make_children(self) -> Sequence[Any]:
+        return (DashboardFilters(), Header(), Visualizations(), NotesTable())
 
 
 class Header(BaseComponent):
     """Displays the level used for the analysis, employee or team"""
 
+    @override
+    def fragment_key(self, entity_id: int, model: QueryBase):
+        return model.name
+
     @override
     def build_component(self, entity_id: int, model: QueryBase):
         return fh.H1(
@@ -31,17 +122,16 @@ class Header(BaseComponent):
 
 
 class DashboardFilters(FormGroup):
-    """Selects the employee or team to analyze"""
+    """Selects the employee or team to analyze, and the window of their events"""
 
     id = "top-filters"
     action = "/update_data/"
     method = "POST"
 
-    @property
     @override
-    def children(self):
-        return [
-            Radio(  # switch between employee or team
+    def make_children(self):
+        return (
+            ProfileRadio(  # switch between employee, team or a level of the org hierarchy
                 values=["Employee", "Team"],
                 name="profile_type",
                 hx_get="/update_dropdown/",
@@ -51,133 +141,345 @@ class DashboardFilters(FormGroup):
                 id="selector",
                 name="user-selection",
             ),
-        ]
+            WindowDropdown(  # restrict the events, risk and notes to a rolling window
+                id="window-selector",
+                name="window",
+                label="Window",
+            ),
+        )
+
+
+class ProfileRadio(Radio):
+    """Radio buttons of the employee, the team and the levels of the org hierarchy"""
+
+    @override
+    def fragment_key(self, entity_id: int, model: QueryBase):
+        return model.name, request_data_version(model)
+
+    @override
+    def radio_values(self, model: QueryBase):
+        return [*self.values, *(level.title() for level in current_levels(model))]
 
 
 class ReportDropdown(Dropdown):
     """Dropdown used to select employee's or team's name"""
 
     @override
-    def build_component(self, entity_id: int, model: QueryBase):
-        self.label = model.name.capitalize()
-        return super().build_component(entity_id, model)
+    def fragment_key(self, entity_id: int, model: QueryBase):
+        return model.name, entity_id, request_data_version(model)
+
+    @override
+    def label_text(self, model: QueryBase):
+        return model.name.capitalize()
 
     @override
     def component_data(self, entity_id: int, model: QueryBase):
-        return pd.DataFrame(model.names())
+        return Rows(["name", "id"], model.names())
+
+
+class WindowDropdown(Dropdown):
+    """Dropdown used to select the rolling window of the events"""
+
+    @override
+    def fragment_key(self, entity_id: int, model: QueryBase):
+        return model.dates, request_data_version(model)
+
+    @override
+    def component_data(self, entity_id: int, model: QueryBase):
+        return Rows(["label", "window"], [(label, window) for window, (label, _) in windows.items()])
+
+    @override
+    def selected_value(self, entity_id: int, model: QueryBase):
+        return next((window for window in windows if window_dates(window, model) == model.dates), "all")
 
 
 class Visualizations(CombinedComponent):
     """Contains the line plot with the events and the predicted recruitment risk"""
 
-    @property
     @override
-    def children(self):
-        return [LineChart(), BarChart()]
+    def make_children(self):
+        return (LineChart(), BarChart())
 
-    outer_div_type = fh.Div(cls="grid")
+    outer_div_cls = "grid"
 
 
 class LineChart(MatplotlibViz):
     """Displays a line plot of the positive and negative events for the employee/team"""
 
+    delivery = "lazy"
+    image_format = "svg"
+
     @override
-    def visualization(self, entity_id: int, model: QueryBase):
-        df = model.event_counts(entity_id)
-        df.fillna(0, inplace=True)
-        df.set_index("event_date", inplace=True)
-        df.sort_index(inplace=True)
-        df = df.cumsum()
-        df.columns = ["Positive", "Negative"]
+    def chart_spec(self, entity_id: int, model: QueryBase, dates: DateRange | None = None) -> ChartSpec:
+        import numpy as np  # only the charts need NumPy, imported on the first chart request
 
-        _, ax = plt.subplots()
-        df.plot(ax=ax, kind="line", style=["-g", "-r"])
-        self.set_axis_styling(ax, bordercolor="black", fontcolor="black")
-        ax.set_xlabel("Event date")
-        ax.set_ylabel("Cumulative Sum of Events")
-        ax.set_title(model.username(entity_id)[0][0])
+        bundle = entity_bundle(entity_id, model)
+        if dates is None or dates == model.dates:
+            rows = bundle.cumulative_event_counts
+        else:
+            rows = model.cumulative_event_count_rows(entity_id, dates, chart_points)
+        event_date = np.array(rows.column("event_date"), dtype="datetime64[D]")
+
+        return ChartSpec(
+            kind="line",
+            title=bundle.username,
+            xlabel="Event date",
+            ylabel="Cumulative Sum of Events",
+            series=(
+                Series("Positive", event_date, np.array(rows.column("positive_events")), "green"),
+                Series("Negative", event_date, np.array(rows.column("negative_events")), "red"),
+            ),
+        )
 
 
 class BarChart(MatplotlibViz):
     """Displays a bar plot with the predicted recruitment risk for the employee/team"""
 
-    @property
-    def predictor(self) -> ClassifierModel:
-        return load_model()
+    delivery = "lazy"
+    image_format = "svg"
 
     @override
-    def visualization(self, entity_id: int, model: QueryBase):
-        data = model.model_data(entity_id)
+    def cache_key(self, entity_id: int, model: QueryBase, dates: DateRange | None = None):
+        return *super().cache_key(entity_id, model, dates), model_registry.version
 
-        probabilities = self.predictor.predict_proba(data)
-        if model.name == "team":
-            pred = np.mean(probabilities, axis=0)[1]
-        else:
-            pred = probabilities[0][1]
+    @override
+    def chart_spec(self, entity_id: int, model: QueryBase, dates: DateRange | None = None) -> ChartSpec:
+        import numpy as np
 
-        _, ax = plt.subplots()
-        ax.barh(y=[""], width=[pred], edgecolor="black")
-        ax.set_xlim(0, 1)
-        ax.set_ylim(-0.5, 0.5)
-        ax.set_title("Predicted Recruitment Risk")
-        ax.set_xlabel("Probability")
-        self.set_axis_styling(ax, bordercolor="black", fontcolor="black")
+        bundle = entity_bundle(entity_id, model)
+        if dates is None or dates == model.dates:
+            model_data, pred = bundle.model_data, bundle.risk_score(model_registry.version)
+        else:
+            model_data, pred = model.model_data_rows(entity_id, dates), None
+        if pred is None:  # not scored by scoring.py since the last data or model change, or within dates
+            # mean over the employees of a team, a single employee has a single row
+            pred = model_registry.predict_risk([model_data.to_frame()])[0]
+
+        return ChartSpec(
+            kind="barh",
+            title="Predicted Recruitment Risk",
+            xlabel="Probability",
+            series=(Series("", np.array([""]), np.array([float(pred)]), "#1f77b4"),),
+            value_range=(0, 1),
+        )
 
 
 class NotesTable(DataTable):
-    """Displays a table of all the notes for the employee/team"""
+    """Displays a table of all the notes for the employee/team, loading more while scrolling"""
+
+    page_size = notes_page_size
+    page_route = "/notes"
 
     @override
-    def component_data(self, entity_id: int, model: QueryBase):
-        return model.notes(entity_id)
+    def page_data(self, entity_id: int, model: QueryBase, after: str | None):
+        limit = self.page_size or notes_page_size
+        if after is None:
+            return entity_bundle(entity_id, model, limit).notes
+
+        return model.notes_page_rows(entity_id, limit, after)
 
 
 # ============== App
 
-app, route = fh.fast_app()
 
+def check_database():
+    """Fails without the migrated tables, which every page reads, and warns about missing indexes"""
+    problems = check_schema()
+    if problems and problems[0].startswith("schema version"):
+        raise RuntimeError(f"employee_events.db: {problems[0]}, run `python -m employee_events migrate`")
+    for problem in problems:
+        warnings.warn(f"employee_events.db: {problem}, run `python -m employee_events migrate`")
+
+
+@asynccontextmanager
+async def lifespan(app: fh.FastHTML) -> AsyncIterator[None]:
+    """Checks the database and warms up the process before it accepts requests, closes the pool on shutdown"""
+    check_database()
+    await run_in_render_pool(model_registry.get)
+    # opens a pooled connection, loads the event store of the columnar backend and fills the
+    # bundle and fragment caches of the landing page
+    await report.acall_children(userid=1, model=Employee())
+    yield
+    get_pool().close()
+
+
+# `fh.fast_app` without its database support, which imports pandas through fastlite
+app = fh.FastHTML(hdrs=(picolink,), lifespan=lifespan)
+app.static_route_exts()
+route = app.route
+# the cache keys of a request read the data version once, see `request_data_version`
+app.add_middleware(RequestStateMiddleware)
+
+# Prometheus metrics at /metrics, DASHBOARD_SERVER_TIMING=1 sends the timings of every request to the browser
+metrics.install(
+    app,
+    caches={"chart": MatplotlibViz.cache, "fragment": BaseComponent.fragment_cache, "bundle": bundle_cache},
+    model_registry=model_registry,
+    server_timing=os.environ.get("DASHBOARD_SERVER_TIMING") == "1",
+)
+
+# Shared by all requests, components are not modified while rendering
 report = Report()
+dashboard_filters, _, visualizations, notes_table = report.children
 
 
-@app.get("/")
-def get_home():
-    """Initiate view for employee 1"""
-    return report.call_children(userid=1, model=Employee())
-
-
-@app.get("/employee/{employee_id}")
-def get_employee(employee_id: int):
-    """Update view for employee 'employee_id'"""
-    return report.call_children(employee_id, Employee())
+# The routes are async: the components run their queries and plotting concurrently, in the render
+# thread pool, and a slow page does not hold up the requests of other users.
 
 
-@app.get("/team/{team_id}")
-def get_team(team_id: int):
-    """Update view for team 'team_id'"""
-    return report.call_children(team_id, Team())
-
-
-@app.get("/update_dropdown/{r}")
-def update_dropdown(request: fh.Request):
-    """Update dropdown to switch between employee and team"""
-    dropdown = DashboardFilters().children[1]
-    profile_type = request.query_params["profile_type"]
-    if profile_type == "Team":
-        return dropdown(None, Team())
-    elif profile_type == "Employee":
-        return dropdown(None, Employee())
+@app.route("/", methods=["get"])
+async def get_home():
+    """Initiate view for employee 1"""
+    return await report.acall_children(userid=1, model=Employee())
+
 
+async def window_model(model_class: type[QueryBase], window: str) -> QueryBase:
+    """Query class restricted to a rolling window of `windows`"""
+    return model_class(await run_in_render_pool(window_dates, window, model_class()))
 
-@app.post("/update_data/")
+
+@app.route("/employee/{employee_id}", methods=["get"])
+async def get_employee(employee_id: int, window: str = "all"):
+    """Update view for employee 'employee_id', within a rolling window of the events"""
+    if window not in windows:
+        return fh.Response(f"Unknown window {window!r}", status_code=400)
+
+    return await report.acall_children(employee_id, await window_model(Employee, window))
+
+
+@app.route("/team/{team_id}", methods=["get"])
+async def get_team(team_id: int, window: str = "all"):
+    """Update view for team 'team_id', within a rolling window of the events"""
+    if window not in windows:
+        return fh.Response(f"Unknown window {window!r}", status_code=400)
+
+    return await report.acall_children(team_id, await window_model(Team, window))
+
+
+@app.route("/org/{level}/{unit_id}", methods=["get"])
+async def get_org_unit(level: str, unit_id: int, window: str = "all"):
+    """Update view for the unit 'unit_id' of a level of the org hierarchy, within a rolling window of the events"""
+    if window not in windows:
+        return fh.Response(f"Unknown window {window!r}", status_code=400)
+    model_class = await run_in_render_pool(query_class, level)
+    if model_class is None or level in models:
+        return fh.Response(status_code=404)
+
+    return await report.acall_children(unit_id, await window_model(model_class, window))
+
+
+charts: dict[str, MatplotlibViz] = {type(chart).__name__: chart for chart in visualizations.children}
+models: dict[str, type[QueryBase]] = {"employee": Employee, "team": Team}
+
+
+def query_class(model_name: str) -> Callable[..., QueryBase] | None:
+    """The query class of `models` or of a level of the org hierarchy, `None` for an unknown name"""
+    if model_name in models:
+        return models[model_name]
+    if model_name in current_levels(Employee()):
+        return partial(OrgUnit, model_name)
+
+    return None
+
+
+@app.route("/update_dropdown/{r}", methods=["get"])
+async def update_dropdown(request: fh.Request):
+    """Update dropdown to switch between employee, team and the levels of the org hierarchy"""
+    dropdown = dashboard_filters.children[1]
+    model_class = await run_in_render_pool(query_class, request.query_params["profile_type"].lower())
+    if model_class is not None:
+        return await dropdown.acall(None, model_class())
+
+
+def query_dates(start: str | None, end: str | None) -> DateRange | None:
+    """The date range of the `start` and `end` query parameters of the chart and notes routes, `None` without them"""
+    return DateRange(start or None, end or None) if start or end else None
+
+
+# No .png/.svg extension, fasthtml serves every url with a static file extension from the disk
+@app.route("/chart/{chart_name}/{model_name}/{entity_id}/{fmt}", methods=["get"])
+async def get_chart_image(
+    request: fh.Request,
+    chart_name: str,
+    model_name: str,
+    entity_id: int,
+    fmt: str,
+    start: str | None = None,
+    end: str | None = None,
+):
+    """Rendered chart as png, svg or json, cacheable by browsers and proxies since its url changes with the data"""
+    if chart_name not in charts or fmt not in charts[chart_name].formats:
+        return fh.Response(status_code=404)
+    model_class = await run_in_render_pool(query_class, model_name)
+    if model_class is None:
+        return fh.Response(status_code=404)
+    try:
+        dates = query_dates(start, end)
+    except ValueError as error:
+        return fh.Response(str(error), status_code=400)
+
+    chart, model = charts[chart_name], model_class()
+    if not await run_in_render_pool(entity_exists, entity_id, model):
+        return fh.Response(status_code=404)
+    etag = f'"{await run_in_render_pool(chart.etag, entity_id, model, fmt, dates)}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(get_pool().path.stat().st_mtime, usegmt=True),
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return fh.Response(status_code=304, headers=headers)
+
+    content = await run_in_render_pool(chart.render, entity_id, model, fmt, dates)
+    return fh.Response(content, media_type=chart.media_type(fmt), headers=headers)
+
+
+@app.route("/chart/{chart_name}/{model_name}/{entity_id}", methods=["get"])
+async def get_chart(chart_name: str, model_name: str, entity_id: int, start: str | None = None, end: str | None = None):
+    """Chart image tag, requested by the lazy chart placeholders"""
+    model_class = await run_in_render_pool(query_class, model_name)
+    if chart_name not in charts or model_class is None:
+        return fh.Response(status_code=404)
+    try:
+        dates = query_dates(start, end)
+    except ValueError as error:
+        return fh.Response(str(error), status_code=400)
+
+    model = model_class()
+    if not await run_in_render_pool(entity_exists, entity_id, model):
+        return fh.Response(status_code=404)
+    return await run_in_render_pool(charts[chart_name].image, entity_id, model, False, dates)
+
+
+@app.route("/notes/{model_name}/{entity_id}", methods=["get"])
+async def get_notes(model_name: str, entity_id: int, after: str, start: str | None = None, end: str | None = None):
+    """Next rows of the notes table, within the dates of the table"""
+    model_class = await run_in_render_pool(query_class, model_name)
+    if model_class is None:
+        return fh.Response(status_code=404)
+    try:
+        dates = query_dates(start, end)
+        QueryBase.parse_cursor(after)
+    except ValueError as error:
+        return fh.Response(str(error), status_code=400)
+
+    return tuple(await run_in_render_pool(notes_table.next_rows, entity_id, model_class(dates), after))
+
+
+@app.route("/update_data/", methods=["post"])
 async def update_data(request: fh.Request):
-    """Update data (plots + table) for selected employee or team"""
+    """Update data (plots + table) for selected employee, team or unit of the org hierarchy"""
     data: fh.FormData = await request.form()
     profile_type = data._dict["profile_type"]
     id = data._dict["user-selection"]
+    window = data._dict.get("window", "all")
+    query = "" if window == "all" else f"?{urlencode({'window': window})}"
     if profile_type == "Employee":
-        return fh.RedirectResponse(f"/employee/{id}", status_code=303)
+        return fh.RedirectResponse(f"/employee/{id}{query}", status_code=303)
     elif profile_type == "Team":
-        return fh.RedirectResponse(f"/team/{id}", status_code=303)
+        return fh.RedirectResponse(f"/team/{id}{query}", status_code=303)
+    elif isinstance(profile_type, str) and profile_type.isidentifier():
+        return fh.RedirectResponse(f"/org/{profile_type.lower()}/{id}{query}", status_code=303)
 
 
 fh.serve()
@@ -0,0 +1,156 @@
+"""Static export of the dashboard of every employee and team.
+
+Every report is rendered to `OUT/{employee,team}/{id}/index.html`, next to the images of its
+charts in their `image_format`, and `OUT/index.html` links them all. The reports are rendered by
+a pool of processes, since rendering is CPU bound. Every worker opens a single database connection and loads the
+classifier once, and the columnar backend reads the events once per worker. The same database
+and model always produce the same files.
+
+    python report/export.py OUT [--db PATH] [--workers N] [--backend columnar]
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple, override
+
+import fasthtml.common as fh
+from dashboard import BarChart, Header, LineChart, NotesTable, Report, Visualizations, entity_bundle
+from employee_events import ConnectionPool, QueryBase, backends, configure_pool
+from employee_events.sql_execution import db_path
+from utils import model_registry
+
+
+class StaticLineChart(LineChart):
+    delivery = "file"
+    cache = None
+
+
+class StaticBarChart(BarChart):
+    delivery = "file"
+    cache = None
+
+
+class StaticVisualizations(Visualizations):
+    @override
+    def make_children(self):
+        return (StaticLineChart(), StaticBarChart())
+
+
+class StaticNotesTable(NotesTable):
+    """Displays all the notes at once, there is no server to load more"""
+
+    page_size = None
+
+    @override
+    def page_data(self, entity_id: int, model: QueryBase, after: str | None):
+        return model.notes_rows(entity_id)
+
+
+class StaticReport(Report):
+    """The dashboard without the filters, which need the server"""
+
+    @override
+    def make_children(self):
+        return (Header(), StaticVisualizations(), StaticNotesTable())
+
+
+# Set in every worker process by `init_worker`
+models: Dict[str, type[QueryBase]] = {}
+report = StaticReport()
+
+
+def init_worker(path: Path, backend: str) -> None:
+    configure_pool(path=path, size=1)
+    model_registry.get()
+    models.update(zip(["employee", "team"], backends[backend]))
+
+
+def html_page(title: str, *content) -> str:
+    return "<!doctype html>\n" + fh.to_xml(
+        fh.Html(
+            fh.Head(fh.Meta(charset="utf-8"), fh.Title(title), *fh.picolink),
+            fh.Body(fh.Main(*content, cls="container")),
+        )
+    )
+
+
+def export_report(out: Path, model_name: str, entity_id: int) -> Tuple[str, int, int]:
+    """Writes the page and chart images of one employee or team, returns its title and number of files and bytes"""
+    model = models[model_name]()
+    directory = out / model_name / str(entity_id)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    title = f"{entity_bundle(entity_id, model).username} - {model_name.capitalize()} Performance"
+    files = {"index.html": html_page(title, *report.call_children(entity_id, model)).encode()}
+    for chart in report.children[1].children:
+        files[chart.file_name] = chart.render(entity_id, model)
+
+    for name, content in files.items():
+        (directory / name).write_bytes(content)
+
+    return title, len(files), sum(len(content) for content in files.values())
+
+
+def export_all(out: Path, path: Path = db_path, workers: int | None = None, backend: str = "columnar") -> Dict:
+    """Exports the reports of every employee and team
+
+    Args:
+        out (Path): Directory the reports are written to.
+        path (Path): Path to the SQLite database.
+        workers (int | None): Number of worker processes, one per CPU by default.
+        backend (str): Query backend of the workers, see `employee_events.backends`.
+
+    Returns:
+        Dict: The number of reports, files and bytes written, and the duration in seconds.
+    """
+    start = time.perf_counter()
+
+    # a pool of its own, no connection is shared with the workers
+    pool = ConnectionPool(path, size=1)
+    jobs: List[Tuple[str, int]] = []
+    for model_name, query_base in zip(["employee", "team"], backends[backend]):
+        model = query_base()
+        model.pool = pool
+        jobs += [(model_name, int(entity_id)) for _, entity_id in model.names()]
+    pool.close()
+
+    # spawned workers, a fork would copy the threads and connections of the calling process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, context, initializer=init_worker, initargs=(path, backend)) as executor:
+        results = list(executor.map(export_report, [out] * len(jobs), *zip(*jobs), chunksize=max(1, len(jobs) // 64)))
+
+    links = [
+        fh.Li(fh.A(title, href=f"{model_name}/{entity_id}/index.html"))
+        for (model_name, entity_id), (title, _, _) in zip(jobs, results)
+    ]
+    (out / "index.html").write_text(html_page("Employee Performance Reports", fh.H1("Reports"), fh.Ul(*links)))
+
+    return {
+        "reports": len(jobs),
+        "files": sum(files for _, files, _ in results) + 1,
+        "bytes": sum(size for _, _, size in results),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the report of every employee and team to static files.")
+    parser.add_argument("out", type=Path, help="directory the reports are written to")
+    parser.add_argument("--db", type=Path, default=db_path, help="path to the SQLite database")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--backend", choices=list(backends), default="columnar", help="query backend of the workers")
+    args = parser.parse_args()
+
+    stats = export_all(args.out, args.db, args.workers, args.backend)
+    print(
+        f"exported {stats['reports']} reports ({stats['files']} files, {stats['bytes'] / 2**20:.1f} MiB) "
+        f"in {stats['seconds']:.2f}s with {args.workers} workers, {stats['reports'] / stats['seconds']:.1f} reports/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""Request, query and component metrics of the dashboard, in the Prometheus text format.
+
+`install` registers the query and component hooks, adds `MetricsMiddleware` to the app and
+serves the metrics at `/metrics`. Every request gets a `RequestTrace`, which the hooks fill from
+any render thread since `run_in_render_pool` runs in the context of the request. With
+`server_timing`, the trace is also sent as a `Server-Timing` header, shown by the browser devtools:
+
+    Server-Timing: db;dur=3.1;desc="5 queries", render;dur=12.4, total;dur=18.0
+
+Histograms and counters are kept per process, the cache statistics are read at every scrape.
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+from base_components import LRUCache, component_hooks
+from employee_events import query_hooks
+from fasthtml.core import FastHTML
+from starlette.responses import Response
+
+latency_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+count_buckets = (0, 1, 2, 5, 10, 20, 50, 100)
+size_buckets = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Prometheus counter, with one series per combination of label values
+
+    Args:
+        name (str): Metric name.
+        help (str): Description of the metric.
+        labels (Sequence[str]): Label names.
+    """
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        return lines + [f"{self.name}{_labels(self.labels, label_values)} {value}" for label_values, value in values]
+
+
+class Histogram:
+    """Prometheus histogram, with one series per combination of label values
+
+    Args:
+        name (str): Metric name.
+        help (str): Description of the metric.
+        labels (Sequence[str]): Label names.
+        buckets (Sequence[float]): Sorted upper bounds of the buckets, without `+Inf`.
+    """
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = latency_buckets):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # per label values: the count of every bucket and +Inf, not cumulative, and the sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            counts, total = self._series.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted(
+                (label_values, (list(counts), total[0])) for label_values, (counts, total) in self._series.items()
+            )
+
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labels, label_values, le=str(bound))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {cumulative}")
+
+        return lines
+
+
+request_duration = Histogram("dashboard_request_duration_seconds", "Duration of the requests.", ["route"])
+request_queries = Histogram(
+    "dashboard_request_queries", "Database queries issued per request.", ["route"], buckets=count_buckets
+)
+response_size = Histogram("dashboard_response_size_bytes", "Size of the response bodies.", ["route"], size_buckets)
+responses = Counter("dashboard_responses_total", "Responses sent, by status code.", ["route", "status"])
+query_duration = Histogram("employee_events_query_duration_seconds", "Duration of the queries.", ["entity", "method"])
+query_rows = Counter("employee_events_query_rows_total", "Rows returned by the queries.", ["entity", "method"])
+component_duration = Histogram(
+    "dashboard_component_duration_seconds", "Duration of the component renders.", ["component"]
+)
+component_size = Histogram(
+    "dashboard_component_size_bytes",
+    "Size of the rendered charts and cached fragments.",
+    ["component"],
+    buckets=size_buckets,
+)
+
+
+@dataclass
+class RequestTrace:
+    """Queries and renders of one request, filled by the hooks from any thread"""
+
+    start: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    query_seconds: float = 0.0
+    render_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_query(self, seconds: float) -> None:
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += seconds
+
+    def add_render(self, seconds: float) -> None:
+        with self._lock:
+            self.render_seconds += seconds
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.start
+        return (
+            f'db;dur={self.query_seconds * 1000:.1f};desc="{self.queries} queries", '
+            f"render;dur={self.render_seconds * 1000:.1f}, total;dur={total * 1000:.1f}"
+        )
+
+
+current_trace: ContextVar[RequestTrace | None] = ContextVar("current_trace", default=None)
+
+
+def record_query(entity: str, method: str, seconds: float, rows: int) -> None:
+    query_duration.observe(seconds, entity, method)
+    query_rows.inc(entity, method, amount=rows)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_query(seconds)
+
+
+def record_component(name: str, seconds: float, result: Any) -> None:
+    component_duration.observe(seconds, name)
+    if isinstance(result, (bytes, str)):  # charts, and fragments from the fragment cache
+        component_size.observe(len(result), name)
+
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_render(seconds)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every request, labelled by the path of the matched route
+
+    Args:
+        app: The wrapped ASGI app.
+        server_timing (bool): Adds a `Server-Timing` header to every response.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+        self._paths: Dict[int, str] = {}
+
+    def route_path(self, scope) -> str:
+        """The path template of the route that handled a request, e.g. `/employee/{employee_id}`"""
+        # the router sets itself and the endpoint of the matched route on the shared scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+
+        if id(endpoint) not in self._paths:
+            routes = scope["router"].routes
+            self._paths = {id(route.endpoint): route.path for route in routes if hasattr(route, "endpoint")}
+        return self._paths.get(id(endpoint), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        # a single trace per request, an outer metrics middleware already records it
+        if scope["type"] != "http" or current_trace.get() is not None:
+            return await self.app(scope, receive, send)
+
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        status, size = 500, 0
+
+        async def send_with_metrics(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = [*message.get("headers", []), (b"server-timing", trace.server_timing().encode())]
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            current_trace.reset(token)
+            route = self.route_path(scope)
+            request_duration.observe(time.perf_counter() - trace.start, route)
+            request_queries.observe(trace.queries, route)
+            response_size.observe(size, route)
+            responses.inc(route, str(status))
+
+
+def render_caches(caches: Mapping[str, LRUCache | None]) -> List[str]:
+    stats = {name: cache.stats() for name, cache in caches.items() if cache is not None}
+    lines = []
+    for stat, kind, help in [
+        ("hits", "counter", "Lookups finding a cached value."),
+        ("misses", "counter", "Lookups missing a cached value."),
+        ("entries", "gauge", "Values in the cache."),
+        ("bytes", "gauge", "Size of the cached values."),
+    ]:
+        metric = f"dashboard_cache_{stat}" + ("_total" if kind == "counter" else "")
+        lines += [f"# HELP {metric} {help}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{cache="{name}"}} {cache_stats[stat]}' for name, cache_stats in stats.items()]
+
+    return lines
+
+
+metrics = [
+    request_duration,
+    request_queries,
+    response_size,
+    responses,
+    query_duration,
+    query_rows,
+    component_duration,
+    component_size,
+]
+
+
+def render_metrics(caches: Mapping[str, LRUCache | None] | None = None, model_registry=None) -> str:
+    """All the metrics in the Prometheus text exposition format"""
+    lines = [line for metric in metrics for line in metric.render()] + render_caches(caches or {})
+    if model_registry is not None:
+        lines += [
+            "# HELP dashboard_model_loads_total Loads of the pickled classifier.",
+            "# TYPE dashboard_model_loads_total counter",
+            f"dashboard_model_loads_total {model_registry.loads}",
+            "# HELP dashboard_model_load_seconds Duration of the last classifier load.",
+            "# TYPE dashboard_model_load_seconds gauge",
+            f"dashboard_model_load_seconds {model_registry.load_seconds}",
+        ]
+
+    return "\n".join(lines) + "\n"
+
+
+def install(
+    app: FastHTML,
+    caches: Mapping[str, LRUCache | None] | None = None,
+    model_registry=None,
+    server_timing: bool = False,
+) -> None:
+    """Records the metrics of an app and serves them at `/metrics`
+
+    Args:
+        app (FastHTML): The dashboard app, before it started.
+        caches (Mapping[str, LRUCache | None] | None): Caches to report the statistics of, by name, `None` if disabled.
+        model_registry (ModelRegistry | None): Registry to report the classifier loads of.
+        server_timing (bool): Adds a `Server-Timing` header to every response.
+    """
+    if record_query not in query_hooks:
+        query_hooks.append(record_query)
+    if record_component not in component_hooks:
+        component_hooks.append(record_component)
+
+    app.add_middleware(MetricsMiddleware, server_timing=server_timing)
+
+    @app.route("/metrics", methods=["get"])
+    def get_metrics():
+        return Response(render_metrics(caches, model_registry), media_type="text/plain; version=0.0.4; charset=utf-8")
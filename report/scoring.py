@@ -0,0 +1,68 @@
+"""Batch scoring of the recruitment risk of every employee, team and unit of the org hierarchy.
+
+The scores are appended to the `risk_scores` table, from where `BarChart` reads them instead of
+scoring on every request. Run it after loading new events, or on a schedule:
+
+    python report/scoring.py [--db PATH] [--every SECONDS]
+"""
+
+import argparse
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from sqlite3 import connect
+from typing import Dict
+
+from employee_events import ConnectionPool, Employee, OrgUnit, Team, org_levels, store_risk_scores
+from employee_events.sql_execution import db_path
+from utils import ModelRegistry, model_registry
+
+
+def score_all(path: Path = db_path, registry: ModelRegistry = model_registry) -> Dict[str, int]:
+    """Scores every employee, team and org unit and stores the scores in the database
+
+    Args:
+        path (Path): Path to the SQLite database.
+        registry (ModelRegistry): Provides the classifier and its version.
+
+    Returns:
+        Dict[str, int]: The number of stored scores per entity type.
+    """
+    pool = ConnectionPool(path, size=1)
+    scored_at = datetime.now(UTC)
+    stored = {}
+
+    db_conn = connect(path)
+    try:
+        with db_conn:
+            for model in [Employee(), Team(), *(OrgUnit(level) for level in org_levels(pool))]:
+                model.pool = pool
+                scores = registry.predict_grouped_risk(model.all_model_data(), by=f"{model.name}_id")
+                stored[model.name] = store_risk_scores(
+                    db_conn, model.name, scores, registry.version, model.data_version(), scored_at
+                )
+    finally:
+        db_conn.close()
+        pool.close()
+
+    return stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score the recruitment risk of every employee and team.")
+    parser.add_argument("--db", type=Path, default=db_path, help="path to the SQLite database")
+    parser.add_argument("--every", type=float, default=0, help="rescore every N seconds instead of once")
+    args = parser.parse_args()
+
+    while True:
+        start = time.perf_counter()
+        stored = score_all(args.db)
+        print(f"stored {stored} risk scores in {time.perf_counter() - start:.2f}s")
+
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
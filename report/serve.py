@@ -0,0 +1,301 @@
+"""Production server of the dashboard, with several worker processes.
+
+The supervisor imports the dashboard and loads the classifier, and the event store of the
+columnar backend, once. It then forks the uvicorn workers, which share that memory copy-on-write.
+`gc.freeze` moves the preloaded objects out of the garbage collector, whose passes would otherwise
+write to their pages and copy them into every worker. The SQLite file is memory-mapped by every
+connection (`mmap_size`), so the workers read it from the same page cache. No connection is
+opened before forking, every worker opens its own pool, and its lifespan warms it up before it
+accepts any request.
+
+The workers share the listening socket. A worker that exits is replaced. When `model.pkl` or the
+database file is replaced, or on `SIGHUP`, the supervisor preloads the new files and forks a new
+generation of workers. Once they are ready, it stops the previous ones with `SIGTERM`: they stop
+accepting connections and finish their requests first. `SIGTERM` or `SIGINT` stops every worker
+and then the supervisor. Forking needs a POSIX system.
+
+    python report/serve.py [--workers N] [--host HOST] [--port PORT] [--db PATH] [--backend sqlite|columnar]
+"""
+
+import argparse
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Dict, List, Tuple, override
+
+import uvicorn
+from employee_events import ConnectionPool, configure_pool, get_pool
+from employee_events.columnar import ColumnarQueryMixin, clear_event_stores, get_event_store
+from employee_events.sql_execution import db_path
+from utils import model_registry
+
+
+class WorkerServer(uvicorn.Server):
+    """Uvicorn server writing to a pipe once its lifespan startup is done and it accepts connections"""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    @override
+    async def startup(self, sockets=None):
+        await super().startup(sockets)
+        if not self.should_exit:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+
+
+def preload() -> None:
+    """Loads what the workers share before forking, without leaving a database connection open"""
+    import dashboard
+
+    model_registry.get()
+    if issubclass(dashboard.Employee, ColumnarQueryMixin):
+        clear_event_stores()
+        pool = ConnectionPool(get_pool().path, size=1)
+        try:
+            get_event_store(pool)  # stored by database path, and found by the pools of the workers
+        finally:
+            pool.close()
+
+    gc.collect()
+    gc.freeze()
+
+
+class Supervisor:
+    """Forks and supervises the uvicorn workers of the dashboard
+
+    Args:
+        host (str): Address to listen on.
+        port (int): Port to listen on.
+        workers (int): Number of worker processes.
+        watch_interval (float): Seconds between two checks of the model and database files.
+        ready_timeout (float): Seconds a new worker gets to start, before a reload is abandoned.
+        graceful_timeout (float): Seconds a stopped worker gets to finish its requests.
+    """
+
+    # Longest delay between two attempts to replace the workers that exited
+    max_restart_delay = 60.0
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 5001,
+        workers: int = 2,
+        watch_interval: float = 1.0,
+        ready_timeout: float = 60.0,
+        graceful_timeout: float = 30.0,
+    ):
+        if workers < 1:
+            raise ValueError("At least one worker is needed.")
+
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.watch_interval = watch_interval
+        self.ready_timeout = ready_timeout
+        self.graceful_timeout = graceful_timeout
+
+        self.socket: socket.socket | None = None
+        self.pids: List[int] = []
+        self._stopping = False
+        self._reload_requested = False
+        # workers that failed to start are forked again after a delay, doubled after every failure
+        self._restart_delay = 0.0
+        self._restart_at = 0.0
+
+    @property
+    def watched_paths(self) -> List[Path]:
+        return [model_registry.path, get_pool().path]
+
+    def file_versions(self) -> Dict[Path, Tuple[int, int]]:
+        """Inode and modification time of the watched files, which change when a file is replaced"""
+        versions = {}
+        for path in self.watched_paths:
+            try:
+                stat = path.stat()
+                versions[path] = stat.st_ino, stat.st_mtime_ns
+            except FileNotFoundError:  # between the removal and the rename of a replacement
+                versions[path] = 0, 0
+        return versions
+
+    def bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def spawn(self) -> Tuple[int, int]:
+        """Forks a worker, returns its pid and the pipe it writes to once ready"""
+        sock = self.socket
+        if sock is None:
+            raise RuntimeError("The socket is bound by `run` before forking any worker.")
+
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid != 0:
+            os.close(ready_write)
+            return pid, ready_read
+
+        # worker process: uvicorn installs its own SIGINT and SIGTERM handlers
+        os.close(ready_read)
+        for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        status = 1
+        try:
+            import dashboard
+
+            config = uvicorn.Config(
+                dashboard.app,
+                lifespan="on",
+                timeout_graceful_shutdown=int(self.graceful_timeout),
+                log_level="warning",
+            )
+            WorkerServer(config, ready_write).run(sockets=[sock])
+            status = 0
+        except Exception:  # os._exit skips the interpreter's report of the exception
+            traceback.print_exc()
+        finally:
+            os._exit(status)
+
+    def spawn_ready(self, count: int) -> List[int]:
+        """Forks workers and waits until all of them accept connections, stops them on a timeout"""
+        pending = dict(self.spawn() for _ in range(count))
+        pids = list(pending)
+        deadline = time.monotonic() + self.ready_timeout
+        while pending and time.monotonic() < deadline:
+            readable, _, _ = select.select(list(pending.values()), [], [], deadline - time.monotonic())
+            for pid, fd in list(pending.items()):
+                if fd in readable:
+                    os.close(fd)
+                    pending.pop(pid)
+
+        if pending:
+            for fd in pending.values():
+                os.close(fd)
+            self.stop(pids)
+            raise RuntimeError(f"{len(pending)} of {count} workers did not start within {self.ready_timeout}s.")
+        return pids
+
+    def stop(self, pids: List[int]) -> None:
+        """Stops workers with SIGTERM, and SIGKILL after the graceful timeout"""
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        remaining = set(pids)
+        while remaining and time.monotonic() < deadline:
+            for pid in list(remaining):
+                try:
+                    if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                        remaining.discard(pid)
+                except ChildProcessError:
+                    remaining.discard(pid)
+            time.sleep(0.05)
+
+        for pid in remaining:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+
+    def reload(self) -> None:
+        """Replaces the workers by new ones preloaded with the current model and database files"""
+        print("serve: reloading the workers", file=sys.stderr)
+        gc.unfreeze()
+        preload()
+        try:
+            new_pids = self.spawn_ready(self.workers)
+        except RuntimeError as error:  # the previous workers keep serving
+            print(f"serve: reload failed, {error}", file=sys.stderr)
+            return
+
+        old_pids, self.pids = self.pids, new_pids
+        self.stop(old_pids)
+        print(f"serve: reloaded, workers {new_pids}", file=sys.stderr)
+
+    def reap(self) -> None:
+        """Replaces the workers that exited, retrying with backoff while they fail to start"""
+        for pid in list(self.pids):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, 0
+            if done == pid and not self._stopping:
+                print(f"serve: worker {pid} exited with status {status}, restarting it", file=sys.stderr)
+                self.pids.remove(pid)
+
+        missing = self.workers - len(self.pids)
+        if missing <= 0 or self._stopping or time.monotonic() < self._restart_at:
+            return
+
+        try:
+            self.pids += self.spawn_ready(missing)
+        except RuntimeError as error:  # the remaining workers keep serving
+            self._restart_delay = min(max(2 * self._restart_delay, self.watch_interval), self.max_restart_delay)
+            self._restart_at = time.monotonic() + self._restart_delay
+            print(f"serve: restart failed, {error} Retrying in {self._restart_delay:.0f}s", file=sys.stderr)
+            return
+
+        self._restart_delay = 0.0
+
+    def run(self) -> None:
+        """Preloads, forks the workers and supervises them until SIGTERM or SIGINT"""
+        self.socket = self.bind()
+        preload()
+        self.pids = self.spawn_ready(self.workers)
+        print(f"serve: listening on {self.host}:{self.port}, workers {self.pids}", file=sys.stderr)
+
+        def request_stop(signum, frame):
+            self._stopping = True
+
+        def request_reload(signum, frame):
+            self._reload_requested = True
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGHUP, request_reload)
+
+        versions = self.file_versions()
+        try:
+            while not self._stopping:
+                time.sleep(self.watch_interval)
+                self.reap()
+                current = self.file_versions()
+                if self._reload_requested or current != versions:
+                    self._reload_requested = False
+                    versions = current
+                    self.reload()
+        finally:
+            self._stopping = True
+            self.stop(self.pids)
+            self.socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard with several worker processes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", default=5001)), help="port to listen on")
+    parser.add_argument("--db", type=Path, default=db_path, help="path to the SQLite database")
+    parser.add_argument("--backend", choices=["sqlite", "columnar"], help="query backend, EMPLOYEE_EVENTS_BACKEND")
+    args = parser.parse_args()
+
+    if args.backend:
+        os.environ["EMPLOYEE_EVENTS_BACKEND"] = args.backend  # read by the dashboard when imported
+    configure_pool(path=args.db)  # connections are opened lazily, by every worker
+
+    Supervisor(args.host, args.port, args.workers).run()
+
+
+if __name__ == "__main__":
+    main()
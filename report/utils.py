@@ -1,8 +1,13 @@
+import hashlib
 import pickle
+import threading
+import time
 from pathlib import Path
-from typing import Protocol
+from typing import TYPE_CHECKING, Dict, List, Protocol, Sequence
 
-import numpy.typing as npt
+if TYPE_CHECKING:
+    import numpy.typing as npt
+    import pandas as pd
 
 project_root = Path(__file__).parents[1]
 
@@ -10,14 +15,106 @@ model_path = project_root / "assets" / "model.pkl"
 
 
 class ClassifierModel(Protocol):
-    def predict_proba(self, x) -> npt.NDArray: ...
+    def predict_proba(self, x) -> "npt.NDArray": ...
 
 
-def load_model() -> ClassifierModel:
-    with model_path.open("rb") as file:
+def validate_model(model) -> ClassifierModel:
+    if not callable(getattr(model, "predict_proba", None)):
+        raise TypeError("The used model should be a classifier with a 'predict_proba' method.")
+
+    return model
+
+
+def load_model(path: Path = model_path) -> ClassifierModel:
+    with path.open("rb") as file:
         model = pickle.load(file)
 
-    if not hasattr(model, "predict_proba"):
-        raise Exception("The used model should be a classifier with a 'predict_proba' method.")
+    return validate_model(model)
 
-    return model
+
+class ModelRegistry:
+    """Keeps the classifier in memory, reloading it when the model file changes
+
+    Args:
+        path (Path): Path to the pickled classifier.
+    """
+
+    def __init__(self, path: Path = model_path):
+        self.path = path
+
+        self._model: ClassifierModel | None = None
+        self._mtime_ns: int | None = None
+        self._version = ""
+        self._lock = threading.Lock()
+
+        # number of loads of the model file, and the duration of the last one
+        self.loads = 0
+        self.load_seconds = 0.0
+
+    def get(self) -> ClassifierModel:
+        """Returns the loaded classifier, reloading it first if the file was modified"""
+        if self._model is None or self.path.stat().st_mtime_ns != self._mtime_ns:
+            return self.reload()
+
+        return self._model
+
+    @property
+    def version(self) -> str:
+        """Short hash of the current model file"""
+        self.get()
+        return self._version
+
+    def reload(self) -> ClassifierModel:
+        """Loads and validates the classifier from disk"""
+        with self._lock:
+            start = time.perf_counter()
+            mtime_ns = self.path.stat().st_mtime_ns
+            pickled = self.path.read_bytes()
+            model = validate_model(pickle.loads(pickled))
+
+            self.loads += 1
+            self.load_seconds = time.perf_counter() - start
+            self._model = model
+            self._mtime_ns = mtime_ns
+            self._version = hashlib.sha256(pickled).hexdigest()[:12]
+            return model
+
+    def predict_risk(self, model_data: Sequence["pd.DataFrame"]) -> List[float]:
+        """Predicts the recruitment risk of many employees or teams with a single `predict_proba` call
+
+        Args:
+            model_data (Sequence[pd.DataFrame]): The `QueryBase.model_data` of each employee or team,
+                with one row per employee.
+
+        Returns:
+            List[float]: The mean probability of the positive class over the rows of each frame.
+        """
+        import numpy as np
+        import pandas as pd
+
+        sizes = [len(data) for data in model_data]
+        if not sizes or 0 in sizes:
+            raise ValueError("Every employee or team needs at least one row of model data.")
+
+        probabilities = self.get().predict_proba(pd.concat(model_data, ignore_index=True))[:, 1]
+        offsets = np.cumsum([0, *sizes[:-1]])
+
+        return (np.add.reduceat(probabilities, offsets) / sizes).tolist()
+
+    def predict_grouped_risk(self, model_data: "pd.DataFrame", by: str) -> Dict[int, float]:
+        """Predicts the recruitment risk of many employees or teams with a single `predict_proba` call
+
+        Args:
+            model_data (pd.DataFrame): The `QueryBase.all_model_data` of the employees or teams.
+            by (str): The id column identifying the employee or team of each row.
+
+        Returns:
+            Dict[int, float]: The mean probability of the positive class over the rows of each id.
+        """
+        import pandas as pd
+
+        probabilities = self.get().predict_proba(model_data.drop(columns=by))[:, 1]
+        return pd.Series(probabilities).groupby(model_data[by].to_numpy()).mean().to_dict()
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,26 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parents[1]
+
+# The bundled database is kept at the schema of the course, the tests run on a migrated copy
+_tmp_dir = tempfile.TemporaryDirectory()
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    # before employee_events is imported, which reads EMPLOYEE_EVENTS_DB once, and inherited by subprocesses
+    db_path = Path(_tmp_dir.name) / "employee_events.db"
+    shutil.copy(project_root / "python-package" / "employee_events" / "employee_events.db", db_path)
+    os.environ["EMPLOYEE_EVENTS_DB"] = str(db_path)
+
+    from employee_events import migrate
+
+    migrate(db_path)
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    _tmp_dir.cleanup()
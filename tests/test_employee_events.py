@@ -1,19 +1,42 @@
+import shutil
 from pathlib import Path
-from sqlite3 import connect
+from sqlite3 import OperationalError, connect
+from threading import Thread
 from typing import List
 
+import numpy as np
 import pandas as pd
 import pytest
-from employee_events import Employee, QueryBase, QueryMixin, Team
-
-project_root = Path(__file__).parents[1]
+from employee_events import (
+    ColumnarEmployee,
+    ColumnarTeam,
+    ConnectionPool,
+    DateRange,
+    Employee,
+    EventStore,
+    OrgUnit,
+    QueryBase,
+    QueryMixin,
+    Rows,
+    Team,
+    check_schema,
+    ingest_file,
+    load_org,
+    migrate,
+    migrations,
+    org_levels,
+    query_hooks,
+    refresh_rollups,
+    sql_execution,
+)
+from employee_events.__main__ import main
 
 # ===== tests database
 
 
 @pytest.fixture
 def db_path() -> Path:
-    return project_root / "python-package" / "employee_events" / "employee_events.db"
+    return sql_execution.db_path  # the migrated copy of conftest.py
 
 
 @pytest.fixture
@@ -70,6 +93,25 @@ def test_query_mixin() -> None:
     assert list(df.itertuples(index=False, name=None))[0] == query_mixin.query(sql_query)[0]
 
 
+def test_rows() -> None:
+    query_mixin = QueryMixin()
+    for sql_query in [
+        "SELECT * FROM notes;",
+        "SELECT COUNT(*), SUM(positive_events) / 2.0 FROM employee_events;",
+        "SELECT SUM(positive_events) FROM employee_events WHERE employee_id = -1;",
+        "SELECT * FROM employee WHERE employee_id = -1;",
+    ]:
+        rows = query_mixin.rows(sql_query)
+        assert list(rows) == query_mixin.query(sql_query)
+        pd.testing.assert_frame_equal(rows.to_frame(), query_mixin.pandas_query(sql_query))
+
+    rows = query_mixin.rows("SELECT employee_id, first_name FROM employee ORDER BY employee_id;")
+    assert rows.columns == ("employee_id", "first_name")
+    assert getattr(rows[0], "first_name") == rows.column("first_name")[0]  # named tuples, typed as plain tuples
+    assert rows[1:] == Rows(rows.columns, list(rows)[1:])
+    assert Rows.from_columns({"id": np.arange(2)}) == Rows(["id"], [(0,), (1,)])
+
+
 def test_employee() -> None:
     employee = Employee()
     assert employee.name == "employee"
@@ -137,3 +179,475 @@ def query_base_helper(query_base: QueryBase) -> None:
         .reset_index()[["event_date", "positive_events", "negative_events"]]
     )
     assert all(df_event_count == query_base.event_counts(1))
+
+
+# ===== test connection pool
+
+
+def test_pool_reuses_connections(db_path: Path) -> None:
+    pool = ConnectionPool(db_path, size=2)
+    for _ in range(5):
+        with pool.connection() as db_conn:
+            db_conn.execute("SELECT 1;").fetchall()
+    assert pool.opened == 1
+
+    # nested checkouts in the same thread share the connection
+    with pool.connection() as outer, pool.connection() as inner:
+        assert outer is inner
+    pool.close()
+
+
+def test_pool_is_read_only(db_path: Path) -> None:
+    pool = ConnectionPool(db_path)
+    with pool.connection() as db_conn, pytest.raises(OperationalError):
+        db_conn.execute("CREATE TABLE tmp (x INTEGER);")
+    pool.close()
+
+
+def test_pool_size_is_bounded(db_path: Path) -> None:
+    pool = ConnectionPool(db_path, size=1, timeout=0.1)
+    errors = []
+
+    def checkout() -> None:
+        try:
+            with pool.connection():
+                pass
+        except TimeoutError as error:
+            errors.append(error)
+
+    with pool.connection():
+        thread = Thread(target=checkout)
+        thread.start()
+        thread.join()
+
+    assert len(errors) == 1
+    pool.close()
+
+
+def test_queries_bind_ids() -> None:
+    statements = []
+
+    def record(sql_query, params=(), method=""):
+        statements.append(sql_query)
+        return Rows(())
+
+    for query_base in [Employee(), Team()]:
+        query_base.query = query_base.rows = query_base.pandas_query = record  # type: ignore[method-assign]
+        for id in [1, 2]:
+            query_base.username(id)
+            query_base.model_data(id)
+            query_base.event_counts(id)
+            query_base.notes(id)
+
+    # the SQL text, and with it the cached prepared statement, does not depend on the id
+    assert len(statements) == 16
+    assert len(set(statements)) == 8
+
+
+def test_query_hooks() -> None:
+    recorded = []
+
+    def record(*args):
+        recorded.append(args)
+
+    query_hooks.append(record)
+    try:
+        Team().username(1)
+        Team().model_data(1)
+    finally:
+        query_hooks.remove(record)
+
+    assert [(entity, method, rows) for entity, method, _, rows in recorded] == [
+        ("team", "username", 1),
+        ("team", "model_data_rows", len(Team().model_data(1))),
+    ]
+    assert all(seconds > 0 for _, _, seconds, _ in recorded)
+
+
+# ===== test migrations
+
+
+def test_schema_is_up_to_date() -> None:
+    assert check_schema() == []
+
+
+def test_migrate(db_path: Path, tmp_path: Path) -> None:
+    tmp_db_path = tmp_path / "employee_events.db"
+    shutil.copy(db_path, tmp_db_path)
+    with connect(tmp_db_path) as db_conn:
+        for index in migrations.expected_indexes():
+            db_conn.execute(f"DROP INDEX {index};")
+        db_conn.execute("PRAGMA user_version = 0;")
+
+    pool = ConnectionPool(tmp_db_path)
+    assert len(check_schema(pool)) == len(migrations.expected_indexes()) + 1
+
+    assert migrate(tmp_db_path) == [m.version for m in migrations.migrations]
+    assert migrate(tmp_db_path) == []
+    assert check_schema(pool) == []
+    pool.close()
+
+
+def test_explain() -> None:
+    for query_base in [Employee(), Team()]:
+        plans = migrations.explain(query_base)
+        assert set(plans) == set(migrations.query_methods)
+        for method in ["username", "model_data", "event_counts", "cumulative_event_counts", "notes"]:
+            assert all(line.startswith(("SEARCH", "BLOOM FILTER")) for line in plans[method])
+
+
+def test_bundle() -> None:
+    for query_base in [Employee(), Team()]:
+        bundle = query_base.bundle(1, notes_limit=5)
+        assert bundle.username == query_base.username(1)[0][0]
+        assert bundle.data_version == query_base.data_version()
+        assert bundle.cumulative_event_counts.to_frame().equals(query_base.cumulative_event_counts(1))
+        assert bundle.model_data.to_frame().equals(query_base.model_data(1))
+        assert bundle.notes.to_frame().equals(query_base.notes_page(1, 5))
+        assert bundle.risk_score("unknown model") is None
+
+        with pytest.raises(AttributeError):
+            bundle.username = ""  # type: ignore[misc]
+
+    # the parts of the bundle are read in a single statement, the columnar backends read their event parts from memory
+    for sql_base, columnar_base in [(Employee(), ColumnarEmployee()), (Team(), ColumnarTeam())]:
+        statements = []
+        query = sql_base.query
+
+        def record(sql_query, params=(), method=""):
+            statements.append(sql_query)
+            return query(sql_query, params, method)
+
+        sql_base.query = columnar_base.query = record  # type: ignore[method-assign]
+        bundle = sql_base.bundle(1, notes_limit=5)
+        assert len(statements) == 1
+        assert columnar_base.bundle(1, notes_limit=5) == bundle
+        assert len(statements) == 2
+
+
+def test_columnar_backend() -> None:
+    for sql_base, columnar_base in [(Employee(), ColumnarEmployee()), (Team(), ColumnarTeam())]:
+        for _, id in sql_base.names():
+            for method in ["event_counts", "cumulative_event_counts", "model_data"]:
+                pd.testing.assert_frame_equal(getattr(columnar_base, method)(id), getattr(sql_base, method)(id))
+
+        pd.testing.assert_frame_equal(columnar_base.all_model_data(), sql_base.all_model_data())
+        assert columnar_base.event_counts(-1).empty
+
+        for dates in [DateRange("2024-02-03", "2024-05-01"), DateRange(end="2024-01-01")]:
+            for max_points in [None, 5, 30, 1000]:
+                for method in ["event_counts", "cumulative_event_counts"]:
+                    pd.testing.assert_frame_equal(
+                        getattr(columnar_base, method)(1, dates, max_points),
+                        getattr(sql_base, method)(1, dates, max_points),
+                    )
+
+
+def test_event_store_grouping() -> None:
+    store = EventStore(
+        employee_id=np.array([2, 1, 2, 1]),
+        team_id=np.array([1, 1, 1, 1]),
+        event_date=np.array(["2024-01-02", "2024-01-01", "2024-01-01", "2024-01-01"], dtype="datetime64[D]"),
+        positive_events=np.array([1, 2, 3, 4]),
+        negative_events=np.array([0, 1, 0, 1]),
+    )
+
+    employees = store.daily["employee"]
+    assert employees.ids.tolist() == [1, 2]
+    assert employees.offsets.tolist() == [0, 1, 3]
+    assert employees.columns["positive_events"].tolist() == [6, 3, 1]
+    assert employees.columns["cumulative_positive_events"].tolist() == [6, 3, 4]
+    assert store.totals["team"].columns["negative_events"].tolist() == [2, 0]
+
+
+def test_downsampled_event_counts() -> None:
+    dates = DateRange("2024-02-07", "2024-08-31")
+    for query_base in [Employee(), Team()]:
+        daily = query_base.event_counts(1, dates)
+        assert daily["event_date"].between(dates.start, dates.end).all()
+        cumulative = query_base.cumulative_event_counts(1, dates)
+        history = query_base.cumulative_event_counts(1)
+        assert cumulative.iloc[0].tolist() == history[history["event_date"] >= dates.start].iloc[0].tolist()
+
+        for max_points, first_bucket in [(1000, "2024-02-07"), (100, "2024-02-05"), (10, "2024-02-01")]:
+            downsampled = query_base.event_counts(1, dates, max_points)
+            assert len(downsampled) <= max_points
+            assert downsampled["event_date"].iloc[0] == first_bucket
+            assert (
+                downsampled[["positive_events", "negative_events"]]
+                .sum()
+                .equals(daily[["positive_events", "negative_events"]].sum())
+            )
+            # the running sums of a bucket end at the running sums of its last day
+            last = query_base.cumulative_event_counts(1, dates, max_points).iloc[-1]
+            assert last.drop("event_date").equals(cumulative.iloc[-1].drop("event_date"))
+
+    with pytest.raises(ValueError):
+        DateRange("2024-02-01", "2024-01-01")
+
+
+def test_rolling_windows() -> None:
+    assert DateRange.last(30, "2024-03-01") == DateRange("2024-02-01", "2024-03-01")
+    with pytest.raises(ValueError):
+        DateRange.last(0)
+
+    dates = DateRange.last(90, Employee().last_event_date())
+    for query_class in [Employee, Team, ColumnarEmployee, ColumnarTeam]:
+        query_base, windowed = query_class(), query_class(dates)
+
+        event_counts = query_base.event_counts(1)
+        in_window = event_counts[event_counts["event_date"].between(dates.start, dates.end)].reset_index(drop=True)
+        pd.testing.assert_frame_equal(windowed.event_counts(1), in_window)
+        pd.testing.assert_frame_equal(query_base.event_counts(1, dates), in_window)
+
+        notes = query_base.notes(1)
+        in_window = notes[notes["note_date"].between(dates.start, dates.end)].reset_index(drop=True)
+        pd.testing.assert_frame_equal(windowed.notes(1), in_window)
+        assert windowed.notes_page(1, 2).iloc[:, :2].equals(in_window.iloc[:2])
+
+        # a team has a row for every employee, also without events in the window
+        model_data = windowed.model_data(1)
+        assert len(model_data) == len(query_base.model_data(1))
+        sums = windowed.event_counts(1)[["positive_events", "negative_events"]].sum()
+        assert model_data.sum().tolist() == sums.tolist()
+
+        bundle = windowed.bundle(1)
+        assert bundle.dates == dates
+        assert bundle.model_data.to_frame().equals(model_data)
+        assert not bundle.risk_scores
+
+
+def test_command_line(db_path: Path, tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    tmp_db_path = tmp_path / "employee_events.db"
+    shutil.copy(db_path, tmp_db_path)
+
+    def data_version(path: Path) -> int:
+        with connect(path) as db_conn:
+            return db_conn.execute("SELECT value FROM rollup_state WHERE name = 'data_version'").fetchone()[0]
+
+    # the documented usage, with `--db` after the command, and `--db` before it
+    main(["refresh-rollups", "--db", str(tmp_db_path), "--full"])
+    assert capsys.readouterr().out == "refreshed rollups from the first event\n"
+    main(["--db", str(tmp_db_path), "refresh-rollups"])
+    assert capsys.readouterr().out == "rollups already up to date\n"
+    assert data_version(tmp_db_path) == data_version(db_path) + 1
+
+    with pytest.raises(SystemExit) as exit_info:
+        main(["check", "--db", str(tmp_db_path)])
+    assert (exit_info.value.code, capsys.readouterr().out) == (0, "schema up to date\n")
+
+
+# ===== test rollups
+
+
+def test_cumulative_event_counts() -> None:
+    for query_base in [Employee(), Team()]:
+        df_event_counts = query_base.event_counts(1).set_index("event_date")
+        df_cumulative = query_base.cumulative_event_counts(1).set_index("event_date")
+        assert (df_event_counts.cumsum() == df_cumulative).all().all()
+
+
+def test_refresh_rollups(db_path: Path, tmp_path: Path) -> None:
+    tmp_db_path = tmp_path / "employee_events.db"
+    shutil.copy(db_path, tmp_db_path)
+
+    with connect(tmp_db_path) as db_conn:
+        assert refresh_rollups(db_conn) is None
+
+        # append events on an existing and on a new date
+        db_conn.executemany(
+            "INSERT INTO employee_events (event_date, employee_id, team_id, positive_events, negative_events)"
+            "VALUES (?, ?, ?, ?, ?);",
+            [("2024-10-18", 1, 2, 10, 1), ("2024-10-22", 1, 2, 3, 4), ("2024-10-22", 7, 1, 1, 1)],
+        )
+        assert refresh_rollups(db_conn) == "2024-10-18"
+        incremental = {
+            table: db_conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3;").fetchall()
+            for table in ["employee_daily_events", "team_daily_events", "employee_event_totals"]
+        }
+
+        assert refresh_rollups(db_conn, full=True) == ""
+        for table, rows in incremental.items():
+            assert rows == db_conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3;").fetchall()
+
+    pool = ConnectionPool(tmp_db_path)
+    employee = Employee()
+    employee.pool = pool
+    assert employee.model_data(1).to_numpy().tolist() == [[677 + 13, 411 + 5]]
+    assert employee.cumulative_event_counts(1).iloc[-1].to_list() == ["2024-10-22", 677 + 13, 411 + 5]
+    pool.close()
+
+
+def test_team_change(db_path: Path, tmp_path: Path) -> None:
+    tmp_db_path = tmp_path / "employee_events.db"
+    shutil.copy(db_path, tmp_db_path)
+    dates = DateRange("2024-10-01", "2024-10-31")
+
+    pool = ConnectionPool(tmp_db_path)
+    employee, team = Employee(), Team()
+    employee.pool = team.pool = pool
+    before = {team_id: team.model_data(team_id, dates) for team_id in [1, 2]}
+
+    # employee 1 of team 2 also has events in team 1, on a date with and on a date without team 2 events
+    with connect(tmp_db_path) as db_conn:
+        db_conn.executemany(
+            "INSERT INTO employee_events (event_date, employee_id, team_id, positive_events, negative_events)"
+            "VALUES (?, ?, ?, ?, ?);",
+            [("2024-10-21", 1, 1, 2, 3), ("2024-10-22", 1, 1, 7, 1)],
+        )
+        refresh_rollups(db_conn)
+
+    pd.testing.assert_frame_equal(team.model_data(2, dates), before[2])
+    team_1 = team.model_data(1, dates)
+    assert len(team_1) == len(before[1]) + 1
+    assert team_1.iloc[0].to_list() == [2 + 7, 3 + 1]
+
+    event_counts = employee.event_counts(1, dates)
+    assert event_counts["event_date"].is_unique
+    assert event_counts.iloc[-2:].to_numpy().tolist() == [["2024-10-21", 5 + 2, 1 + 3], ["2024-10-22", 7, 1]]
+    assert employee.cumulative_event_counts(1).iloc[-1].to_list() == ["2024-10-22", 677 + 9, 411 + 4]
+    pool.close()
+
+
+# ===== test ingest
+
+
+def test_ingest_file(db_path: Path, tmp_path: Path) -> None:
+    tmp_db_path = tmp_path / "employee_events.db"
+    shutil.copy(db_path, tmp_db_path)
+    with connect(db_path) as db_conn:
+        bundled_version = db_conn.execute("SELECT value FROM rollup_state WHERE name = 'data_version'").fetchone()[0]
+
+    def journal_mode(path: Path) -> str:
+        with connect(path) as db_conn:
+            return db_conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+    events_path = tmp_path / "events.csv"
+    events_path.write_text(
+        "event_date,employee_id,team_id,positive_events,negative_events\n"
+        "2024-10-22,1,2,3,4\n"
+        "2024-10-23,1,2,1,0\n"
+        "2024-10-23,999,2,1,0\n"  # unknown employee
+        "not a date,1,2,1,0\n"
+    )
+    with pytest.raises(ValueError, match="record 3: unknown employee_id 999"):
+        ingest_file(events_path, "employee_events", tmp_db_path, chunk_size=1)
+    assert journal_mode(tmp_db_path) == "delete"
+
+    with connect(tmp_db_path) as db_conn:  # the chunks before the invalid record were written
+        db_conn.execute("DELETE FROM employee_events WHERE event_date > '2024-10-21'")
+    result = ingest_file(events_path, "employee_events", tmp_db_path, skip_invalid=True)
+    assert (result.rows, result.rejected) == (2, 2)
+
+    notes_path = tmp_path / "notes.jsonl"
+    notes_path.write_text('{"employee_id": 1, "team_id": 2, "note": "Ingested", "note_date": "2024-10-23"}\n')
+    assert ingest_file(notes_path, "notes", tmp_db_path).rows == 1
+
+    pool = ConnectionPool(tmp_db_path)
+    employee = Employee()
+    employee.pool = pool
+    assert employee.model_data(1).to_numpy().tolist() == [[677 + 4, 411 + 4]]
+    assert employee.notes(1).iloc[-1].to_list() == ["2024-10-23", "Ingested"]
+    assert employee.data_version() == bundled_version + 2  # after the rollups of the events and of the notes
+    assert journal_mode(tmp_db_path) == "delete"  # read-only connections to a WAL database need its -shm file
+    pool.close()
+
+
+# ===== test org hierarchy
+
+org_units = [
+    {"org_unit_id": 1, "org_unit_name": "Operations", "level": "division", "parent_id": ""},
+    {"org_unit_id": 10, "org_unit_name": "Support", "level": "department", "parent_id": 1},
+    {"org_unit_id": 11, "org_unit_name": "Field", "level": "department", "parent_id": 1},
+]
+team_units = [{"team_id": team_id, "org_unit_id": 10 if team_id <= 2 else 11} for team_id in range(1, 6)]
+
+
+def test_org_hierarchy(db_path: Path, tmp_path: Path) -> None:
+    tmp_db_path = tmp_path / "employee_events.db"
+    shutil.copy(db_path, tmp_db_path)
+
+    with connect(tmp_db_path) as db_conn:
+        counts = load_org(db_conn, org_units, team_units)
+        assert (counts["org_units"], counts["org_closure"]) == (3, 5)
+        with pytest.raises(ValueError, match="its own ancestor"):
+            load_org(db_conn, [{**org_units[0], "parent_id": 10}, *org_units[1:]], team_units)
+
+    pool = ConnectionPool(tmp_db_path)
+    assert org_levels(pool) == ["department", "division"]
+
+    team, department, division = Team(), OrgUnit("department"), OrgUnit("division")
+    for query_base in [team, department, division]:
+        query_base.pool = pool
+    assert department.names() == [("Support", 10), ("Field", 11)]
+    assert division.username(1) == [("Operations",)]
+
+    # the units sum the events, model data and notes of their teams
+    teams = {10: [1, 2], 11: [3, 4, 5], 1: [1, 2, 3, 4, 5]}
+    for query_base, unit_id in [(department, 10), (department, 11), (division, 1)]:
+        event_counts = pd.concat([team.event_counts(team_id) for team_id in teams[unit_id]])
+        expected = event_counts.groupby("event_date", as_index=False).sum()
+        pd.testing.assert_frame_equal(query_base.event_counts(unit_id), expected)
+        cumulative = query_base.cumulative_event_counts(unit_id).iloc[-1]
+        assert cumulative[["positive_events", "negative_events"]].tolist() == expected.iloc[:, 1:].sum().tolist()
+
+        model_data = pd.concat([team.model_data(team_id) for team_id in teams[unit_id]])
+        assert sorted(query_base.model_data(unit_id).to_numpy().tolist()) == sorted(model_data.to_numpy().tolist())
+        assert len(query_base.notes(unit_id)) == sum(len(team.notes(team_id)) for team_id in teams[unit_id])
+
+    # the id of a unit of another level selects nothing
+    bundle = department.bundle(1)
+    assert bundle.username == ""
+    assert len(bundle.cumulative_event_counts) == len(bundle.model_data) == len(bundle.notes) == 0
+    assert department.event_counts(1, max_points=10).empty
+    assert department.model_data(1, DateRange("2024-01-01")).empty
+
+    all_model_data = division.all_model_data()
+    assert all_model_data.columns.tolist() == ["division_id", "positive_events", "negative_events"]
+    assert len(all_model_data) == len(Employee().names())
+
+    # the appended events are rolled up into every level
+    with connect(tmp_db_path) as db_conn:
+        db_conn.execute(
+            "INSERT INTO employee_events (event_date, employee_id, team_id, positive_events, negative_events)"
+            "VALUES ('2024-10-22', 1, 2, 3, 4);"
+        )
+        refresh_rollups(db_conn)
+        incremental = db_conn.execute("SELECT * FROM org_unit_daily_events ORDER BY 1, 2, 3;").fetchall()
+        refresh_rollups(db_conn, full=True)
+        assert incremental == db_conn.execute("SELECT * FROM org_unit_daily_events ORDER BY 1, 2, 3;").fetchall()
+
+    assert division.event_counts(1).iloc[-1].tolist() == ["2024-10-22", 3, 4]
+    for method, plan in migrations.explain(division, pool=pool).items():
+        if method in ["username", "event_counts", "cumulative_event_counts"]:
+            assert all(line.startswith(("SEARCH", "SCALAR SUBQUERY")) for line in plan)  # the level check
+    pool.close()
+
+
+def test_org_unit_team_change(db_path: Path, tmp_path: Path) -> None:
+    tmp_db_path = tmp_path / "employee_events.db"
+    shutil.copy(db_path, tmp_db_path)
+
+    # employee 1 of team 2 also has events in team 1, both teams of the Support department
+    with connect(tmp_db_path) as db_conn:
+        load_org(db_conn, org_units, team_units)
+        db_conn.execute(
+            "INSERT INTO employee_events (event_date, employee_id, team_id, positive_events, negative_events)"
+            "VALUES ('2024-10-22', 1, 1, 3, 4);"
+        )
+        refresh_rollups(db_conn)
+
+    pool = ConnectionPool(tmp_db_path)
+    employee, department = Employee(), OrgUnit("department")
+    employee.pool = department.pool = pool
+
+    # the employee is a single row of the model data, with the events of both teams
+    all_time, windowed = department.model_data(10), department.model_data(10, DateRange("2000-01-01"))
+    pd.testing.assert_frame_equal(all_time, windowed)
+    employees = department.query("SELECT COUNT(DISTINCT employee_id) FROM employee_event_totals WHERE team_id <= 2")
+    assert len(all_time) == employees[0][0]
+    assert all_time.iloc[0].tolist() == employee.model_data(1).iloc[0].tolist() == [677 + 3, 411 + 4]
+
+    all_model_data = department.all_model_data()
+    assert all_model_data[all_model_data["department_id"] == 10].iloc[:, 1:].equals(all_time)
+    pool.close()
@@ -0,0 +1,551 @@
+import asyncio
+import json
+import os
+import pickle
+import queue
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from sqlite3 import connect
+from urllib.parse import unquote
+from urllib.request import urlopen
+from xml.etree import ElementTree
+
+import metrics
+import pytest
+from base_components import BaseComponent, LRUCache
+from dashboard import (
+    BarChart,
+    Header,
+    LineChart,
+    NotesTable,
+    ReportDropdown,
+    app,
+    check_database,
+    report,
+    window_dates,
+)
+from employee_events import (
+    ConnectionPool,
+    DateRange,
+    Employee,
+    OrgUnit,
+    Team,
+    configure_pool,
+    load_org,
+    query_hooks,
+    refresh_rollups,
+)
+from employee_events.sql_execution import db_path
+from export import StaticLineChart, export_all
+from fastcore.xml import FT
+from scoring import score_all
+from serve import Supervisor
+from starlette.testclient import TestClient
+from utils import ModelRegistry, load_model, model_path, model_registry
+
+# ===== test caches
+
+
+def test_lru_cache_eviction() -> None:
+    cache = LRUCache(max_entries=2, max_bytes=10)
+
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    assert cache.get("a") == b"1234"  # "a" is now the most recently used
+
+    cache.set("c", b"1234")
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+    cache.set("d", b"123456789")
+    assert len(cache) == 1
+    assert cache.size == 9
+    assert cache.evictions == 3
+
+    cache.set("e", b"too large for the cache")
+    assert cache.get("e") is None
+    assert cache.hit_rate == 1 / 3
+
+
+def test_lru_cache_ttl(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = LRUCache()
+    cache.set("a", b"1234", ttl=60)
+    cache.set("b", b"1234")
+    assert cache.get("a") == b"1234"
+
+    monkeypatch.setattr(time, "monotonic", lambda: float("inf"))
+    assert cache.get("a") is None
+    assert cache.get("b") == b"1234"
+    assert cache.size == 4
+
+
+def test_fragment_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    names_calls = []
+    data_version = [1]
+    monkeypatch.setattr(Employee, "names", lambda self: names_calls.append(1) or [("A", 1), ("B", 2)])
+    monkeypatch.setattr(Employee, "data_version", lambda self: data_version[0])
+
+    dropdown = ReportDropdown(id="selector", name="user-selection")
+    dropdown.fragment_cache = LRUCache()
+    first = dropdown(1, Employee())
+    assert dropdown(1, Employee()) == first
+    assert 'value="1" selected' in str(first)
+    assert len(names_calls) == 1
+
+    assert dropdown(2, Employee()) != first  # the selected option is part of the key
+    data_version[0] = 2
+    assert dropdown(1, Employee()) == first
+    assert len(names_calls) == 3
+
+    header = Header()
+    header.fragment_cache = dropdown.fragment_cache
+    assert header(1, Team()) == header(2, Team()) != header(1, Employee())
+
+
+def test_chart_cache() -> None:
+    for chart in [LineChart(), BarChart()]:
+        chart.cache = LRUCache()
+        for model in [Employee(), Team()]:
+            first = chart.render(1, model)
+            assert chart.render(1, model) == first
+            assert chart.render(2, model) != first
+
+        assert chart.cache.stats()["misses"] == 4
+        assert chart.cache.stats()["hits"] == 2
+
+
+def test_concurrent_chart_rendering() -> None:
+    chart = LineChart()
+    chart.cache = None
+    expected = [chart.render(entity_id, Employee()) for entity_id in range(1, 9)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        rendered = list(executor.map(lambda entity_id: chart.render(entity_id, Employee()), range(1, 9)))
+
+    assert rendered == expected
+
+
+def test_parallel_report_rendering() -> None:
+    jobs = [(entity_id, model) for model in [Employee(), Team()] for entity_id in range(1, 11)] * 4
+    expected = [str(report(entity_id, model)) for entity_id, model in jobs]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        rendered = list(executor.map(lambda job: str(report(*job)), jobs))
+
+    assert rendered == expected
+    assert len(set(expected)) == 20
+
+
+def test_async_report_matches_sync() -> None:
+    for model in [Employee(), Team()]:
+        expected = [str(child) for child in report.call_children(1, model)]
+        assert [str(child) for child in asyncio.run(report.acall_children(1, model))] == expected
+
+
+# ===== test routes
+
+
+def test_chart_routes() -> None:
+    client = TestClient(app)
+    page = client.get("/team/1").text
+    placeholders = re.findall(r'hx-get="(/chart/[^"]+)"', page)
+    assert placeholders == ["/chart/LineChart/team/1", "/chart/BarChart/team/1"]
+
+    for placeholder in placeholders:
+        image_url = re.findall(r'src="([^"]+)"', client.get(placeholder, headers={"HX-Request": "true"}).text)[0]
+        response = client.get(image_url)
+        assert response.headers["content-type"] == "image/svg+xml"
+        assert response.content.startswith(b"<svg")
+        assert "immutable" in response.headers["cache-control"]
+
+        revalidated = client.get(image_url, headers={"If-None-Match": response.headers["etag"]})
+        assert revalidated.status_code == 304
+
+    assert client.get("/chart/LineChart/team/1/png").content.startswith(b"\x89PNG")
+    assert client.get("/chart/LineChart/team/1/json").headers["content-type"] == "application/json"
+    assert client.get("/chart/LineChart/team/1/gif").status_code == 404
+
+    dates = {"start": "2024-03-01", "end": "2024-05-31"}
+    ranged = client.get("/chart/LineChart/team/1", params=dates, headers={"HX-Request": "true"})
+    image_url = re.findall(r'src="([^"]+)"', ranged.text)[0].replace("&amp;", "&")
+    assert "start=2024-03-01" in image_url
+    event_dates = client.get(image_url.replace("/svg?", "/json?")).json()["series"][0]["x"]
+    assert event_dates[0] >= dates["start"] and event_dates[-1] <= dates["end"]
+    assert client.get("/chart/LineChart/team/1/svg", params={"start": "2024-13-01"}).status_code == 400
+    assert client.get("/chart/Unknown/team/1/png").status_code == 404
+    # unknown entities have no model data to predict from
+    assert client.get("/chart/BarChart/employee/999/svg").status_code == 404
+    assert client.get("/chart/BarChart/team/999").status_code == 404
+    assert client.get("/employee/999").status_code == 200
+
+
+def test_requests_read_the_data_version_once() -> None:
+    client = TestClient(app)
+    methods: list[str] = []
+
+    def record(entity: str, method: str, seconds: float, rows: int) -> None:
+        methods.append(method)
+
+    query_hooks.append(record)
+    try:
+        for url in ["/employee/3", "/team/2", "/employee/3?window=90", "/chart/LineChart/team/2/svg"]:
+            client.get(url)
+            methods.clear()
+            client.get(url)  # every fragment, bundle and chart is cached
+            assert methods == ["data_version"]
+    finally:
+        query_hooks.remove(record)
+
+
+def test_window_filter() -> None:
+    client = TestClient(app)
+    page = client.get("/employee/1", params={"window": "90"}).text
+    assert '<option value="90" selected="selected">Last 90 days</option>' in page
+    dates = window_dates("90", Employee())
+    assert dates is not None
+    placeholders = re.findall(r'hx-get="(/chart/[^"]+)"', page)
+    assert all(f"start={dates.start}&amp;end={dates.end}" in placeholder for placeholder in placeholders)
+
+    # the risk of the window is predicted from the events within it
+    bar_chart = BarChart().chart_spec(1, Employee(dates))
+    expected = model_registry.predict_risk([Employee().model_data(1, dates)])[0]
+    assert bar_chart.series[0].y[0] == pytest.approx(expected)
+
+    assert client.get("/employee/1", params={"window": "7"}).status_code == 400
+    redirect = client.post(
+        "/update_data/", data={"profile_type": "Team", "user-selection": "2", "window": "30"}, follow_redirects=False
+    )
+    assert redirect.headers["location"] == "/team/2?window=30"
+
+
+def test_window_filter_without_events(tmp_path: Path) -> None:
+    tmp_db_path = tmp_path / "employee_events.db"
+    shutil.copy(db_path, tmp_db_path)
+    with connect(tmp_db_path) as db_conn:
+        db_conn.execute("DELETE FROM employee_events")
+        refresh_rollups(db_conn, full=True)
+
+    client = TestClient(app)
+    configure_pool(path=tmp_db_path)
+    try:
+        assert Employee().last_event_date() is None
+        assert client.get("/employee/1", params={"window": "30"}).status_code == 200
+        assert window_dates("30", Employee()) == DateRange.last(30)
+    finally:
+        configure_pool()
+
+
+def test_unmigrated_database() -> None:
+    # the bundled database, before `python -m employee_events migrate`
+    configure_pool(path=Path(__file__).parents[1] / "python-package" / "employee_events" / "employee_events.db")
+    try:
+        with pytest.raises(RuntimeError, match="schema version 0 is behind"):
+            check_database()
+    finally:
+        configure_pool()
+
+
+def test_org_routes(tmp_path: Path) -> None:
+    tmp_db_path = tmp_path / "employee_events.db"
+    shutil.copy(db_path, tmp_db_path)
+    with connect(tmp_db_path) as db_conn:
+        load_org(
+            db_conn,
+            [
+                {"org_unit_id": 1, "org_unit_name": "Operations", "level": "division", "parent_id": ""},
+                {"org_unit_id": 10, "org_unit_name": "Support", "level": "department", "parent_id": 1},
+            ],
+            [{"team_id": team_id, "org_unit_id": 10} for team_id in range(1, 6)],
+        )
+
+    client = TestClient(app)
+    assert 'value="Department"' not in client.get("/employee/1").text
+    configure_pool(path=tmp_db_path)
+    try:
+        page = client.get("/org/department/10", params={"window": "90"}).text
+        assert "Department Performance" in page
+        assert all(f'value="{value}"' in page for value in ["Employee", "Team", "Department", "Division"])
+        assert '<option value="10" selected="selected">Support</option>' in page
+
+        # the lazy charts and the notes pages of a unit are served by the same routes as the employees and teams
+        for placeholder in re.findall(r'hx-get="(/chart/[^"]+)"', page):
+            assert placeholder.startswith("/chart/") and "/department/10?" in placeholder
+            assert client.get(placeholder.replace("&amp;", "&")).status_code == 200
+        assert client.get("/chart/LineChart/division/1/svg").status_code == 200
+        assert client.get("/notes/department/10", params={"after": "2023-01-01/0"}).status_code == 200
+
+        assert "Support" in client.get("/update_dropdown/", params={"profile_type": "Department"}).text
+        assert client.get("/org/team/1").status_code == 404
+        assert client.get("/org/region/1").status_code == 404
+        assert client.get("/chart/LineChart/region/1").status_code == 404
+        redirect = client.post(
+            "/update_data/", data={"profile_type": "Division", "user-selection": "1"}, follow_redirects=False
+        )
+        assert redirect.headers["location"] == "/org/division/1"
+
+        # the risk of a unit is the mean over the employees of its teams
+        bar_chart = BarChart().chart_spec(1, OrgUnit("division"))
+        expected = model_registry.predict_risk([OrgUnit("division").model_data(1)])[0]
+        assert bar_chart.series[0].y[0] == pytest.approx(expected)
+    finally:
+        configure_pool()
+
+
+def test_metrics() -> None:
+    client = TestClient(metrics.MetricsMiddleware(app, server_timing=True))
+    response = client.get("/employee/2")
+    db_timing = re.match(
+        r'db;dur=[\d.]+;desc="(\d+) queries", render;dur=[\d.]+, total;dur=[\d.]+$', response.headers["server-timing"]
+    )
+    assert db_timing and int(db_timing.group(1)) > 0
+
+    exposition = client.get("/metrics")
+    assert exposition.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = exposition.text.splitlines()
+    assert 'dashboard_request_duration_seconds_bucket{route="/employee/{employee_id}",le="+Inf"}' in "\n".join(lines)
+    assert any(
+        line.startswith('employee_events_query_duration_seconds_count{entity="employee",method="') for line in lines
+    )
+    assert any(line.startswith('dashboard_component_duration_seconds_count{component="NotesTable"}') for line in lines)
+    assert any(line.startswith('dashboard_cache_hits_total{cache="chart"}') for line in lines)
+    assert 'dashboard_responses_total{route="unmatched",status="404"}' not in exposition.text
+
+
+# ===== test chart rendering
+
+
+def test_chart_formats() -> None:
+    chart = LineChart()
+    chart.cache = None
+    spec = chart.chart_spec(1, Employee())
+
+    svg = ElementTree.fromstring(chart.render(1, Employee(), "svg"))
+    assert len(svg.findall("{http://www.w3.org/2000/svg}polyline")) == 2
+    assert spec.title in {text.text for text in svg.iter("{http://www.w3.org/2000/svg}text")}
+
+    payload = json.loads(chart.render(1, Employee(), "json"))
+    assert [series["label"] for series in payload["series"]] == ["Positive", "Negative"]
+    assert payload["series"][0]["x"][0] == str(spec.series[0].x[0])
+    assert payload["series"][0]["y"] == spec.series[0].y.tolist()
+
+    # the matplotlib fallback draws the same spec
+    assert chart.render(1, Employee(), "png").startswith(b"\x89PNG")
+    assert chart.image(1, Employee(), inline=True).src.startswith("data:image/svg+xml;base64,")
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import dashboard",
+        "from employee_events import Employee, check_schema; Employee().names(); check_schema()",
+    ],
+)
+def test_imports_skip_heavy_modules(code: str) -> None:
+    heavy = ["numpy", "pandas", "matplotlib", "sklearn", "fastlite"]
+    code += f"; import sys; print([module for module in {heavy} if module in sys.modules])"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=Path(__file__).parents[1] / "report", capture_output=True, check=False
+    )
+    assert result.stdout.strip() == b"[]", result.stderr.decode()
+
+
+# ===== test model registry
+
+
+def test_model_registry(tmp_path: Path) -> None:
+    tmp_model_path = tmp_path / "model.pkl"
+    shutil.copy(model_path, tmp_model_path)
+    registry = ModelRegistry(tmp_model_path)
+
+    model = registry.get()
+    assert registry.get() is model
+    version = registry.version
+
+    # a rewritten model file is picked up on the next call
+    os.utime(tmp_model_path, ns=(0, 0))
+    assert registry.get() is not model
+    assert registry.version == version
+
+    tmp_model_path.write_bytes(pickle.dumps(object()))
+    with pytest.raises(TypeError, match="predict_proba"):
+        registry.reload()
+
+
+def test_predict_risk() -> None:
+    model_data = [Employee().model_data(1), Team().model_data(1), Team().model_data(2)]
+    expected = [load_model().predict_proba(data)[:, 1].mean() for data in model_data]
+
+    assert model_registry.predict_risk(model_data) == pytest.approx(expected)
+
+
+# ===== test risk scores
+
+
+def test_score_all(tmp_path: Path) -> None:
+    tmp_db_path = tmp_path / "employee_events.db"
+    shutil.copy(db_path, tmp_db_path)
+    pool = ConnectionPool(tmp_db_path)
+
+    for model in [Employee(), Team()]:
+        model.pool = pool
+        assert model.risk_score(1, model_registry.version) is None
+
+    assert score_all(tmp_db_path) == {"employee": 25, "team": 5}
+    assert score_all(tmp_db_path) == {"employee": 25, "team": 5}
+
+    for model in [Employee(), Team()]:
+        model.pool = pool
+        expected = model_registry.predict_risk([model.model_data(2)])[0]
+        assert model.risk_score(2, model_registry.version) == pytest.approx(expected)
+        assert model.risk_score(2, "another model") is None
+        assert len(model.risk_history(2)) == 2
+
+    # scores of outdated rollups are not current anymore
+    with connect(tmp_db_path) as db_conn:
+        refresh_rollups(db_conn, full=True)
+    assert model.risk_score(2, model_registry.version) is None
+    pool.close()
+
+
+# ===== test notes table
+
+
+def test_notes_table_pages(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = TestClient(app)
+    page_size = 4
+    monkeypatch.setattr(NotesTable, "page_size", page_size)
+    notes_table = NotesTable()
+
+    for model in [Employee(), Team()]:
+        all_notes = model.notes(1)
+        table = notes_table(1, model)
+        assert isinstance(table, FT)
+        assert [th.children[0] for th in table.children[0].children[0].children] == ["note_date", "note"]
+
+        rows = list(table.children[1].children)
+        while "hx-get" in rows[-1].attrs:
+            load_more = rows.pop()
+            assert len(rows) % page_size == 0
+
+            fragment = client.get(load_more.attrs["hx-get"], headers={"HX-Request": "true"}).text
+            after = unquote(load_more.attrs["hx-get"].split("after=")[1])
+            rows += notes_table.next_rows(1, model, after)
+            assert fragment.count("<tr") == len(notes_table.next_rows(1, model, after))
+
+        assert [[td.children[0] for td in row.children] for row in rows] == all_notes.to_numpy().tolist()
+
+    # a malformed cursor is a bad request
+    for after in ["abc", "x/y", "2024-01-01/y"]:
+        response = client.get("/notes/employee/1", params={"after": after})
+        assert (response.status_code, response.text) == (
+            400,
+            f"Invalid notes cursor {after!r}, expected <date>/<rowid>.",
+        )
+    with pytest.raises(ValueError, match="Invalid notes cursor"):
+        Employee().notes_page_rows(1, 10, "abc")
+
+
+# ===== test export
+
+
+def test_export_all(tmp_path: Path) -> None:
+    stats = export_all(tmp_path, workers=1, backend="sqlite")
+    assert stats["reports"] == 30
+    assert stats["files"] == 30 * 3 + 1
+
+    page = (tmp_path / "team" / "1" / "index.html").read_text()
+    assert page.startswith("<!doctype html>")
+    assert 'src="StaticLineChart.svg"' in page
+    assert "hx-get" not in page
+    assert 'href="team/1/index.html"' in (tmp_path / "index.html").read_text()
+
+    # rendered in a worker process, identical to a render in this process
+    assert (tmp_path / "team" / "1" / "StaticLineChart.svg").read_bytes() == StaticLineChart().render(1, Team())
+
+
+# ===== test serving
+
+
+def test_lifespan_warms_up() -> None:
+    fragment_cache = BaseComponent.fragment_cache
+    assert fragment_cache is not None
+    fragment_cache.clear()
+    with TestClient(app) as client:
+        assert model_registry._model is not None
+        assert len(fragment_cache) > 0
+        assert client.get("/employee/1").status_code == 200
+
+
+def test_supervisor_reloads_on_database_replacement(tmp_path: Path) -> None:
+    db = tmp_path / "employee_events.db"
+    shutil.copy(db_path, db)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    serve = Path(__file__).parents[1] / "report" / "serve.py"
+    host = ["--host", "127.0.0.1", "--port", str(port)]
+    command = [sys.executable, str(serve), "--workers", "2", *host, "--db", str(db)]
+    process = subprocess.Popen(command, cwd=tmp_path, stderr=subprocess.PIPE, text=True)
+    stderr = process.stderr
+    assert stderr is not None
+    lines: queue.Queue[str] = queue.Queue()
+    threading.Thread(target=lambda: [lines.put(line) for line in stderr], daemon=True).start()
+
+    def wait_for(message: str) -> str:
+        while True:
+            line = lines.get(timeout=60)
+            if message in line:
+                return line
+
+    try:
+        workers = wait_for("serve: listening").split("workers ")[1]
+        with urlopen(f"http://127.0.0.1:{port}/employee/1", timeout=10) as response:
+            assert response.status == 200
+
+        replacement = tmp_path / "replacement.db"
+        shutil.copy(db_path, replacement)
+        os.replace(replacement, db)
+        assert wait_for("serve: reloaded").split("workers ")[1] != workers
+        with urlopen(f"http://127.0.0.1:{port}/team/1", timeout=10) as response:
+            assert response.status == 200
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=60) == 0
+
+
+def test_supervisor_retries_failed_restarts(monkeypatch: pytest.MonkeyPatch) -> None:
+    worker = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    supervisor = Supervisor(workers=2, watch_interval=0.5)
+    supervisor.pids = [worker.pid]  # one worker left, the other exited
+
+    def fail(count: int) -> list[int]:
+        raise RuntimeError(f"{count} of {count} workers did not start.")
+
+    try:
+        monkeypatch.setattr(supervisor, "spawn_ready", fail)
+        supervisor.reap()
+        supervisor.reap()  # within the delay, not retried
+        assert supervisor.pids == [worker.pid]
+        assert supervisor._restart_delay == 0.5
+
+        supervisor._restart_at = 0.0
+        supervisor.reap()
+        assert supervisor._restart_delay == 1.0
+
+        supervisor._restart_at = 0.0
+        monkeypatch.setattr(supervisor, "spawn_ready", lambda count: [worker.pid + 1] * count)
+        supervisor.reap()
+        assert supervisor.pids == [worker.pid, worker.pid + 1]
+        assert supervisor._restart_delay == 0.0
+    finally:
+        worker.kill()
+        worker.wait()